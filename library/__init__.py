@@ -9,22 +9,33 @@ from flask_migrate import Migrate
 from werkzeug.exceptions import HTTPException
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from .archives import epub_archives
 from .commands import init_commands
 from .config import DATA_DIR, Config
+from .file_cache import epub_file_cache
+from .match_index import init_match_index
 from .models import db
 from .proxy_auth import load_user_from_proxy_header
 from .routes import (
     auth_blueprint,
+    catalog_blueprint,
     index_blueprint,
     metadata_blueprint,
     read_blueprint,
     upload_blueprint,
 )
+from .scanner import BOOK_DIR_SENTINEL  # noqa: F401 (re-export)
+from .storage import create_book_storage
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 cache = Cache(config={"CACHE_TYPE": "flask_caching.backends.simplecache.SimpleCache"})
+# Cross-worker cache for parsed EPUB data; lives under EPUB_CACHE_DIR so all
+# gunicorn workers share one parse per book version.
+disk_cache = Cache(
+    config={"CACHE_TYPE": "flask_caching.backends.filesystemcache.FileSystemCache"}
+)
 
 
 def create_app(config_overrides: dict | None = None):
@@ -50,13 +61,29 @@ def create_app(config_overrides: dict | None = None):
             )
 
     os.makedirs(DATA_DIR, exist_ok=True)
-    if not app.config.get("TESTING"):
+    if not app.config.get("TESTING") and app.config["BOOK_STORAGE"] == "local":
         book_dir = app.config["BOOK_DIR"]
         if not os.path.isdir(book_dir):
             raise RuntimeError(
                 f"BOOK_DIR does not exist or is not a directory: {book_dir}"
             )
     cache.init_app(app)
+    disk_cache.init_app(
+        app,
+        config={
+            "CACHE_DIR": app.config["EPUB_CACHE_DIR"],
+            "CACHE_THRESHOLD": app.config["EPUB_CACHE_THRESHOLD"],
+            "CACHE_DEFAULT_TIMEOUT": 0,
+        },
+    )
+    epub_archives.maxsize = app.config["EPUB_ARCHIVE_POOL_SIZE"]
+    if app.config["BOOK_STORAGE"] == "s3" and not app.config["EPUB_LOCAL_CACHE_DIR"]:
+        # Remote books are always read through a local copy.
+        app.config["EPUB_LOCAL_CACHE_DIR"] = os.path.join(DATA_DIR, "epub_local")
+    epub_file_cache.cache_dir = app.config["EPUB_LOCAL_CACHE_DIR"]
+    epub_file_cache.max_bytes = app.config["EPUB_LOCAL_CACHE_MAX_BYTES"]
+    app.extensions["book_storage"] = create_book_storage(app.config, epub_file_cache)
+    init_match_index(app)
 
     # Honor X-Forwarded-* from nginx when TLS terminates upstream. x_prefix
     # picks up X-Forwarded-Prefix so url_for() emits the /library mount path.
@@ -101,6 +128,7 @@ def create_app(config_overrides: dict | None = None):
         return {"proxy_mode": is_proxy_mode()}
 
     app.register_blueprint(auth_blueprint)
+    app.register_blueprint(catalog_blueprint)
     app.register_blueprint(index_blueprint)
     app.register_blueprint(metadata_blueprint)
     app.register_blueprint(read_blueprint)
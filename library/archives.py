@@ -0,0 +1,214 @@
+"""Per-worker pool of open EPUB archives.
+
+Opening a :class:`zipfile.ZipFile` re-reads and parses the central directory,
+which for an illustrated book happens once per ``/book_asset`` request. The
+pool keeps recently used archives open, keyed on path and revalidated against
+the file's mtime+size on every checkout, so a rewritten EPUB is reopened.
+
+Reads are safe across gthread workers: CPython's zipfile serialises the
+seek+read on the shared file handle, and checkouts are leased so an archive
+evicted by one thread is only closed once every reader has returned it.
+"""
+
+import os
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 32
+
+_LOCAL_HEADER_SIZE = 30
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+class _PooledArchive:
+    __slots__ = ("zip", "version", "leases", "evicted")
+
+    def __init__(self, zf: zipfile.ZipFile, version: tuple[int, int]):
+        self.zip = zf
+        self.version = version
+        self.leases = 0
+        self.evicted = False
+
+
+class ArchivePool:
+    """Size-bounded LRU of open ZipFiles keyed on (path, mtime, size)."""
+
+    def __init__(self, maxsize: int = DEFAULT_POOL_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _PooledArchive] = OrderedDict()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def open(self, path: str):
+        """Check out the open archive for `path`, opening it if needed."""
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        version = (st.st_mtime_ns, st.st_size)
+
+        entry = self._checkout(key, version)
+        if entry is None:
+            # Open outside the lock so a slow NAS read doesn't stall every
+            # other thread's checkout; a concurrent opener may win the race.
+            entry = self._insert(key, _PooledArchive(zipfile.ZipFile(key), version))
+        try:
+            yield entry.zip
+        finally:
+            self._release(entry)
+
+    def invalidate(self, path: str) -> None:
+        """Drop `path` from the pool, e.g. after the file was rewritten."""
+        with self._lock:
+            self._discard(os.path.abspath(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _checkout(self, key, version) -> _PooledArchive | None:
+        with self._lock:
+            self._reset_after_fork()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version:
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            entry.leases += 1
+            return entry
+
+    def _insert(self, key, entry: _PooledArchive) -> _PooledArchive:
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and existing.version == entry.version:
+                entry.zip.close()
+                entry = existing
+            else:
+                if existing is not None:
+                    self._discard(key)
+                self._entries[key] = entry
+                while len(self._entries) > max(self.maxsize, 1):
+                    self._discard(next(iter(self._entries)))
+            self._entries.move_to_end(key)
+            entry.leases += 1
+            return entry
+
+    def _release(self, entry: _PooledArchive) -> None:
+        with self._lock:
+            entry.leases -= 1
+            if entry.evicted and entry.leases == 0:
+                entry.zip.close()
+
+    def _discard(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        entry.evicted = True
+        if entry.leases == 0:
+            entry.zip.close()
+
+    def _reset_after_fork(self) -> None:
+        # A forked worker must not share file offsets with its parent; forget
+        # inherited handles without closing them (the parent still owns them).
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._entries = OrderedDict()
+
+
+epub_archives = ArchivePool()
+
+
+def open_epub(path: str):
+    """Context manager yielding a pooled, read-only ZipFile for `path`."""
+    return epub_archives.open(path)
+
+
+def is_stored(info: zipfile.ZipInfo) -> bool:
+    """True for uncompressed, unencrypted members whose bytes sit verbatim
+    (and contiguously) inside the archive file."""
+    return info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1
+
+
+class MemberSlice:
+    """Read-only window onto the raw bytes of a stored zip member.
+
+    Owns its own file handle, positioned at the window start, so servers with
+    a sendfile-capable ``wsgi.file_wrapper`` (gunicorn) can pass ``fileno()``
+    straight to the kernel; everything else gets bounded ``read()`` calls.
+    """
+
+    def __init__(self, fileobj, length: int):
+        self._file = fileobj
+        self._remaining = length
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0 or n > self._remaining:
+            n = self._remaining
+        data = self._file.read(n) if n else b""
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def open_stored_member(
+    path: str, info: zipfile.ZipInfo, start: int, stop: int
+) -> MemberSlice:
+    """MemberSlice over bytes [start, stop) of the stored member `info`."""
+    # Unbuffered, so seek() moves the OS-level offset that sendfile reads from.
+    f = open(path, "rb", buffering=0)
+    try:
+        f.seek(info.header_offset)
+        header = f.read(_LOCAL_HEADER_SIZE)
+        if (
+            len(header) != _LOCAL_HEADER_SIZE
+            or header[:4] != _LOCAL_HEADER_SIGNATURE
+        ):
+            raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+        # The local header's name/extra lengths can differ from the central
+        # directory's, so the data offset has to come from here.
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        f.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len + start)
+    except Exception:
+        f.close()
+        raise
+    return MemberSlice(f, stop - start)
+
+
+class MemberStream:
+    """Iterate bytes [start, stop) of an open zip member in fixed-size chunks,
+    decompressing as it goes instead of materialising the whole member."""
+
+    def __init__(self, member, start: int, stop: int, chunk_size: int):
+        self._member = member
+        self._start = start
+        self._remaining = stop - start
+        self._chunk_size = chunk_size
+
+    def __iter__(self):
+        try:
+            if self._start:
+                self._member.seek(self._start)
+            while self._remaining > 0:
+                chunk = self._member.read(min(self._chunk_size, self._remaining))
+                if not chunk:
+                    break
+                self._remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._member.close()
@@ -0,0 +1,38 @@
+"""Change feed over the books table.
+
+Every catalog-visible write to ``books`` bumps ``catalog_state.seq`` and
+stamps the row's ``change_seq`` with the new value; deletes leave a
+tombstone at theirs (see ``models.CATALOG_CHANGE_DDL``). Anything holding
+a copy of the catalog can therefore remember the seq it was built at and
+later ask for just the rows that changed since.
+
+Always read the seq *before* the rows it describes: a write landing in
+between then shows up again in the next delta instead of being missed, and
+applying a change twice is harmless.
+"""
+
+from sqlalchemy import select
+
+from .models import Book, catalog_state, catalog_tombstones, db
+
+
+def current_seq() -> int:
+    return db.session.execute(
+        select(catalog_state.c.seq).where(catalog_state.c.id == 1)
+    ).scalar_one()
+
+
+def changed_books(since: int, *columns):
+    """Query of `columns` for books inserted or changed after `since`."""
+    return db.session.query(*columns).filter(Book.change_seq > since)
+
+
+def deleted_since(since: int) -> list[int]:
+    """Ids of books deleted after `since` (and not since re-inserted)."""
+    return list(
+        db.session.execute(
+            select(catalog_tombstones.c.book_id).where(
+                catalog_tombstones.c.change_seq > since
+            )
+        ).scalars()
+    )
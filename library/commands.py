@@ -2,27 +2,131 @@ import logging
 import os
 import re
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import closing
 from datetime import datetime
+from itertools import repeat
 
 import click
-from ebooklib import epub
 from flask import current_app
 from flask.cli import with_appcontext
 from sqlalchemy.engine import make_url
 
+from .archives import epub_archives
 from .choices import UserRoleChoice
-from .models import Book, User, db
-from .utils import extract_metadata, get_epub_cover_path
+from .duplicates import duplicate_groups, similarity, unpack_signature
+from .identifiers import identifier_rows, normalize_identifiers
+from .models import Book, BookIdentifier, User, book_tags, db
+from .scanner import (
+    ScanDiff,
+    diff_directory,
+    has_sentinel,
+    load_manifest,
+    save_manifest,
+)
+from .search import (
+    pending_content_query,
+    read_for_content_index,
+    store_content_index,
+)
+from .similar import rebuild_similar, update_similar_books
+from .storage import BookStorage, LocalStorage, book_storage
+from .utils import book_columns, get_epub_cover_path
 
 logger = logging.getLogger(__name__)
 
 _BACKUP_FILENAME_RE = re.compile(r"^library-\d{8}-\d{6}\.db$")
 
 
-def _resolve_book_dir(directory: str | None) -> str:
-    book_dir = directory or current_app.config["BOOK_DIR"]
-    return os.path.abspath(book_dir)
+def _resolve_storage(directory: str | None) -> BookStorage:
+    """The app's book storage, or a local directory given with --directory."""
+    if directory:
+        return LocalStorage(directory)
+    return book_storage()
+
+
+def _storage_unavailable(storage: BookStorage) -> bool:
+    if isinstance(storage, LocalStorage) and not os.path.isdir(storage.root):
+        logger.error(f"Directory {storage.root} does not exist")
+        return True
+    return False
+
+
+def _read_for_import(
+    storage: BookStorage, filename: str
+) -> tuple[str, dict | None, str | None]:
+    """Pool worker: ``(filename, metadata, error)`` for one EPUB.
+
+    Errors come back as values so one bad file never tears down the pool.
+    """
+    try:
+        return filename, storage.read_ingest_metadata(filename), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+def _map_books(worker, storage: BookStorage, filenames: list[str], jobs: int):
+    """Yield ``worker(storage, filename)`` for each file in order, in a
+    process pool when jobs > 1."""
+    if jobs <= 1:
+        yield from map(worker, repeat(storage), filenames)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(
+            worker,
+            repeat(storage),
+            filenames,
+            chunksize=max(1, min(64, len(filenames) // jobs)),
+        )
+
+
+def _read_many_for_import(storage: BookStorage, filenames: list[str], jobs: int):
+    """Yield ``_read_for_import`` results, in a process pool when jobs > 1."""
+    return _map_books(_read_for_import, storage, filenames, jobs)
+
+
+def _book_from_metadata(filename: str, metadata: dict, access_level: str) -> Book:
+    return Book(
+        title=metadata["title"],
+        author=metadata["author"],
+        filename=filename,
+        cover_path=metadata["cover_path"],  # Path within the epub
+        access_level=access_level,
+        identifiers=identifier_rows(metadata["identifiers"]),
+        **book_columns(metadata),
+    )
+
+
+def _commit_import_batch(filenames: list[str]) -> bool:
+    try:
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.error(
+            f"Error committing batch of {len(filenames)} books "
+            f"({filenames[0]} .. {filenames[-1]}): {str(e)}"
+        )
+        return False
+
+
+def _import_one_by_one(
+    batch: list[tuple[str, dict]], access_level: str
+) -> list[tuple[str, str]]:
+    """Retry a batch whose commit failed one book per commit, so the books
+    that are fine still go in and each error is pinned on its file. Returns
+    ``(filename, error)`` for the books that failed again."""
+    errors = []
+    for filename, metadata in batch:
+        db.session.add(_book_from_metadata(filename, metadata, access_level))
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error importing {filename}: {str(e)}")
+            errors.append((filename, str(e)))
+    return errors
 
 
 @click.command("import-books")
@@ -30,72 +134,499 @@ def _resolve_book_dir(directory: str | None) -> str:
 @click.option(
     "--access-level", default="standard", help="Default access level for imported books"
 )
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Worker processes used to parse EPUBs",
+)
+@click.option(
+    "--batch-size",
+    default=500,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Books per database commit",
+)
 @with_appcontext
-def import_books_command(directory, access_level):
-    """Import books from the specified directory."""
-    book_dir = _resolve_book_dir(directory)
-
-    if not os.path.isdir(book_dir):
-        logger.error(f"Directory {book_dir} does not exist")
+def import_books_command(directory, access_level, jobs, batch_size):
+    """Import books from the specified directory (default: book storage)."""
+    storage = _resolve_storage(directory)
+    if _storage_unavailable(storage):
         return
 
-    success_count = 0
-    error_count = 0
+    started = time.perf_counter()
+    existing = {filename for (filename,) in db.session.query(Book.filename)}
+
+    pending = []
     skip_count = 0
+    for filename in sorted(name for name, _ in storage.list()):
+        if filename in existing:
+            logger.info(f"Skipping {filename} - already in database")
+            skip_count += 1
+            continue
+        pending.append(filename)
 
-    for filename in os.listdir(book_dir):
-        if not filename.endswith(".epub"):
+    success_count = 0
+    errors: list[tuple[str, str]] = []
+    batch: list[tuple[str, dict]] = []
+
+    def flush():
+        nonlocal success_count
+        if not batch:
+            return
+        if _commit_import_batch([filename for filename, _ in batch]):
+            success_count += len(batch)
+        else:
+            failed = _import_one_by_one(batch, access_level)
+            success_count += len(batch) - len(failed)
+            errors.extend(failed)
+        batch.clear()
+
+    # Only the OPF is parsed; chapter and image bytes are never read.
+    for filename, metadata, error in _read_many_for_import(storage, pending, jobs):
+        if error is not None:
+            errors.append((filename, error))
+            logger.error(f"Error processing {filename}: {error}")
             continue
+        if not metadata["cover_path"]:
+            logger.warning(f"No cover reference found in {filename}")
+
+        db.session.add(_book_from_metadata(filename, metadata, access_level))
+        batch.append((filename, metadata))
+        logger.info(f"Read metadata: {filename}")
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    elapsed = time.perf_counter() - started
+    rate = success_count / elapsed if elapsed > 0 else 0.0
+    error_lines = "".join(f"\n  - {name}: {error}" for name, error in errors)
+    logger.info(f"""
+Import completed in {elapsed:.1f}s ({rate:.1f} books/s, {jobs} job(s)):
+- Successfully imported: {success_count} books
+- Skipped (already exists): {skip_count} books
+- Errors: {len(errors)} books{error_lines}
+""")
 
-        full_path = os.path.join(book_dir, filename)
 
-        # Check if book already exists
-        existing_book = Book.query.filter_by(filename=filename).first()
-        if existing_book:
-            logger.info(f"Skipping {filename} - already in database")
-            skip_count += 1
-            continue
+def _apply_scan(
+    storage: LocalStorage, diff: ScanDiff, access_level: str, jobs: int, prune: bool
+) -> dict[str, int]:
+    """Bring the books table in line with `diff`; returns per-action counts.
 
-        try:
-            # Read EPUB file
-            epub_book = epub.read_epub(full_path, options={"ignore_ncx": True})
-            metadata = extract_metadata(epub_book)
-
-            if metadata:
-                # Get cover path within the epub
-                cover_path = get_epub_cover_path(full_path)
-
-                # Create new book record
-                book = Book(
-                    title=metadata["title"],
-                    author=metadata["author"],
-                    filename=filename,
-                    cover_path=cover_path,  # Store the path within the epub
-                    access_level=access_level,
-                )
-                db.session.add(book)
-                success_count += 1
-                logger.info(f"Successfully imported: {filename}")
-            else:
-                error_count += 1
-                logger.error(f"Could not extract metadata from {filename}")
+    Changed files only get their cover path, stats and file state refreshed:
+    title and author may have been edited in the UI and are left alone.
+    """
+    counts = dict.fromkeys(("added", "updated", "renamed", "removed", "errors"), 0)
+    books = {
+        book.filename: book
+        for book in Book.query.filter(
+            Book.filename.in_(
+                diff.new
+                + diff.changed
+                + diff.removed
+                + [old for old, _ in diff.renamed]
+            )
+        )
+    }
+
+    for old, new in diff.renamed:
+        book = books.get(old)
+        if book is not None and new not in books:
+            book.filename = new
+            counts["renamed"] += 1
+            logger.info(f"Renamed {old} -> {new}")
+        elif new not in books:
+            diff.new.append(new)
+
+    filenames = [
+        name
+        for name in diff.new + diff.changed
+        if name in diff.changed or name not in books
+    ]
+    for filename, metadata, error in _read_many_for_import(storage, filenames, jobs):
+        epub_archives.invalidate(storage.path(filename))
+        if error is not None:
+            counts["errors"] += 1
+            logger.error(f"Error processing {filename}: {error}")
+            continue
+        book = books.get(filename)
+        if book is None:
+            db.session.add(_book_from_metadata(filename, metadata, access_level))
+            counts["added"] += 1
+            logger.info(f"Added {filename}")
+        else:
+            book.cover_path = metadata["cover_path"]
+            book.identifiers = identifier_rows(metadata["identifiers"])
+            for field, value in book_columns(metadata).items():
+                setattr(book, field, value)
+            counts["updated"] += 1
+            logger.info(f"Refreshed {filename}")
+
+    for filename in diff.removed:
+        book = books.get(filename)
+        if book is None:
+            continue
+        if not prune:
+            logger.warning(f"{filename} is gone from disk; pass --prune to drop it")
+            continue
+        db.session.execute(book_tags.delete().where(book_tags.c.book_id == book.id))
+        db.session.delete(book)
+        counts["removed"] += 1
+        logger.info(f"Removed {filename}")
 
-        except Exception as e:
-            error_count += 1
-            logger.error(f"Error processing {filename}: {str(e)}")
+    db.session.commit()
+    return counts
+
+
+def _scan_once(
+    storage: LocalStorage,
+    manifest_path: str,
+    access_level: str,
+    jobs: int,
+    prune: bool,
+) -> ScanDiff:
+    book_dir = storage.root
+    manifest = load_manifest(manifest_path)
+    diff = diff_directory(book_dir, manifest)
+    if (
+        manifest
+        and not diff.seen
+        and not diff.unsettled
+        and not has_sentinel(book_dir)
+    ):
+        # An empty listing where books used to be is far more likely an
+        # unmounted share than a deleted library (see BOOK_DIR_SENTINEL).
+        logger.error(
+            f"{book_dir} is empty; not treating {len(manifest)} books as removed"
+        )
+        return ScanDiff()
+    if not diff:
+        return diff
 
-    # Commit all changes
+    started = time.perf_counter()
     try:
-        db.session.commit()
-        logger.info(f"""
-Import completed:
-- Successfully imported: {success_count} books
-- Skipped (already exists): {skip_count} books
-- Errors: {error_count} books
-""")
+        counts = _apply_scan(storage, diff, access_level, jobs, prune)
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error committing to database: {str(e)}")
+        # Leave the manifest as it was so the next pass retries these files.
+        logger.error(f"Error applying scan of {book_dir}: {str(e)}")
+        return diff
+
+    files = dict(diff.seen)
+    # Keep entries for files still copying in, and for removals that were not
+    # pruned, so a later pass (or a --prune run) still sees them.
+    kept = diff.unsettled + ([] if prune else diff.removed)
+    files.update((name, manifest[name]) for name in kept if name in manifest)
+    save_manifest(manifest_path, files)
+    logger.info(
+        f"Scan of {book_dir} finished in {time.perf_counter() - started:.1f}s: "
+        + ", ".join(f"{n} {action}" for action, n in counts.items())
+    )
+    return diff
+
+
+@click.command("scan-library")
+@click.option(
+    "--directory", help="Directory containing EPUB files (overrides BOOK_DIR)"
+)
+@click.option(
+    "--manifest",
+    help="Stat manifest path (overrides LIBRARY_SCAN_MANIFEST)",
+)
+@click.option(
+    "--access-level", default="standard", help="Default access level for new books"
+)
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Worker processes used to parse EPUBs",
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Delete books whose EPUB has disappeared (otherwise only warn)",
+)
+@click.option("--watch", is_flag=True, help="Keep polling for changes")
+@click.option(
+    "--interval",
+    default=10.0,
+    show_default=True,
+    type=click.FloatRange(min=0.1),
+    help="Seconds between polls in --watch mode",
+)
+@with_appcontext
+def scan_library_command(
+    directory, manifest, access_level, jobs, prune, watch, interval
+):
+    """Ingest new, changed and removed EPUBs since the last scan.
+
+    Only a directory listing and stat calls are needed when nothing changed.
+    --watch polls rather than relying on inotify, which does not report
+    changes made on other hosts to a network mount.
+    """
+    storage = _resolve_storage(directory)
+    if not isinstance(storage, LocalStorage):
+        # Renames are detected by inode, which only a filesystem has.
+        raise click.ClickException(
+            "scan-library works on a local directory; pass --directory "
+            "or use import-books with remote storage."
+        )
+    manifest_path = manifest or current_app.config["LIBRARY_SCAN_MANIFEST"]
+    if _storage_unavailable(storage):
+        return
+    book_dir = storage.root
+
+    diff = _scan_once(storage, manifest_path, access_level, jobs, prune)
+    if not watch:
+        if not diff:
+            logger.info(f"No changes in {book_dir}")
+        return
+
+    logger.info(f"Watching {book_dir} every {interval:g}s")
+    try:
+        while True:
+            time.sleep(interval)
+            if not os.path.isdir(book_dir):
+                logger.error(f"Directory {book_dir} is unavailable")
+                continue
+            try:
+                _scan_once(storage, manifest_path, access_level, jobs, prune)
+            except OSError as e:
+                # A file vanishing mid-scan or the mount dropping out; the
+                # next pass starts from the last saved manifest.
+                db.session.rollback()
+                logger.error(f"Scan of {book_dir} failed: {str(e)}")
+    except KeyboardInterrupt:
+        pass
+
+
+@click.command("backfill-book-stats")
+@click.option(
+    "--all",
+    "refresh_all",
+    is_flag=True,
+    help="Re-measure books that already have stats",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Worker processes used to read EPUBs",
+)
+@click.option(
+    "--batch-size",
+    default=500,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Books per database commit",
+)
+@with_appcontext
+def backfill_book_stats_command(refresh_all, jobs, batch_size):
+    """Store text size, chapter/image counts, file state and identifiers for
+    books missing them (--all: every book, e.g. after an upgrade adds a new
+    column)."""
+    storage = book_storage()
+    query = db.session.query(Book.id, Book.filename)
+    if not refresh_all:
+        query = query.filter(
+            db.or_(Book.epub_text_size.is_(None), Book.file_fingerprint.is_(None))
+        )
+    ids_by_filename = {filename: id for id, filename in query}
+
+    updated = 0
+    error_count = 0
+    batch = 0
+    results = _read_many_for_import(storage, list(ids_by_filename), jobs)
+    for filename, metadata, error in results:
+        if error is not None:
+            error_count += 1
+            logger.error(f"backfill-book-stats: {filename}: {error}")
+            continue
+        book_id = ids_by_filename[filename]
+        db.session.query(Book).filter_by(id=book_id).update(book_columns(metadata))
+        db.session.query(BookIdentifier).filter_by(book_id=book_id).delete()
+        db.session.add_all(
+            BookIdentifier(book_id=book_id, scheme=scheme, value=value)
+            for scheme, value in normalize_identifiers(metadata["identifiers"])
+        )
+        batch += 1
+        if batch >= batch_size:
+            db.session.commit()
+            updated += batch
+            batch = 0
+    db.session.commit()
+    updated += batch
+
+    click.echo(
+        f"backfill-book-stats: updated {updated} book(s), {error_count} error(s)"
+    )
+
+
+def _index_content_once(
+    storage: BookStorage, refresh_all: bool, jobs: int, batch_size: int
+) -> tuple[int, int]:
+    ids_by_filename = {
+        filename: id
+        for id, filename in pending_content_query(refresh_all)
+        .with_entities(Book.id, Book.filename)
+        .order_by(Book.id)
+    }
+    indexed = 0
+    error_count = 0
+    batch = 0
+    results = _map_books(
+        read_for_content_index, storage, list(ids_by_filename), jobs
+    )
+    for filename, state, chapters, error in results:
+        if error is not None:
+            error_count += 1
+            logger.error(f"index-content: {filename}: {error}")
+            continue
+        book = db.session.get(Book, ids_by_filename[filename])
+        if book is None:  # Deleted while it was being read
+            continue
+        store_content_index(book, state, chapters)
+        batch += 1
+        # Short transactions, so web requests aren't kept waiting on the
+        # write lock, and an interrupted run keeps what it has done.
+        if batch >= batch_size:
+            db.session.commit()
+            indexed += batch
+            batch = 0
+    db.session.commit()
+    indexed += batch
+    # Books indexed now or by earlier runs join the "more like this" lists.
+    update_similar_books(batch_size)
+    return indexed, error_count
+
+
+@click.command("index-content")
+@click.option(
+    "--all",
+    "refresh_all",
+    is_flag=True,
+    help="Re-index books whose contents are already indexed",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Worker processes used to extract chapter text",
+)
+@click.option(
+    "--batch-size",
+    default=20,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Books per database commit",
+)
+@click.option("--watch", is_flag=True, help="Keep indexing new and changed books")
+@click.option(
+    "--interval",
+    default=30.0,
+    show_default=True,
+    type=click.FloatRange(min=0.1),
+    help="Seconds between passes in --watch mode",
+)
+@with_appcontext
+def index_content_command(refresh_all, jobs, batch_size, watch, interval):
+    """Index the chapter text of new and changed books for /search.
+
+    Books are committed a batch at a time and recorded with the fingerprint
+    of the file that was read, so an interrupted run picks up where it
+    stopped and a book is read again only when its EPUB changes. Newly
+    indexed books are then added to the "more like this" lists (see
+    build-similar).
+    """
+    storage = book_storage()
+    indexed, error_count = _index_content_once(
+        storage, refresh_all, jobs, batch_size
+    )
+    click.echo(f"index-content: indexed {indexed} book(s), {error_count} error(s)")
+    if not watch:
+        return
+
+    logger.info(f"Indexing new and changed books every {interval:g}s")
+    try:
+        while True:
+            time.sleep(interval)
+            indexed, error_count = _index_content_once(
+                storage, False, jobs, batch_size
+            )
+            if indexed or error_count:
+                logger.info(
+                    f"index-content: indexed {indexed} book(s), "
+                    f"{error_count} error(s)"
+                )
+    except KeyboardInterrupt:
+        pass
+
+
+@click.command("build-similar")
+@with_appcontext
+def build_similar_command():
+    """Recompute "more like this" neighbours for every indexed book.
+
+    Scores all books against each other with fresh TF-IDF weights. Books
+    indexed later are added by `flask index-content` as they arrive; rerun
+    this now and then (e.g. weekly) so weights keep up with the library.
+    """
+    books, neighbours = rebuild_similar()
+    db.session.commit()
+    click.echo(f"build-similar: {books} book(s), {neighbours} neighbour link(s)")
+
+
+@click.command("find-duplicates")
+@click.option(
+    "--threshold",
+    type=click.FloatRange(0, 1),
+    help="Share of text in common to report (default LIBRARY_DUPLICATE_THRESHOLD)",
+)
+@with_appcontext
+def find_duplicates_command(threshold):
+    """Report books whose contents are near-duplicates of one another.
+
+    Compares the MinHash signatures recorded by `flask index-content`, so
+    run that first. Each group lists its books oldest first, with each later
+    copy's similarity to the first and the space the later copies take up.
+    """
+    if threshold is None:
+        threshold = current_app.config["LIBRARY_DUPLICATE_THRESHOLD"]
+    groups = duplicate_groups(threshold)
+    books = {
+        book.id: book
+        for book in Book.query.filter(
+            Book.id.in_([book_id for group in groups for book_id in group])
+        )
+    }
+
+    redundant_bytes = 0
+    for n, group in enumerate(groups, start=1):
+        first = books[group[0]]
+        click.echo(f"Group {n} ({len(group)} books):")
+        click.echo(f"        {first.filename}  {first.title!r} by {first.author}")
+        for book_id in group[1:]:
+            book = books[book_id]
+            score = similarity(
+                unpack_signature(first.content_minhash),
+                unpack_signature(book.content_minhash),
+            )
+            click.echo(
+                f"  {score:4.0%}  {book.filename}  {book.title!r} by {book.author}"
+            )
+            redundant_bytes += book.file_size or 0
+
+    copies = sum(len(group) - 1 for group in groups)
+    click.echo(
+        f"find-duplicates: {len(groups)} group(s), {copies} extra copies "
+        f"taking {redundant_bytes / 1024**2:.1f} MiB"
+    )
 
 
 @click.command("create-user")
@@ -125,9 +656,9 @@ def refresh_cover_paths_command(directory: str | None, filename: str | None) ->
     """Re-scan each EPUB and update ``books.cover_path`` from the package document.
 
     Use after upgrading cover discovery or if covers fail due to stale paths in
-    the database. Requires BOOK_DIR (or mount) to contain the files.
+    the database. Requires book storage (or --directory) to contain the files.
     """
-    book_dir = _resolve_book_dir(directory)
+    storage = _resolve_storage(directory)
 
     if filename:
         books = Book.query.filter_by(filename=filename).all()
@@ -142,13 +673,13 @@ def refresh_cover_paths_command(directory: str | None, filename: str | None) ->
     missing = 0
     errors = 0
     for book in books:
-        full_path = os.path.join(book_dir, book.filename)
-        if not os.path.isfile(full_path):
-            logger.warning("refresh-cover-paths: missing file %s", full_path)
+        if not storage.exists(book.filename):
+            logger.warning("refresh-cover-paths: missing file %s", book.filename)
             missing += 1
             continue
         try:
-            new_path = get_epub_cover_path(full_path)
+            with storage.open(book.filename) as f:
+                new_path = get_epub_cover_path(f)
         except Exception as e:
             logger.error("refresh-cover-paths: %s: %s", book.filename, e)
             errors += 1
@@ -240,6 +771,11 @@ def backup_db_command(dest_dir: str, keep: int) -> None:
 def init_commands(app):
     """Register CLI commands."""
     app.cli.add_command(import_books_command)
+    app.cli.add_command(scan_library_command)
+    app.cli.add_command(backfill_book_stats_command)
+    app.cli.add_command(index_content_command)
+    app.cli.add_command(build_similar_command)
+    app.cli.add_command(find_duplicates_command)
     app.cli.add_command(create_user_command)
     app.cli.add_command(refresh_cover_paths_command)
     app.cli.add_command(backup_db_command)
@@ -28,10 +28,61 @@ class Config:
     # Book directory
     BOOK_DIR = os.getenv("BOOK_DIR", os.path.join(BASE_DIR, "books"))
 
+    # On-disk cache for parsed EPUB data (structure and pre-rendered chapters),
+    # shared by every gunicorn worker.
+    # Entries are keyed on the file's mtime+size, so a rewritten EPUB simply
+    # misses; orphaned entries are pruned once the threshold is reached.
+    EPUB_CACHE_DIR = os.getenv("EPUB_CACHE_DIR", os.path.join(DATA_DIR, "epub_cache"))
+    EPUB_CACHE_THRESHOLD = int(os.getenv("EPUB_CACHE_THRESHOLD", "20000"))
+
+    # ETags and cache keys come from the file size/mtime/fingerprint recorded
+    # on each Book. Full responses re-check the file (they read it anyway);
+    # 304s trust the DB and re-stat a given book at most this often (seconds)
+    # per worker, which matters when BOOK_DIR is a network mount.
+    BOOK_FILE_VERIFY_INTERVAL = int(os.getenv("BOOK_FILE_VERIFY_INTERVAL", "600"))
+
+    # Stat manifest (size, mtime, inode per EPUB) that lets `flask scan-library`
+    # touch only files that were added, changed or removed since its last pass.
+    LIBRARY_SCAN_MANIFEST = os.getenv(
+        "LIBRARY_SCAN_MANIFEST", os.path.join(DATA_DIR, "scan_manifest.json")
+    )
+
+    # Where EPUBs live: "local" (BOOK_DIR) or "s3" (an S3-compatible bucket
+    # such as MinIO, so several app nodes can share one library). With S3,
+    # reads go through EPUB_LOCAL_CACHE_DIR, which defaults to DATA_DIR/epub_local.
+    BOOK_STORAGE = os.getenv("BOOK_STORAGE", "local")
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+    S3_BUCKET = os.getenv("S3_BUCKET")
+    S3_PREFIX = os.getenv("S3_PREFIX", "")
+    S3_REGION = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+    S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+
+    # Optional local (SSD) copy of recently read EPUBs for when BOOK_DIR is slow
+    # storage. Unset to read straight from BOOK_DIR. Copies are checked against
+    # the source's size and mtime, and least-recently-read ones are evicted
+    # once the directory passes EPUB_LOCAL_CACHE_MAX_BYTES.
+    EPUB_LOCAL_CACHE_DIR = os.getenv("EPUB_LOCAL_CACHE_DIR") or None
+    EPUB_LOCAL_CACHE_MAX_BYTES = int(
+        os.getenv("EPUB_LOCAL_CACHE_MAX_BYTES", str(20 * 1024**3))
+    )
+
+    # Open EPUB archives kept per worker process so repeat reads (assets,
+    # covers, chapters) skip re-parsing the zip central directory.
+    EPUB_ARCHIVE_POOL_SIZE = int(os.getenv("EPUB_ARCHIVE_POOL_SIZE", "32"))
+
     # Fuzzy match cutoff (0–1) for the /books title+author lookup the book-scanner
     # app uses to ask "do I already own this?". Lower = more lenient. Tunable per
     # deployment without a code change.
     LIBRARY_MATCH_THRESHOLD = float(os.getenv("LIBRARY_MATCH_THRESHOLD", "0.6"))
+    # Books scored exactly per lookup, after the candidate index (see
+    # match_index.py) has picked the likeliest. Raise if good matches are missed.
+    LIBRARY_MATCH_CANDIDATES = int(os.getenv("LIBRARY_MATCH_CANDIDATES", "100"))
+    # Estimated share of text (0–1) two books must have in common for upload
+    # warnings and `flask find-duplicates` to call them the same edition.
+    LIBRARY_DUPLICATE_THRESHOLD = float(
+        os.getenv("LIBRARY_DUPLICATE_THRESHOLD", "0.8")
+    )
 
     # When set (e.g. "X-Forwarded-User"), trust the dashboard nginx header instead of
     # Flask-Login sessions. Unset for standalone dev / step-4 routing tests.
@@ -0,0 +1,212 @@
+"""Near-duplicate editions by content, with MinHash signatures and LSH.
+
+Title and author matching (matching.py) misses the same text uploaded under
+another title, or a second copy that generate_filename gave a ``_2`` name.
+This compares what the books say instead:
+
+* A book is reduced to its set of word shingles (runs of SHINGLE_WORDS
+  words), and the set to a NUM_HASHES-value MinHash signature. Two
+  signatures agree in about the same fraction of places as the shingle sets
+  overlap (their Jaccard similarity).
+* The signature is cut into BANDS bands, each hashed to a bucket stored in
+  ``book_lsh_buckets``. Books sharing any bucket are the candidates, found
+  with an indexed lookup rather than a comparison against every book; only
+  those are compared signature to signature. With 16 bands of 8 rows, books
+  at 0.8 similarity share a bucket 97% of the time and books at 0.4 under 1%.
+
+Signatures use one-permutation hashing: each shingle is hashed once and
+lands in one of NUM_HASHES bins, each keeping its minimum. That is a single
+hash per shingle instead of one per permutation, so a whole book takes well
+under a second. Empty bins borrow from the next filled one, so short books
+still get a full signature.
+
+Signatures are computed with the chapter text in ``flask index-content``
+(see search.store_content_index); books not yet indexed are never reported.
+"""
+
+import re
+import struct
+from hashlib import blake2b
+
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.orm import aliased
+
+from .models import Book, book_lsh_buckets, db
+
+NUM_HASHES = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+SHINGLE_WORDS = 5
+
+# Estimated share of shingles two books must have in common to be reported.
+# Overridable per deployment via LIBRARY_DUPLICATE_THRESHOLD.
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+_WORD_RE = re.compile(r"\w+")
+_EMPTY = 1 << 32  # Above every 32-bit bin value
+_SIGNATURE = struct.Struct(f"<{NUM_HASHES}I")
+_BAND = struct.Struct(f"<{ROWS_PER_BAND}I")
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+def shingles(chapters) -> set[str]:
+    """Lower-cased SHINGLE_WORDS-word runs of the text of `chapters` (dicts
+    with a ``text`` key). Shingles don't span chapters; a chapter shorter
+    than one shingle counts as one."""
+    result = set()
+    for chapter in chapters:
+        words = _WORD_RE.findall(chapter["text"].lower())
+        if 0 < len(words) < SHINGLE_WORDS:
+            result.add(" ".join(words))
+        for i in range(len(words) - SHINGLE_WORDS + 1):
+            result.add(" ".join(words[i : i + SHINGLE_WORDS]))
+    return result
+
+
+def minhash(chapters) -> list[int] | None:
+    """MinHash signature (NUM_HASHES 32-bit ints) of the text of `chapters`,
+    or None when there are no words to go on."""
+    bins = [_EMPTY] * NUM_HASHES
+    for shingle in shingles(chapters):
+        h = _hash64(shingle.encode())
+        i = h % NUM_HASHES
+        value = h >> 32
+        if value < bins[i]:
+            bins[i] = value
+    if all(value == _EMPTY for value in bins):
+        return None
+    # Densify: an empty bin takes the value of the next filled one (wrapping
+    # round), which books with the same shingles agree on too.
+    signature = []
+    for i in range(NUM_HASHES):
+        j = i
+        while bins[j % NUM_HASHES] == _EMPTY:
+            j += 1
+        signature.append(bins[j % NUM_HASHES])
+    return signature
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b, strict=True)) / NUM_HASHES
+
+
+def pack_signature(signature: list[int]) -> bytes:
+    return _SIGNATURE.pack(*signature)
+
+
+def unpack_signature(data: bytes) -> list[int]:
+    return list(_SIGNATURE.unpack(data))
+
+
+def band_buckets(signature: list[int]) -> list[tuple[int, int]]:
+    """``(band, bucket)`` for each band of `signature`. Buckets are signed
+    64-bit so they fit an SQLite INTEGER."""
+    return [
+        (
+            band,
+            int.from_bytes(
+                blake2b(
+                    _BAND.pack(*signature[start : start + ROWS_PER_BAND]),
+                    digest_size=8,
+                ).digest(),
+                "little",
+                signed=True,
+            ),
+        )
+        for band, start in enumerate(range(0, NUM_HASHES, ROWS_PER_BAND))
+    ]
+
+
+def store_signature(book: Book, signature: list[int] | None) -> None:
+    """Record `book`'s signature and its LSH buckets, replacing any earlier
+    ones. `book` must have an id; the caller commits."""
+    db.session.execute(
+        delete(book_lsh_buckets).where(book_lsh_buckets.c.book_id == book.id)
+    )
+    book.content_minhash = pack_signature(signature) if signature else None
+    if signature:
+        db.session.execute(
+            insert(book_lsh_buckets),
+            [
+                {"book_id": book.id, "band": band, "bucket": bucket}
+                for band, bucket in band_buckets(signature)
+            ],
+        )
+
+
+def near_duplicates(
+    signature: list[int], threshold: float, exclude_id: int | None = None
+) -> list[tuple[Book, float]]:
+    """Books whose contents match `signature` at `threshold` or above, most
+    similar first, as ``(book, similarity)`` pairs."""
+    in_bucket = or_(
+        *(
+            and_(book_lsh_buckets.c.band == band, book_lsh_buckets.c.bucket == bucket)
+            for band, bucket in band_buckets(signature)
+        )
+    )
+    query = Book.query.filter(
+        Book.id.in_(select(book_lsh_buckets.c.book_id).where(in_bucket))
+    )
+    if exclude_id is not None:
+        query = query.filter(Book.id != exclude_id)
+
+    matches = []
+    for book in query:
+        score = similarity(signature, unpack_signature(book.content_minhash))
+        if score >= threshold:
+            matches.append((book, score))
+    matches.sort(key=lambda match: (-match[1], match[0].id))
+    return matches
+
+
+def duplicate_groups(threshold: float) -> list[list[int]]:
+    """Ids of books whose contents match at `threshold` or above, grouped
+    (a matches b and b matches c puts all three together) and sorted by id.
+
+    Candidate pairs come from a self-join on the bucket index, so the work
+    grows with the number of books sharing buckets, not with every pair.
+    """
+    a = aliased(book_lsh_buckets)
+    b = aliased(book_lsh_buckets)
+    pairs = db.session.execute(
+        select(a.c.book_id, b.c.book_id)
+        .join(b, and_(a.c.band == b.c.band, a.c.bucket == b.c.bucket))
+        .where(a.c.book_id < b.c.book_id)
+        .distinct()
+    ).all()
+    if not pairs:
+        return []
+
+    ids = {book_id for pair in pairs for book_id in pair}
+    signatures = {
+        book_id: unpack_signature(data)
+        for book_id, data in db.session.query(Book.id, Book.content_minhash).filter(
+            Book.id.in_(ids), Book.content_minhash.is_not(None)
+        )
+    }
+
+    # Union-find over the pairs that hold up on the full signature.
+    parent = {}
+
+    def root(book_id):
+        while parent.get(book_id, book_id) != book_id:
+            book_id = parent[book_id]
+        return book_id
+
+    for x, y in pairs:
+        if x in signatures and y in signatures:
+            if similarity(signatures[x], signatures[y]) >= threshold:
+                rx, ry = root(x), root(y)
+                if rx != ry:
+                    parent[max(rx, ry)] = min(rx, ry)
+
+    groups = {}
+    for book_id in parent:  # Every book merged into another; roots aren't keys
+        first = root(book_id)
+        groups.setdefault(first, {first}).add(book_id)
+    return sorted(sorted(members) for members in groups.values())
@@ -0,0 +1,172 @@
+"""Size-bounded local copy of recently read EPUBs.
+
+When BOOK_DIR sits on slow storage (a NAS shared with backup jobs), reads are
+served from copies kept on a local disk instead. A copy is valid only while
+its size and mtime match the source's; ``shutil.copy2`` preserves the mtime,
+so the check is a single local stat against values the caller already knows
+(the ones recorded on ``Book``) or, failing that, one stat of the source.
+Least-recently-read copies are evicted once the directory exceeds its byte
+budget; last use is tracked in each copy's atime.
+
+The cache lives on disk, so every worker shares it. Copies are written to a
+temporary name and renamed into place, and an evicted copy stays readable
+through any handle already open on it.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# A copy's atime is only bumped if it is older than this, so a burst of asset
+# requests for one book doesn't turn into a burst of utime() calls.
+_TOUCH_INTERVAL_NS = 60 * 10**9
+
+
+class LocalFileCache:
+    """Read-through cache of files from `source_dir` under `cache_dir`."""
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = 0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Storage objects carrying a cache are pickled into import workers.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.cache_dir) and self.max_bytes > 0
+
+    def path(
+        self,
+        source_dir: str,
+        filename: str,
+        size: int | None = None,
+        mtime_ns: int | None = None,
+    ) -> str:
+        """Local path to read `filename` from: a valid cached copy when there
+        is one (copying it in first if needed), else the source itself.
+
+        `size` and `mtime_ns` describe the source when the caller already has
+        them; otherwise the source is stat'ed.
+        """
+        source = os.path.join(source_dir, filename)
+        if not self.enabled:
+            return source
+
+        if size is None or mtime_ns is None:
+            try:
+                st = os.stat(source)
+            except OSError:
+                return source
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+
+        def fill(dest: str) -> None:
+            shutil.copy2(source, dest)
+            if os.stat(dest).st_mtime_ns != mtime_ns:
+                raise OSError("source changed while it was being copied")
+
+        return self.lookup(filename, size, mtime_ns, fill) or source
+
+    def lookup(self, filename: str, size: int, mtime_ns: int, fill) -> str | None:
+        """Path of a cached copy of `filename` matching `size` and `mtime_ns`,
+        calling ``fill(dest_path)`` to write one when there is none.
+
+        None when the file can't be cached: caching is off, it is bigger than
+        the whole budget, or what `fill` wrote doesn't match (the source
+        changed mid-copy).
+        """
+        if not self.enabled:
+            return None
+        cached = os.path.join(self.cache_dir, filename)
+        try:
+            st = os.stat(cached)
+        except OSError:
+            st = None
+        if st is not None and (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+            if time.time_ns() - st.st_atime_ns > _TOUCH_INTERVAL_NS:
+                self._touch(cached, mtime_ns)
+            return cached
+
+        if size > self.max_bytes:
+            return None
+        try:
+            self._fill(cached, size, mtime_ns, fill)
+        except OSError as e:
+            logger.warning(f"Could not cache {filename} locally: {e}")
+            return None
+        self._evict()
+        return cached
+
+    def invalidate(self, filename: str) -> None:
+        """Drop the cached copy of `filename`, if any."""
+        if not self.enabled:
+            return
+        try:
+            os.remove(os.path.join(self.cache_dir, filename))
+        except FileNotFoundError:
+            pass
+
+    def _fill(self, cached: str, size: int, mtime_ns: int, fill) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".fill-")
+        os.close(fd)
+        try:
+            fill(tmp_path)
+            if os.path.getsize(tmp_path) != size:
+                raise OSError("source changed while it was being copied")
+            # Stamp the copy with the mtime it was validated against, which is
+            # what the next lookup compares.
+            self._touch(tmp_path, mtime_ns)
+            os.replace(tmp_path, cached)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @staticmethod
+    def _touch(cached: str, mtime_ns: int) -> None:
+        try:
+            os.utime(cached, ns=(time.time_ns(), mtime_ns))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.startswith(".fill-") or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime_ns, st.st_size, entry.path))
+                total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+epub_file_cache = LocalFileCache()
@@ -0,0 +1,93 @@
+"""Normalised book identifiers from the OPF ``dc:identifier`` elements.
+
+Stored per book in ``book_identifiers`` at ingest so a scanned barcode can
+be looked up with one indexed query before falling back to fuzzy title and
+author matching. Three schemes are kept, each in one canonical form:
+
+* ``isbn``: ISBN-13 digits. ISBN-10s are converted, hyphens, spaces and
+  ``urn:isbn:`` prefixes dropped, and check digits verified, so every
+  printing of a number compares equal.
+* ``uuid``: the lower-case hyphenated form.
+* ``calibre``: calibre's own book id, as written by calibre's exporter.
+
+Anything else (DOIs, publisher ids, free text) is ignored.
+"""
+
+import re
+import uuid
+
+from .models import BookIdentifier
+
+ISBN = "isbn"
+UUID = "uuid"
+CALIBRE = "calibre"
+
+_ISBN_PUNCTUATION_RE = re.compile(r"[\s\-]")
+_PREFIX_RE = re.compile(r"^(?:urn:)?(isbn|uuid|calibre)[:\s]\s*", re.IGNORECASE)
+
+
+def normalize_isbn(text: str | None) -> str | None:
+    """ISBN-13 for an ISBN-10 or ISBN-13 in any common notation, or None if
+    `text` isn't one (wrong length, bad check digit)."""
+    if not text:
+        return None
+    digits = _ISBN_PUNCTUATION_RE.sub("", _PREFIX_RE.sub("", text.strip())).upper()
+    if len(digits) == 10 and digits[:9].isdigit() and (
+        digits[9].isdigit() or digits[9] == "X"
+    ):
+        total = sum((10 - i) * int(d) for i, d in enumerate(digits[:9]))
+        total += 10 if digits[9] == "X" else int(digits[9])
+        if total % 11:
+            return None
+        digits = "978" + digits[:9]
+        return digits + _isbn13_check_digit(digits)
+    if len(digits) == 13 and digits.isdigit() and digits[:3] in ("978", "979"):
+        if _isbn13_check_digit(digits[:12]) != digits[12]:
+            return None
+        return digits
+    return None
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum((3 if i % 2 else 1) * int(d) for i, d in enumerate(first12))
+    return str(-total % 10)
+
+
+def normalize_identifier(scheme: str | None, value: str) -> tuple[str, str] | None:
+    """``(scheme, value)`` in canonical form for one ``dc:identifier`` (its
+    ``opf:scheme`` attribute and text), or None when it isn't kept."""
+    scheme = (scheme or "").strip().lower()
+    value = value.strip()
+    prefix = _PREFIX_RE.match(value)
+    if prefix:
+        scheme = scheme or prefix.group(1).lower()
+        value = value[prefix.end():]
+
+    if scheme in (ISBN, ""):
+        isbn = normalize_isbn(value)
+        if isbn:
+            return ISBN, isbn
+    if scheme in (UUID, ""):
+        try:
+            return UUID, str(uuid.UUID(value))
+        except ValueError:
+            pass
+    if scheme == CALIBRE and value:
+        return CALIBRE, value
+    return None
+
+
+def normalize_identifiers(identifiers: list[dict]) -> list[tuple[str, str]]:
+    """Canonical, de-duplicated ``(scheme, value)`` pairs for the
+    ``identifiers`` of a read_ingest_metadata result, in document order."""
+    pairs = (normalize_identifier(i["scheme"], i["value"]) for i in identifiers)
+    return list(dict.fromkeys(pair for pair in pairs if pair is not None))
+
+
+def identifier_rows(identifiers: list[dict]) -> list[BookIdentifier]:
+    """BookIdentifier rows for the ``identifiers`` of a read_ingest_metadata
+    result, ready to assign to ``Book.identifiers``."""
+    return [
+        BookIdentifier(scheme=scheme, value=value)
+        for scheme, value in normalize_identifiers(identifiers)
+    ]
@@ -0,0 +1,36 @@
+"""Per-process :class:`~library.matching.CandidateIndex` over the catalog.
+
+Loaded on first use from a column-only query (no ORM objects), then kept
+current from the catalog change feed (see catalog.py). Each lookup compares
+the index's seq with ``catalog_state``. When they differ, only the books
+changed or deleted since are re-indexed. That covers writes from other
+workers, CLI commands and raw SQL alike, at the cost of one single-row read
+per lookup.
+"""
+
+from flask import current_app
+
+from .catalog import changed_books, current_seq, deleted_since
+from .matching import CandidateIndex, IndexedBook
+from .models import Book, db
+
+_INDEXED_COLUMNS = (Book.id, Book.title, Book.author, Book.filename, Book.access_level)
+
+
+def init_match_index(app) -> None:
+    app.extensions["book_match_index"] = CandidateIndex()
+
+
+def book_match_index() -> CandidateIndex:
+    """The app's index, brought up to date with the catalog first."""
+    index = current_app.extensions["book_match_index"]
+    seq = current_seq()
+    if index.generation is None:
+        index.rebuild(db.session.query(*_INDEXED_COLUMNS))
+    elif index.generation != seq:
+        for row in changed_books(index.generation, *_INDEXED_COLUMNS):
+            index.add(IndexedBook(*row))
+        for book_id in deleted_since(index.generation):
+            index.remove(book_id)
+    index.generation = seq
+    return index
@@ -10,10 +10,20 @@ formatting differences still rank as the same book:
 
 Title carries most of the weight; author only nudges the score when both sides
 have one, since scan metadata frequently omits or mangles the author.
+
+Scoring is too slow to run against every book on each lookup, so
+:class:`CandidateIndex` first narrows the library to the books sharing the
+most (rare) words and character trigrams with the query, and only those are
+scored.
 """
 
+import math
 import re
+import threading
+from collections import defaultdict
 from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import NamedTuple
 
 _TOKEN_RE = re.compile(r"[a-z0-9]+")
 
@@ -29,11 +39,17 @@ def _tokens(text):
     return _TOKEN_RE.findall((text or "").lower())
 
 
+@lru_cache(maxsize=8192)
+def _token_set(text):
+    # Cached: a batch lookup scores the same library titles over and over.
+    return " ".join(sorted(set(_tokens(text))))
+
+
 def _token_set_ratio(a, b):
     """SequenceMatcher ratio over sorted, de-duplicated tokens, so word order
     and punctuation don't matter ("Rowling, J. K." == "J. K. Rowling")."""
-    ta = " ".join(sorted(set(_tokens(a))))
-    tb = " ".join(sorted(set(_tokens(b))))
+    ta = _token_set(a)
+    tb = _token_set(b)
     if not ta or not tb:
         return 0.0
     return SequenceMatcher(None, ta, tb).ratio()
@@ -62,3 +78,115 @@ def rank_matches(query_title, query_author, books, threshold, limit=5):
     scored = [pair for pair in scored if pair[1] >= threshold]
     scored.sort(key=lambda pair: pair[1], reverse=True)
     return scored[:limit]
+
+
+class IndexedBook(NamedTuple):
+    """What the matcher needs of a Book, without loading the ORM object."""
+
+    id: int
+    title: str
+    author: str
+    filename: str
+    access_level: str
+
+
+def _terms(field, text):
+    """Index terms for one field: its words, plus the trigrams of each word
+    padded with ^ and $ so short and misspelt words still overlap."""
+    terms = set()
+    for token in _tokens(text):
+        terms.add(f"{field}w:{token}")
+        padded = f"^{token}$"
+        terms.update(
+            f"{field}g:{padded[i:i + 3]}" for i in range(max(1, len(padded) - 2))
+        )
+    return terms
+
+
+def _book_terms(title, author):
+    return _terms("t", title) | _terms("a", author)
+
+
+class CandidateIndex:
+    """Inverted index from title/author words and trigrams to book ids.
+
+    ``candidates`` scores books by the summed idf of the query terms they
+    share, weighted like :func:`score_book`, and returns the best few for
+    exact scoring. Kept current with ``add``/``remove``; thread-safe.
+    """
+
+    def __init__(self):
+        self._books: dict[int, IndexedBook] = {}
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        self._lock = threading.Lock()
+        # Maintained by the owner (see match_index): the catalog seq the
+        # index reflects, None until first loaded.
+        self.generation = None
+
+    def __len__(self):
+        return len(self._books)
+
+    def rebuild(self, books) -> None:
+        with self._lock:
+            self._books.clear()
+            self._postings.clear()
+            for book in books:
+                self._add(IndexedBook(*book))
+
+    def add(self, book: IndexedBook) -> None:
+        """Index `book`, replacing any entry with the same id."""
+        with self._lock:
+            self._remove(book.id)
+            self._add(book)
+
+    def remove(self, book_id: int) -> None:
+        with self._lock:
+            self._remove(book_id)
+
+    def _add(self, book):
+        self._books[book.id] = book
+        for term in _book_terms(book.title, book.author):
+            self._postings[term].add(book.id)
+
+    def _remove(self, book_id):
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return
+        for term in _book_terms(book.title, book.author):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.discard(book_id)
+                if not posting:
+                    del self._postings[term]
+
+    def candidates(self, title, author, limit, access_levels=None):
+        """Up to `limit` books most likely to match, best first. With
+        `access_levels`, only books at one of those levels are considered."""
+        weights = dict.fromkeys(_terms("t", title), _TITLE_WEIGHT)
+        weights.update(dict.fromkeys(_terms("a", author), _AUTHOR_WEIGHT))
+        with self._lock:
+            total = len(self._books)
+            postings = [
+                (self._postings[term], weight)
+                for term, weight in weights.items()
+                if term in self._postings
+            ]
+            # Rarest first: once enough books are in play, a common term only
+            # adds to their scores instead of dragging in thousands more.
+            postings.sort(key=lambda pair: len(pair[0]))
+            scores = defaultdict(float)
+            for posting, weight in postings:
+                weight *= math.log(1 + total / len(posting))
+                if len(scores) >= limit and len(posting) > len(scores):
+                    for book_id in scores:
+                        if book_id in posting:
+                            scores[book_id] += weight
+                else:
+                    for book_id in posting:
+                        if book_id in scores or (
+                            access_levels is None
+                            or self._books[book_id].access_level in access_levels
+                        ):
+                            scores[book_id] += weight
+            ranked = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+            return [self._books[book_id] for book_id in ranked]
@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from .choices import BookProgressChoice, UserRoleChoice
@@ -77,6 +78,30 @@ class Book(db.Model):
     access_level = db.Column(db.String(20), nullable=False, default="standard")
     created_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
     uploaded_by = db.Column(db.Integer, db.ForeignKey("users.id"))
+    # Measured from the EPUB at ingest (see utils.read_ingest_metadata); NULL
+    # until then or until `flask backfill-book-stats` has run.
+    epub_text_size = db.Column(db.Integer)  # Uncompressed HTML bytes
+    chapter_count = db.Column(db.Integer)
+    image_count = db.Column(db.Integer)
+    # Last-seen state of the EPUB on disk (see utils.read_file_state). ETags
+    # and cache keys are built from the fingerprint so serving a cached copy
+    # needs no stat of BOOK_DIR; routes re-verify against the file on a miss.
+    file_size = db.Column(db.BigInteger)
+    file_mtime_ns = db.Column(db.BigInteger)
+    file_fingerprint = db.Column(db.String(32))
+    # file_fingerprint of the EPUB whose text is in chapter_texts; NULL until
+    # `flask index-content` has read it. A mismatch marks the book for
+    # re-indexing.
+    content_indexed_fingerprint = db.Column(db.String(32))
+    # MinHash signature of the indexed text, for near-duplicate detection
+    # (see duplicates.py); set alongside content_indexed_fingerprint.
+    content_minhash = db.Column(db.LargeBinary)
+    # content_indexed_fingerprint as of the book's entry in book_terms and
+    # book_neighbours (see similar.py); a mismatch queues it for an update.
+    similar_indexed_fingerprint = db.Column(db.String(32))
+    # catalog_state.seq as of this row's last catalog-visible change; set by
+    # the CATALOG_CHANGE_DDL triggers, never by the app (see catalog.py).
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
 
     # Relationships
     tags = db.relationship(
@@ -86,6 +111,267 @@ class Book(db.Model):
         "Bookmark", back_populates="book", cascade="all, delete-orphan"
     )
     uploaded_by_user = db.relationship("User", back_populates="uploaded_books")
+    identifiers = db.relationship(
+        "BookIdentifier", back_populates="book", cascade="all, delete-orphan"
+    )
+
+    # Keyset pagination of the cover grid, newest first (see get_covers).
+    __table_args__ = (
+        db.Index("idx_book_created_id", "created_at", "id"),
+        db.Index("idx_book_access_created_id", "access_level", "created_at", "id"),
+        db.Index("idx_book_change_seq", "change_seq"),
+    )
+
+
+# Full-text index over the filterable Book columns (see search.py). External
+# content, so it stores only the index; triggers keep it in step with every
+# write to books, including raw SQL and bulk updates.
+BOOKS_FTS_DDL = (
+    """CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, author, genre,
+        content='books', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, genre)
+        VALUES (new.id, new.title, new.author, new.genre);
+    END""",
+    """CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.genre);
+    END""",
+    """CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, genre ON books
+    BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.genre);
+        INSERT INTO books_fts(rowid, title, author, genre)
+        VALUES (new.id, new.title, new.author, new.genre);
+    END""",
+)
+
+for _ddl in BOOKS_FTS_DDL:
+    event.listen(
+        Book.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite")
+    )
+event.listen(
+    Book.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect="sqlite"),
+)
+
+
+# Catalog change counter (see catalog.py): a single row whose seq goes up by
+# one for every insert, delete, or change to a column clients sync.
+catalog_state = db.Table(
+    "catalog_state",
+    db.Column("id", db.Integer, primary_key=True),
+    db.Column("seq", db.BigInteger, nullable=False),
+)
+
+# The change_seq at which each deleted book went away.
+catalog_tombstones = db.Table(
+    "catalog_tombstones",
+    db.Column("book_id", db.Integer, primary_key=True),
+    db.Column("change_seq", db.BigInteger, nullable=False, index=True),
+)
+
+# Kept in SQL so raw statements and bulk updates are counted too. A reused
+# book id clears its tombstone, so a client never sees it as both.
+CATALOG_CHANGE_DDL = (
+    "INSERT INTO catalog_state (id, seq) VALUES (1, 0)",
+    """CREATE TRIGGER catalog_books_ai AFTER INSERT ON books BEGIN
+        UPDATE catalog_state SET seq = seq + 1 WHERE id = 1;
+        UPDATE books SET change_seq = (SELECT seq FROM catalog_state WHERE id = 1)
+        WHERE id = new.id;
+        DELETE FROM catalog_tombstones WHERE book_id = new.id;
+    END""",
+    """CREATE TRIGGER catalog_books_au AFTER UPDATE OF
+        title, author, filename, access_level, epub_text_size, file_mtime_ns,
+        file_fingerprint
+    ON books
+    WHEN old.title IS NOT new.title OR old.author IS NOT new.author
+        OR old.filename IS NOT new.filename
+        OR old.access_level IS NOT new.access_level
+        OR old.epub_text_size IS NOT new.epub_text_size
+        OR old.file_mtime_ns IS NOT new.file_mtime_ns
+        OR old.file_fingerprint IS NOT new.file_fingerprint
+    BEGIN
+        UPDATE catalog_state SET seq = seq + 1 WHERE id = 1;
+        UPDATE books SET change_seq = (SELECT seq FROM catalog_state WHERE id = 1)
+        WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER catalog_books_ad AFTER DELETE ON books BEGIN
+        UPDATE catalog_state SET seq = seq + 1 WHERE id = 1;
+        INSERT OR REPLACE INTO catalog_tombstones (book_id, change_seq)
+        SELECT old.id, seq FROM catalog_state WHERE id = 1;
+    END""",
+)
+
+# On the metadata, so books and both catalog tables exist when it runs.
+for _ddl in CATALOG_CHANGE_DDL:
+    event.listen(db.metadata, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+
+
+class BookIdentifier(db.Model):
+    """A normalised ``dc:identifier`` of a book (see identifiers.py)."""
+
+    __tablename__ = "book_identifiers"
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(
+        db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"), nullable=False
+    )
+    scheme = db.Column(db.String(16), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+
+    book = db.relationship("Book", back_populates="identifiers")
+
+    # Several editions or copies can share an identifier, so not unique.
+    __table_args__ = (
+        db.Index("idx_identifier_scheme_value", "scheme", "value"),
+        db.Index("idx_identifier_book", "book_id"),
+    )
+
+
+class ChapterText(db.Model):
+    """Plain text of one spine chapter, indexed by ``chapter_fts``."""
+
+    __tablename__ = "chapter_texts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(
+        db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"), nullable=False
+    )
+    spine_index = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(500))
+    text = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("book_id", "spine_index", name="unique_book_chapter"),
+    )
+
+
+# Full-text index over book contents (see search.py). Like books_fts it is
+# external content, kept in step by triggers. SQLite only enforces the
+# ON DELETE CASCADE above with foreign keys switched on, so deleting a book
+# clears its chapters with a trigger too.
+CHAPTER_FTS_DDL = (
+    """CREATE VIRTUAL TABLE chapter_fts USING fts5(
+        title, text,
+        content='chapter_texts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER chapter_fts_ai AFTER INSERT ON chapter_texts BEGIN
+        INSERT INTO chapter_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END""",
+    """CREATE TRIGGER chapter_fts_ad AFTER DELETE ON chapter_texts BEGIN
+        INSERT INTO chapter_fts(chapter_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END""",
+    """CREATE TRIGGER chapter_fts_au AFTER UPDATE ON chapter_texts BEGIN
+        INSERT INTO chapter_fts(chapter_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO chapter_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END""",
+    """CREATE TRIGGER books_chapter_texts_ad AFTER DELETE ON books BEGIN
+        DELETE FROM chapter_texts WHERE book_id = old.id;
+    END""",
+)
+
+for _ddl in CHAPTER_FTS_DDL:
+    event.listen(
+        ChapterText.__table__,
+        "after_create",
+        DDL(_ddl).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    ChapterText.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS chapter_fts").execute_if(dialect="sqlite"),
+)
+
+
+# LSH buckets of each book's content_minhash, one per band (see
+# duplicates.py). Books sharing a (band, bucket) are near-duplicate candidates.
+book_lsh_buckets = db.Table(
+    "book_lsh_buckets",
+    db.Column(
+        "book_id",
+        db.Integer,
+        db.ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("band", db.SmallInteger, primary_key=True),
+    db.Column("bucket", db.BigInteger, nullable=False),
+    db.Index("idx_lsh_band_bucket", "band", "bucket"),
+)
+
+# Foreign keys are off in SQLite, so a trigger stands in for the cascade.
+BOOK_LSH_DDL = (
+    """CREATE TRIGGER books_lsh_buckets_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_lsh_buckets WHERE book_id = old.id;
+    END""",
+)
+
+for _ddl in BOOK_LSH_DDL:
+    event.listen(
+        book_lsh_buckets, "after_create", DDL(_ddl).execute_if(dialect="sqlite")
+    )
+
+
+# "More like this" (see similar.py). Document frequency of every term seen,
+# the heaviest TF-IDF terms of each book, indexed by term to find books with
+# terms in common, and each book's nearest neighbours, read by /similar.
+similar_terms = db.Table(
+    "similar_terms",
+    db.Column("term", db.String(100), primary_key=True),
+    db.Column("doc_count", db.Integer, nullable=False),
+)
+
+book_terms = db.Table(
+    "book_terms",
+    db.Column(
+        "book_id",
+        db.Integer,
+        db.ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("term", db.String(100), primary_key=True),
+    db.Column("weight", db.Float, nullable=False),
+    db.Index("idx_book_terms_term", "term"),
+)
+
+book_neighbours = db.Table(
+    "book_neighbours",
+    db.Column(
+        "book_id",
+        db.Integer,
+        db.ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column(
+        "neighbour_id",
+        db.Integer,
+        db.ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("score", db.Float, nullable=False),
+    db.Index("idx_book_neighbours_neighbour", "neighbour_id"),
+)
+
+# As for book_lsh_buckets, triggers stand in for the cascades.
+SIMILAR_DDL = (
+    """CREATE TRIGGER books_similar_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_terms WHERE book_id = old.id;
+        DELETE FROM book_neighbours
+        WHERE book_id = old.id OR neighbour_id = old.id;
+    END""",
+)
+
+# On the metadata, so both tables exist when it runs.
+for _ddl in SIMILAR_DDL:
+    event.listen(db.metadata, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
 
 
 class Tag(db.Model):
@@ -130,4 +416,5 @@ class Bookmark(db.Model):
     __table_args__ = (
         db.UniqueConstraint("user_id", "book_id", name="unique_user_book_bookmark"),
         db.Index("idx_user_book", "user_id", "book_id"),
+        db.Index("idx_user_last_read", "user_id", "last_read"),
     )
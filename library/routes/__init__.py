@@ -1,4 +1,5 @@
 from .auth import auth as auth_blueprint
+from .catalog import catalog_blueprint
 from .index import index_blueprint
 from .metadata import metadata_blueprint
 from .reader import read_blueprint
@@ -6,6 +7,7 @@ from .upload import upload_blueprint
 
 __all__ = [
     "auth_blueprint",
+    "catalog_blueprint",
     "index_blueprint",
     "metadata_blueprint",
     "read_blueprint",
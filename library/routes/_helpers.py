@@ -1,11 +1,13 @@
 from contextlib import contextmanager
 from functools import wraps
 
-from flask import abort, jsonify
+from flask import abort, current_app, jsonify, request
 from flask_login import current_user
 
 from ..choices import AccessLevelChoice, UserRoleChoice
 from ..models import Book, db
+from ..storage import book_storage
+from ..utils import FILE_STATE_FIELDS
 
 
 def json_login_required(view):
@@ -59,3 +61,81 @@ def commit_or_rollback():
     except Exception:
         db.session.rollback()
         raise
+
+
+def book_file_version(book: Book, verify: bool = False) -> str | None:
+    """Identifier of the on-disk revision of `book`'s EPUB, for ETags and
+    cache keys; None when the file is missing.
+
+    Built from the mtime and fingerprint recorded on the row, so answering a
+    conditional request normally needs no filesystem access. The file is stat'ed, and
+    the row refreshed if it changed, when `verify` is set (callers do so
+    before serving a full response), when nothing is recorded yet, and at most
+    once per BOOK_FILE_VERIFY_INTERVAL per worker otherwise.
+    """
+    # Local import to avoid circular import via library/__init__.py.
+    from .. import cache
+
+    checked_key = f"file_checked:{book.id}"
+    if not verify and book.file_fingerprint is not None and cache.get(checked_key):
+        return _file_version(book)
+
+    storage = book_storage()
+    try:
+        stat = storage.stat(book.filename)
+    except OSError:
+        return None
+    if book.file_fingerprint is None or stat.as_tuple() != (
+        book.file_size,
+        book.file_mtime_ns,
+    ):
+        state = storage.file_state(book.filename)
+        with commit_or_rollback():
+            for field in FILE_STATE_FIELDS:
+                setattr(book, field, state[field])
+    cache.set(
+        checked_key, True, timeout=current_app.config["BOOK_FILE_VERIFY_INTERVAL"]
+    )
+    return _file_version(book)
+
+
+def _file_version(book: Book) -> str:
+    return f"{book.file_mtime_ns:x}-{book.file_fingerprint}"
+
+
+# Flask-Compress sends compressed responses with ":<coding>" appended to the
+# ETag, and clients echo that back in If-None-Match.
+_COMPRESSED_ETAG_SUFFIXES = (":gzip", ":br", ":deflate", ":zstd")
+
+
+def etag_matches(etag: str) -> bool:
+    """True if the request's If-None-Match names `etag`, as sent plain or by
+    Flask-Compress."""
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return True
+    return etag in {
+        tag.rpartition(":")[0] if tag.endswith(_COMPRESSED_ETAG_SUFFIXES) else tag
+        for tag in if_none_match.as_set(include_weak=True)
+    }
+
+def book_file_path(book: Book) -> str:
+    """Local path to read `book`'s EPUB from: the cached copy when
+    EPUB_LOCAL_CACHE_DIR is configured (always, for remote storage),
+    otherwise the file in BOOK_DIR.
+
+    Only for reads; anything that writes, renames or deletes the EPUB goes
+    through :func:`~library.storage.book_storage`.
+    """
+    return book_storage().local_path(
+        book.filename, book.file_size, book.file_mtime_ns
+    )
+
+
+def read_book_file(book: Book, read):
+    """``read(path)`` on :func:`book_file_path`, fetching the cached copy
+    again if it is evicted before `read` opens it (see
+    :meth:`~library.storage.BookStorage.read_local`)."""
+    return book_storage().read_local(
+        book.filename, read, book.file_size, book.file_mtime_ns
+    )
@@ -0,0 +1,148 @@
+"""Catalog snapshot and delta sync for clients that match and render locally.
+
+``/catalog/snapshot`` returns every book the user can see as compact rows
+plus a sync token; ``/catalog/changes?since=<token>`` returns only what was
+inserted, changed or deleted after it. Both are driven by the change feed in
+library/catalog.py.
+"""
+
+from flask import Blueprint, abort, jsonify, make_response, request
+from flask_login import current_user
+
+from ..catalog import changed_books, current_seq, deleted_since
+from ..choices import AccessLevelChoice, UserRoleChoice
+from ..matching import _tokens
+from ..models import Book, db
+from ._helpers import etag_matches
+
+catalog_blueprint = Blueprint("catalog_routes", __name__)
+
+# Column order of each book row in snapshots and deltas.
+CATALOG_FIELDS = (
+    "id",
+    "filename",
+    "title_tokens",
+    "author_tokens",
+    "length",
+    "cover_version",
+)
+
+_ROW_COLUMNS = (
+    Book.id,
+    Book.filename,
+    Book.title,
+    Book.author,
+    Book.epub_text_size,
+    Book.file_mtime_ns,
+    Book.file_fingerprint,
+    Book.access_level,
+)
+
+
+def _visible_access_levels() -> set[str] | None:
+    """Access levels the current user may see; None for all of them. Same
+    rule as the cover grid (_filtered_book_query)."""
+    if (
+        not current_user.is_authenticated
+        or current_user.role == UserRoleChoice.STANDARD
+    ):
+        return {AccessLevelChoice.STANDARD.value}
+    return None
+
+
+def _catalog_row(row) -> list:
+    # cover_version matches the version in /cover's ETag, so a client can
+    # tell which cached covers are stale without asking.
+    cover_version = (
+        f"{row.file_mtime_ns:x}-{row.file_fingerprint}"
+        if row.file_fingerprint is not None and row.file_mtime_ns is not None
+        else None
+    )
+    return [
+        row.id,
+        row.filename,
+        _tokens(row.title),
+        _tokens(row.author),
+        row.epub_text_size,
+        cover_version,
+    ]
+
+
+def _parse_token(token: str | None) -> int:
+    try:
+        since = int(token)
+    except (TypeError, ValueError):
+        abort(400, description="since must be a token from /catalog")
+    if since < 0:
+        abort(400, description="since must be a token from /catalog")
+    return since
+
+
+@catalog_blueprint.route("/catalog/snapshot")
+def snapshot():
+    """Every visible book as ``{"token", "fields", "books": [[...], ...]}``.
+
+    Rows are positional (see CATALOG_FIELDS) to keep the payload small; it
+    is gzip-compressed like every JSON response. The ETag is the token, so
+    an unchanged catalog answers a revalidation with 304.
+    """
+    levels = _visible_access_levels()
+    seq = current_seq()
+    etag = f"{seq}-{'all' if levels is None else '.'.join(sorted(levels))}"
+    if etag_matches(etag):
+        return "", 304
+
+    # Local import to avoid circular import via library/__init__.py.
+    from .. import cache
+
+    cache_key = f"catalog_snapshot:{etag}"
+    body = cache.get(cache_key)
+    if body is None:
+        query = db.session.query(*_ROW_COLUMNS).order_by(Book.id)
+        if levels is not None:
+            query = query.filter(Book.access_level.in_(levels))
+        body = jsonify({
+            "token": str(seq),
+            "fields": CATALOG_FIELDS,
+            "books": [_catalog_row(row) for row in query],
+        }).get_data()
+        cache.set(cache_key, body, timeout=3600)
+
+    response = make_response(body)
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.set_etag(etag)
+    return response
+
+
+@catalog_blueprint.route("/catalog/changes")
+def changes():
+    """What changed after ``?since=`` (a token from a snapshot or an earlier
+    delta): ``{"token", "fields", "upserts": [[...]], "deletes": [id, ...]}``.
+
+    Upserts replace the client's row for that id. Books the user can no
+    longer see (deleted, or moved to a restricted access level) are listed
+    in deletes. A token from the future, e.g. after the database was
+    restored from a backup, gets 410 Gone: fetch a new snapshot.
+    """
+    since = _parse_token(request.args.get("since"))
+    levels = _visible_access_levels()
+    seq = current_seq()
+    if since > seq:
+        abort(410, description="Token is newer than the catalog; fetch a snapshot")
+
+    upserts = []
+    deletes = deleted_since(since)
+    for row in changed_books(since, *_ROW_COLUMNS).order_by(Book.id):
+        if levels is None or row.access_level in levels:
+            upserts.append(_catalog_row(row))
+        else:
+            deletes.append(row.id)
+    response = jsonify({
+        "token": str(seq),
+        "fields": CATALOG_FIELDS,
+        "upserts": upserts,
+        "deletes": sorted(deletes),
+    })
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -1,4 +1,6 @@
-import os
+import base64
+import json
+from datetime import datetime
 
 from flask import (
     Blueprint,
@@ -8,14 +10,33 @@ from flask import (
     make_response,
     render_template,
     request,
-    send_from_directory,
+    send_file,
     url_for,
 )
 from flask_login import current_user
 
 from ..choices import AccessLevelChoice, BookProgressChoice, UserRoleChoice
+from ..identifiers import ISBN, normalize_isbn
+from ..match_index import book_match_index
 from ..matching import DEFAULT_MATCH_THRESHOLD, rank_matches
-from ..models import Book, Bookmark, Tag, book_tags, db
+from ..models import (
+    Book,
+    BookIdentifier,
+    Bookmark,
+    ChapterText,
+    Tag,
+    book_tags,
+    db,
+)
+from ..search import (
+    books_fts,
+    chapter_fts,
+    content_match,
+    filter_match,
+    snippet_column,
+    snippet_html,
+)
+from ..storage import book_storage
 from ..utils import (
     cover_mimetype,
     epub_text_size,
@@ -23,10 +44,13 @@ from ..utils import (
     read_epub_cover,
 )
 from ._helpers import (
+    book_file_version,
     commit_or_rollback,
+    etag_matches,
     get_book_or_404,
     json_admin_required,
     json_login_required,
+    read_book_file,
     user_can_access_book,
 )
 
@@ -38,6 +62,19 @@ BOOKS_PER_LOAD = 8
 VIEW_ALL = "all"
 VIEW_MINE = "mine"
 
+# What a listing is sorted on; cursors record it so one issued for a
+# different ordering is rejected rather than misread.
+ORDER_CREATED = "created"
+ORDER_LAST_READ = "last_read"
+ORDER_RANK = "rank"
+ORDER_CONTENT_RANK = "content_rank"  # /search: bm25 over chapter_fts
+_RANK_ORDERS = (ORDER_RANK, ORDER_CONTENT_RANK)
+
+SEARCH_RESULTS_PER_PAGE = 20
+BOOKS_MATCH_MAX_ITEMS = 500
+# Most matches returned per scanned book, by /books and /books/match.
+MATCH_LIMIT = 5
+
 
 def _normalize_view(view):
     if view == VIEW_MINE and not current_user.is_authenticated:
@@ -45,10 +82,16 @@ def _normalize_view(view):
     return view
 
 
+_FILTER_COLUMNS = {"title": Book.title, "author": Book.author, "genre": Book.genre}
+
+
 def _filtered_book_query(filters=None, view=VIEW_ALL):
     """Build the base Book query with access, view, and filter WHERE clauses
     applied. Returns None when the request can't possibly match (e.g. tag
-    filter requested by an anonymous user)."""
+    filter requested by an anonymous user).
+
+    Yields at most one row per book: the bookmark join is unique per user and
+    tags are matched with EXISTS, so counts need no DISTINCT."""
     query = Book.query
 
     if (
@@ -60,7 +103,7 @@ def _filtered_book_query(filters=None, view=VIEW_ALL):
     if current_user.is_authenticated:
         query = query.outerjoin(
             Book.bookmarks.and_(Bookmark.user_id == current_user.id)
-        ).outerjoin(Book.tags.and_(Tag.user_id == current_user.id))
+        )
 
     if view == VIEW_MINE:
         query = query.filter(Bookmark.status.in_([
@@ -69,14 +112,15 @@ def _filtered_book_query(filters=None, view=VIEW_ALL):
         ]))
 
     if filters:
-        for attr, column in (
-            ("title", Book.title),
-            ("author", Book.author),
-            ("genre", Book.genre),
-        ):
-            if value := filters.get(attr):
-                for word in value.split():
-                    query = query.filter(column.ilike(f"%{word}%"))
+        match, short_words = filter_match(filters)
+        if match is not None:
+            query = query.join(books_fts, books_fts.c.rowid == Book.id).filter(
+                books_fts.c.books_fts.op("MATCH")(match)
+            )
+        # Too short for the trigram index; LIKE only runs over rows the
+        # MATCH (if any) already narrowed down.
+        for attr, word in short_words:
+            query = query.filter(_FILTER_COLUMNS[attr].ilike(f"%{word}%"))
 
         if tags := filters.get("tags"):
             if not current_user.is_authenticated:
@@ -105,7 +149,13 @@ def _filtered_book_query(filters=None, view=VIEW_ALL):
             if progress_tags:
                 tag_filters.append(Bookmark.status.in_(progress_tags))
             if other_tags:
-                tag_filters.append(Tag.name.in_(other_tags))
+                tag_filters.append(
+                    Book.tags.any(
+                        db.and_(
+                            Tag.user_id == current_user.id, Tag.name.in_(other_tags)
+                        )
+                    )
+                )
 
             if tag_filters:
                 query = query.filter(db.or_(*tag_filters))
@@ -113,52 +163,130 @@ def _filtered_book_query(filters=None, view=VIEW_ALL):
     return query
 
 
-def get_covers(offset=0, limit=BOOKS_PER_LOAD, filters=None, view=VIEW_ALL):
-    """Return the next batch of book covers.
+def get_covers(
+    limit=BOOKS_PER_LOAD, filters=None, view=VIEW_ALL, cursor=None, offset=0
+):
+    """Return ``(covers, next_cursor, total)`` for the next batch of book
+    covers.
 
     view='all'  → every accessible book, newest first by created_at.
     view='mine' → only books the user has started (IN_PROGRESS or FINISHED),
                   ordered by last_read so the most recently opened is first.
                   Falls back to 'all' for anonymous users.
+
+    With title/author/genre filters that hit the full-text index, either view
+    is ordered by relevance (bm25) instead.
+
+    Batches are paged by keyset on (sort key, id): `cursor` is the opaque
+    value returned with the previous batch, so a page is an index seek however
+    deep the scroll, and books added meanwhile don't shift later pages.
+    `next_cursor` is None once nothing follows. `offset` only serves the
+    legacy /load_more/<offset> route.
+
+    `total` (the number of books under this view and filter) is only
+    computed for the first batch, where no cursor is given. It comes from a
+    window count on the page query itself, so no separate COUNT query is
+    needed. Later batches return None and the client keeps the first total.
     """
     view = _normalize_view(view)
     query = _filtered_book_query(filters, view)
     if query is None:
-        return []
+        return [], None, (0 if cursor is None else None)
 
-    if view == VIEW_MINE:
-        query = query.order_by(Bookmark.last_read.desc(), Book.created_at.desc())
+    if filter_match(filters)[0] is not None:
+        # bm25 rank: lower is more relevant, so this order ascends.
+        order, sort_column, ascending = ORDER_RANK, books_fts.c.rank, True
+    elif view == VIEW_MINE:
+        order, sort_column, ascending = ORDER_LAST_READ, Bookmark.last_read, False
     else:
-        query = query.order_by(Book.created_at.desc())
-
-    return [
+        order, sort_column, ascending = ORDER_CREATED, Book.created_at, False
+    query = query.add_columns(sort_column).order_by(
+        *(
+            (sort_column.asc(), Book.id.asc())
+            if ascending
+            else (sort_column.desc(), Book.id.desc())
+        )
+    )
+    with_total = cursor is None
+    if with_total:
+        query = query.add_columns(db.func.count().over())
+    else:
+        position = db.tuple_(sort_column, Book.id)
+        after = _decode_cursor(cursor, order)
+        query = query.filter(position > after if ascending else position < after)
+
+    # One extra row tells whether another page exists.
+    rows = query.offset(offset).limit(limit + 1).all()
+    total = None
+    if with_total:
+        if rows:
+            total = rows[0][2]
+        else:
+            # No row carries the count; only an offset past the end (legacy
+            # route) can hide a non-zero total here.
+            total = count_books(filters, view) if offset else 0
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_book, last_key = rows[-1][:2]
+        next_cursor = _encode_cursor(order, last_key, last_book.id)
+
+    covers = [
         {
             "filename": book.filename,
             "cover": url_for("index_routes.cover", filename=book.filename),
-            "length": _book_text_size(book),
+            "length": (
+                book.epub_text_size
+                if book.epub_text_size is not None
+                else _book_text_size(book)
+            ),
             "access_level": book.access_level,
         }
-        for book in query.offset(offset).limit(limit).all()
+        for book, *_ in rows
     ]
+    return covers, next_cursor, total
 
 
-def _book_text_size(book) -> int:
-    """Cached EPUB text size for `book`, in bytes. Used to size spine thickness
-    in the bookshelf view. Cached per (book_id, file mtime) since text size
-    only changes if the EPUB is rewritten on disk."""
-    epub_path = os.path.join(current_app.config["BOOK_DIR"], book.filename)
+def _encode_cursor(order, sort_key, row_id: int) -> str:
+    if order not in _RANK_ORDERS:
+        sort_key = sort_key.isoformat()
+    raw = json.dumps([order, sort_key, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, order) -> tuple:
+    """Inverse of :func:`_encode_cursor`; aborts with 400 on a cursor that is
+    malformed or was issued for another ordering (view or search)."""
     try:
-        mtime = int(os.path.getmtime(epub_path))
-    except OSError:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, sort_key, row_id = json.loads(raw)
+        if cursor_order in _RANK_ORDERS:
+            sort_key = float(sort_key)
+        else:
+            sort_key = datetime.fromisoformat(sort_key)
+        row_id = int(row_id)
+    except (ValueError, TypeError):
+        abort(400, description="Invalid cursor")
+    if cursor_order != order:
+        abort(400, description="Cursor is for a different view")
+    return sort_key, row_id
+
+
+def _book_text_size(book) -> int:
+    """Cached EPUB text size for `book`, in bytes, for rows whose
+    ``epub_text_size`` hasn't been backfilled yet. Cached per (book_id, file
+    version) since text size only changes if the EPUB is rewritten on disk."""
+    version = book_file_version(book)
+    if version is None:
         return 0
 
     # Local import to avoid circular import via library/__init__.py.
     from .. import cache
 
-    cache_key = f"length:{book.id}:{mtime}"
+    cache_key = f"length:{book.id}:{version}"
     size = cache.get(cache_key)
     if size is None:
-        size = epub_text_size(epub_path)
+        size = read_book_file(book, epub_text_size)
         cache.set(cache_key, size, timeout=86400)
     return size
 
@@ -170,8 +298,7 @@ def count_books(filters=None, view=VIEW_ALL):
     query = _filtered_book_query(filters, view)
     if query is None:
         return 0
-    # distinct() so the count isn't inflated by multi-tag join duplication.
-    return query.distinct().count()
+    return query.count()
 
 
 def _requested_view():
@@ -183,15 +310,23 @@ def _requested_view():
 def index():
     """Render the initial page with the first batch of book covers."""
     view = _requested_view()
-    images = get_covers(0, BOOKS_PER_LOAD, view=view)
-    total = count_books(view=view)
+    images, next_cursor, total = get_covers(BOOKS_PER_LOAD, view=view)
     return render_template(
-        "index.html", images=images, current_view=view, total_books=total
+        "index.html",
+        images=images,
+        next_cursor=next_cursor,
+        current_view=view,
+        total_books=total,
     )
 
 
+@index_blueprint.route("/load_more", methods=["GET"])
 @index_blueprint.route("/load_more/<int:offset>", methods=["GET"])
-def load_more(offset):
+def load_more(offset=0):
+    """Next batch of covers after ``?cursor=`` (the X-Next-Cursor of the
+    previous batch; omit for the first). The cursor for the batch after this
+    one comes back in X-Next-Cursor, absent at the end of the list.
+    /load_more/<offset> is the old offset API, kept for cached clients."""
     filters = {
         "title": request.args.get("title"),
         "author": request.args.get("author"),
@@ -201,40 +336,119 @@ def load_more(offset):
     # Remove empty filters
     filters = {k: v for k, v in filters.items() if v}
     view = _requested_view()
-    images = get_covers(offset, BOOKS_PER_LOAD, filters, view=view)
+    images, next_cursor, total = get_covers(
+        BOOKS_PER_LOAD,
+        filters,
+        view=view,
+        cursor=request.args.get("cursor"),
+        offset=offset,
+    )
     response = jsonify(images)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     # Frontend uses this to cap the number of loading skeletons it renders.
-    response.headers["X-Total-Count"] = str(count_books(filters, view))
+    # Only the first page of a filter carries it; the total doesn't change
+    # while scrolling through the rest.
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    return response
+
+
+@index_blueprint.route("/search", methods=["GET"])
+def search_contents():
+    """Chapters whose text matches ``?q=`` (every word; ``word*`` for a
+    prefix), most relevant first, each with a highlighted snippet. Only
+    books the user may open are searched, and only contents indexed by
+    `flask index-content`. Paged like /load_more: pass the previous
+    X-Next-Cursor as ``?cursor=``.
+    """
+    match = content_match(request.args.get("q") or "")
+    if match is None:
+        abort(400, description="q is required")
+
+    rank = chapter_fts.c.rank
+    position = db.tuple_(rank, ChapterText.id)
+    query = (
+        _filtered_book_query()
+        .join(ChapterText, ChapterText.book_id == Book.id)
+        .join(chapter_fts, chapter_fts.c.rowid == ChapterText.id)
+        .filter(chapter_fts.c.chapter_fts.op("MATCH")(match))
+        .with_entities(
+            Book.filename,
+            Book.title,
+            Book.author,
+            ChapterText.id,
+            ChapterText.spine_index,
+            ChapterText.title,
+            rank,
+            snippet_column(),
+        )
+        .order_by(rank, ChapterText.id)
+    )
+    if cursor := request.args.get("cursor"):
+        query = query.filter(position > _decode_cursor(cursor, ORDER_CONTENT_RANK))
+
+    rows = query.limit(SEARCH_RESULTS_PER_PAGE + 1).all()
+    next_cursor = None
+    if len(rows) > SEARCH_RESULTS_PER_PAGE:
+        rows = rows[:SEARCH_RESULTS_PER_PAGE]
+        next_cursor = _encode_cursor(ORDER_CONTENT_RANK, rows[-1][6], rows[-1][3])
+
+    response = jsonify([
+        {
+            "filename": filename,
+            "title": title,
+            "author": author,
+            "spine_index": spine_index,
+            "chapter_title": chapter_title,
+            "chapter": url_for(
+                "read_routes.chapter", filename=filename, index=spine_index
+            ),
+            "snippet": snippet_html(snippet),
+        }
+        for (
+            filename, title, author, _, spine_index, chapter_title, _, snippet
+        ) in rows
+    ])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return response
 
 
 @index_blueprint.route("/cover/<filename>")
 def cover(filename):
-    """Serve a book's cover with long-lived caching keyed on file mtime.
+    """Serve a book's cover with long-lived caching keyed on the EPUB's
+    recorded fingerprint.
 
     Two layers of caching:
       1. Server-side: cover bytes memoized in flask-caching keyed on
-         (book_id, mtime). Avoids re-extracting from the zip on every request.
+         (book_id, fingerprint). Avoids re-extracting from the zip on every
+         request.
       2. Client-side: ETag-based 304 response, plus Cache-Control: 1 year.
     """
     book = get_book_or_404(filename)
-    epub_path = os.path.join(current_app.config["BOOK_DIR"], book.filename)
-    if not os.path.exists(epub_path):
-        abort(404, description="Cover not found")
-
-    mtime = int(os.path.getmtime(epub_path))
-    etag = f"{book.id}-{mtime}"
-    if request.if_none_match.contains(etag):
+    # From the DB: a 304 here normally touches neither BOOK_DIR nor the cache.
+    version = book_file_version(book)
+    if version and etag_matches(f"{book.id}-{version}"):
         return "", 304
 
+    version = book_file_version(book, verify=True)
+    if version is None:
+        abort(404, description="Cover not found")
+    etag = f"{book.id}-{version}"
+
     # Imported here (not at module top) to break a circular import:
     # library/__init__.py -> routes -> here -> library.cache.
     from .. import cache
 
-    cache_key = f"cover:{book.id}:{mtime}"
+    cache_key = f"cover:{book.id}:{version}"
     cover_bytes = cache.get(cache_key)
     if cover_bytes is None:
-        cover_bytes = read_epub_cover(epub_path, book.cover_path)
+        # Only the cover members are read, so skip the local EPUB cache: a
+        # grid of covers would otherwise copy in every listed book.
+        cover_bytes = book_storage().read_uncached(
+            book.filename, lambda source: read_epub_cover(source, book.cover_path)
+        )
         cache.set(cache_key, cover_bytes, timeout=86400)
 
     response = make_response(cover_bytes)
@@ -255,9 +469,17 @@ def download(filename):
     if not user_can_access_book(book):
         return jsonify({"error": "Forbidden"}), 403
 
-    return send_from_directory(
-        current_app.config["BOOK_DIR"], filename, as_attachment=True
-    )
+    # send_file opens the path before returning, so an evicted cached copy
+    # surfaces inside read_book_file.
+    try:
+        return read_book_file(
+            book,
+            lambda path: send_file(
+                path, as_attachment=True, download_name=book.filename
+            ),
+        )
+    except FileNotFoundError:
+        abort(404, description="Book file not found")
 
 
 @index_blueprint.route("/book/<filename>", methods=["DELETE"])
@@ -265,7 +487,6 @@ def download(filename):
 def delete_book(filename):
     """Permanently remove a book — DB row, join-table rows, and the EPUB file."""
     book = get_book_or_404(filename)
-    epub_path = os.path.join(current_app.config["BOOK_DIR"], book.filename)
 
     with commit_or_rollback():
         # Defensively clear book_tags rows: existing DBs don't have ON DELETE
@@ -275,17 +496,67 @@ def delete_book(filename):
         )
         db.session.delete(book)
 
-    if os.path.exists(epub_path):
-        try:
-            os.remove(epub_path)
-        except OSError as e:
-            current_app.logger.warning(
-                f"Removed DB row but failed to unlink {epub_path}: {e}"
-            )
+    try:
+        book_storage().delete(filename)
+    except OSError as e:
+        current_app.logger.warning(
+            f"Removed DB row but failed to delete file {filename}: {e}"
+        )
 
     return jsonify({"message": "Book deleted"})
 
 
+def _match_access_levels():
+    if current_user.role == UserRoleChoice.STANDARD:
+        return {AccessLevelChoice.STANDARD.value}
+    return None
+
+
+def _match_json(book, score):
+    return {
+        "title": book.title,
+        "author": book.author,
+        "filename": book.filename,
+        "score": round(score, 3),
+    }
+
+
+def _isbn_matches(isbns, access_levels) -> dict[str, list[dict]]:
+    """Exact matches (score 1) for each of the normalised `isbns` held by
+    some book, from one indexed query."""
+    if not isbns:
+        return {}
+    query = (
+        db.session.query(BookIdentifier.value, Book)
+        .join(Book, Book.id == BookIdentifier.book_id)
+        .filter(BookIdentifier.scheme == ISBN, BookIdentifier.value.in_(isbns))
+        .order_by(BookIdentifier.value, Book.id)
+    )
+    if access_levels is not None:
+        query = query.filter(Book.access_level.in_(access_levels))
+    found = {}
+    for isbn, book in query:
+        matches = found.setdefault(isbn, [])
+        if len(matches) < MATCH_LIMIT:
+            matches.append(_match_json(book, 1.0))
+    return found
+
+
+def _find_matches(index, title, author, access_levels):
+    threshold = current_app.config.get(
+        "LIBRARY_MATCH_THRESHOLD", DEFAULT_MATCH_THRESHOLD
+    )
+    candidates = index.candidates(
+        title, author, current_app.config["LIBRARY_MATCH_CANDIDATES"], access_levels
+    )
+    return [
+        _match_json(book, score)
+        for book, score in rank_matches(
+            title, author, candidates, threshold, MATCH_LIMIT
+        )
+    ]
+
+
 @index_blueprint.route("/books", methods=["GET"])
 @json_login_required
 def search_books():
@@ -293,28 +564,65 @@ def search_books():
     returns the closest library books (best first) so the app can show ownership
     without exact-string luck. Matching tolerates edition/format and name-order
     differences; the cutoff is LIBRARY_MATCH_THRESHOLD.
+
+    With ``isbn`` (ISBN-10 or -13, any punctuation), books carrying that ISBN
+    are returned straight from the identifier index with a score of 1; fuzzy
+    matching only runs when none does.
     """
     title = (request.args.get("title") or "").strip()
     author = (request.args.get("author") or "").strip()
-    if not title and not author:
-        return jsonify({"error": "title or author is required"}), 400
+    isbn = normalize_isbn(request.args.get("isbn"))
+    if not title and not author and not isbn:
+        return jsonify({"error": "title, author or a valid isbn is required"}), 400
 
-    query = Book.query
-    if current_user.role == UserRoleChoice.STANDARD:
-        query = query.filter(Book.access_level == AccessLevelChoice.STANDARD.value)
+    access_levels = _match_access_levels()
+    matches = _isbn_matches([isbn], access_levels).get(isbn) if isbn else None
+    if not matches and (title or author):
+        matches = _find_matches(book_match_index(), title, author, access_levels)
+    return jsonify({"matches": matches or []})
 
-    threshold = current_app.config.get(
-        "LIBRARY_MATCH_THRESHOLD", DEFAULT_MATCH_THRESHOLD
+
+@index_blueprint.route("/books/match", methods=["POST"])
+@json_login_required
+def match_books():
+    """Batch form of GET /books for a whole shelf scan.
+
+    Takes ``{"items": [{"title", "author", "isbn"}, ...]}`` (at most
+    BOOKS_MATCH_MAX_ITEMS) and returns ``{"results": [{"matches": [...]}]}``
+    in the same order, each list exactly what GET /books would return for
+    that item. Items with nothing to match on get no matches. All ISBNs are
+    looked up in one query, the candidate index is checked once for the
+    batch, and repeated scans of the same book are only scored once.
+    """
+    items = (request.get_json(silent=True) or {}).get("items")
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        abort(400, description="items must be a list of {title, author} objects")
+    if len(items) > BOOKS_MATCH_MAX_ITEMS:
+        abort(400, description=f"At most {BOOKS_MATCH_MAX_ITEMS} items per request")
+
+    keys = [
+        (
+            str(item.get("title") or "").strip(),
+            str(item.get("author") or "").strip(),
+            normalize_isbn(str(item.get("isbn") or "")),
+        )
+        for item in items
+    ]
+    access_levels = _match_access_levels()
+    by_isbn = _isbn_matches(
+        list({isbn for _, _, isbn in keys if isbn}), access_levels
     )
-    matches = rank_matches(title, author, query.all(), threshold)
-    return jsonify({
-        "matches": [
-            {
-                "title": book.title,
-                "author": book.author,
-                "filename": book.filename,
-                "score": round(score, 3),
-            }
-            for book, score in matches
-        ]
-    })
+    index = None
+    found = {}
+    results = []
+    for title, author, isbn in keys:
+        matches = by_isbn.get(isbn) if isbn else None
+        if not matches and (title or author):
+            if (title, author) not in found:
+                index = index or book_match_index()
+                found[title, author] = _find_matches(
+                    index, title, author, access_levels
+                )
+            matches = found[title, author]
+        results.append({"matches": matches or []})
+    return jsonify({"results": results})
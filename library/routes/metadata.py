@@ -1,15 +1,24 @@
-import os
-
-from flask import Blueprint, current_app, jsonify, request, url_for
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
 from flask_login import current_user
 
 from ..choices import AccessLevelChoice, UserRoleChoice
-from ..models import Bookmark, BookProgressChoice, Tag, book_tags, db
+from ..models import (
+    Book,
+    Bookmark,
+    BookProgressChoice,
+    Tag,
+    book_neighbours,
+    book_tags,
+    db,
+)
+from ..storage import book_storage
 from ..utils import update_epub_cover
 from ._helpers import (
+    book_file_version,
     commit_or_rollback,
     get_book_or_404,
     json_login_required,
+    user_can_access_book,
 )
 
 metadata_blueprint = Blueprint("metadata_routes", __name__)
@@ -138,6 +147,44 @@ def book_metadata(filename):
     return jsonify(response)
 
 
+@metadata_blueprint.route("/similar/<filename>")
+def similar_books(filename):
+    """"More like this" for the metadata view: the book's nearest neighbours
+    by content and metadata, most similar first, as ``[{"filename", "title",
+    "author", "cover", "score"}]``.
+
+    Read straight from book_neighbours (see similar.py), which
+    `flask index-content` and `flask build-similar` keep filled; empty until
+    the book's contents have been indexed.
+    """
+    book = get_book_or_404(filename)
+    if not user_can_access_book(book):
+        abort(403, description="Forbidden")
+    rows = (
+        db.session.query(
+            Book.filename,
+            Book.title,
+            Book.author,
+            Book.access_level,
+            book_neighbours.c.score,
+        )
+        .join(book_neighbours, book_neighbours.c.neighbour_id == Book.id)
+        .filter(book_neighbours.c.book_id == book.id)
+        .order_by(book_neighbours.c.score.desc(), Book.id)
+    )
+    return jsonify([
+        {
+            "filename": row.filename,
+            "title": row.title,
+            "author": row.author,
+            "cover": url_for("index_routes.cover", filename=row.filename),
+            "score": round(row.score, 3),
+        }
+        for row in rows
+        if user_can_access_book(row)
+    ])
+
+
 @metadata_blueprint.route("/tags")
 @json_login_required
 def list_user_tags():
@@ -172,14 +219,17 @@ def update_cover():
 
     cover_file = request.files["cover"]
     book = get_book_or_404(request.form["filename"])
-    epub_file_path = os.path.join(current_app.config["BOOK_DIR"], book.filename)
 
     try:
         new_cover_bytes = cover_file.read()
-        update_epub_cover(epub_file_path, new_cover_bytes)
-        # Cache-bust the cover URL by appending the new mtime
+        book_storage().rewrite(
+            book.filename, lambda path: update_epub_cover(path, new_cover_bytes)
+        )
+        # Record the rewritten file's state, then cache-bust the cover URL
+        # with its new fingerprint.
+        version = book_file_version(book, verify=True)
         cover_url = url_for("index_routes.cover", filename=book.filename)
-        cover_url = f"{cover_url}?v={int(os.path.getmtime(epub_file_path))}"
+        cover_url = f"{cover_url}?v={version}"
         return jsonify({"cover": cover_url})
     except Exception as e:
         current_app.logger.error(f"Error updating cover: {str(e)}")
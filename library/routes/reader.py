@@ -2,7 +2,8 @@ import json
 import logging
 import mimetypes
 import os
-import zipfile
+import uuid
+from functools import partial
 
 from flask import (
     Blueprint,
@@ -17,19 +18,46 @@ from flask import (
     url_for,
 )
 from flask_login import current_user
+from werkzeug.datastructures import ContentRange
+from werkzeug.wsgi import wrap_file
 
+from ..archives import MemberStream, is_stored, open_epub, open_stored_member
 from ..llm_caller import LLMCaller, LLMError
-from ..models import Bookmark, BookProgressChoice, _utcnow, db
-from ..utils import get_epub_structure, process_chapter_content, rotate_list
+from ..models import Bookmark, BookProgressChoice, ChapterText, _utcnow, db
+from ..search import find_in_chapters, phrase_pattern
+from ..utils import (
+    get_epub_structure,
+    iter_chapter_texts,
+    nearest_first,
+    process_chapter_content,
+    rotate_list,
+)
 from ._helpers import (
+    book_file_path,
+    book_file_version,
     commit_or_rollback,
+    etag_matches,
     get_book_or_404,
     json_login_required,
+    read_book_file,
     user_can_access_book,
 )
 
 read_blueprint = Blueprint("read_routes", __name__)
 
+# Chapter scheduling for /load_book: "sequential" streams from the bookmark to
+# the end and wraps around; "nearest" fans out from the bookmark (i, i+1, i-1,
+# i+2, ...) so the chapters a reader is likeliest to open next arrive first.
+ORDER_SEQUENTIAL = "sequential"
+ORDER_NEAREST = "nearest"
+
+# How long a stream's jump hint is kept; comfortably longer than any stream.
+_JUMP_HINT_TIMEOUT = 3600
+
+# Matches returned by /search_in_book when no (or too large a) ?limit= is given.
+SEARCH_IN_BOOK_LIMIT = 50
+SEARCH_IN_BOOK_MAX_LIMIT = 500
+
 llm_caller = LLMCaller()
 
 
@@ -83,21 +111,40 @@ def load_book(filename):
         bookmark.last_read = _utcnow()
         db.session.commit()
 
+    version = book_file_version(book, verify=True)
+    if version is None:
+        abort(404, description="Book file not found")
+    epub_dir, epub_name = os.path.split(book_file_path(book))
+
     asset_url_prefix = url_for(
         "read_routes.book_asset", filename=filename, asset_path=""
     )
+    order = request.args.get("order", ORDER_SEQUENTIAL)
+    if order not in (ORDER_SEQUENTIAL, ORDER_NEAREST):
+        order = ORDER_SEQUENTIAL
+    # Optional: only stream chapters within `window` of the bookmark; the
+    # client fetches anything else on demand from /chapter.
+    window = request.args.get("window", type=int)
+    if window is not None and window < 0:
+        window = None
 
     try:
         return Response(
             stream_with_context(
                 stream_book_content(
-                    epub_dir=current_app.config["BOOK_DIR"],
-                    epub_path=filename,
+                    book_id=book.id,
+                    version=version,
+                    epub_dir=epub_dir,
+                    epub_path=epub_name,
                     book_title=book.title,
                     book_author=book.author,
                     start_chapter=bookmark.chapter_index if bookmark else 0,
                     chapter_pos=bookmark.position if bookmark else 0,
                     asset_url_prefix=asset_url_prefix,
+                    order=order,
+                    window=window,
+                    stream_id=uuid.uuid4().hex,
+                    read_book=partial(read_book_file, book),
                 )
             ),
             content_type="application/x-ndjson",
@@ -107,7 +154,89 @@ def load_book(filename):
         return jsonify({"error": str(e)}), 500
 
 
+# Stand-in for the mount-dependent asset URL prefix inside cached chapter
+# frames; swapped for the request's real prefix as each frame goes out.
+_ASSET_PREFIX_PLACEHOLDER = "@@asset_url_prefix@@"
+
+
+def _book_structure(book_id: int, epub_path: str, version: str) -> dict:
+    """get_epub_structure() memoized in the shared on-disk cache.
+
+    Keyed on (book_id, file version) so every worker reuses a single parse,
+    and a rewritten EPUB (e.g. via /update_cover) misses and is re-parsed.
+    """
+    # Local import to avoid circular import via library/__init__.py.
+    from .. import disk_cache
+
+    cache_key = f"structure:{book_id}:{version}"
+    structure = disk_cache.get(cache_key)
+    if structure is None:
+        structure = get_epub_structure(epub_path)
+        disk_cache.set(cache_key, structure)
+    return structure
+
+
+def _chapter_frame(
+    book_id: int,
+    version: str,
+    epub_path: str,
+    chapter: dict,
+    images: dict,
+) -> str:
+    """The NDJSON line for one chapter, rendered once per book revision.
+
+    Cached with a placeholder where the asset URL prefix goes, so the same
+    entry serves every mount path (standalone and behind /library).
+    """
+    from .. import disk_cache
+
+    cache_key = f"chapter:{book_id}:{version}:{chapter['index']}"
+    frame = disk_cache.get(cache_key)
+    if frame is None:
+        chapter_content = process_chapter_content(
+            epub_path, chapter["path"], images, _ASSET_PREFIX_PLACEHOLDER
+        )
+        index = chapter["index"]
+        frame = (
+            json.dumps(
+                {
+                    "type": "chapter",
+                    "index": index,
+                    "href": chapter_content["href"],
+                    "title": chapter_content["title"] or f"Chapter {index + 1}",
+                    "content": chapter_content["content"],
+                }
+            )
+            + "\n"
+        )
+        disk_cache.set(cache_key, frame)
+    return frame
+
+
+def _jump_hint_key(stream_id: str) -> str:
+    return f"jump:{stream_id}"
+
+
+def _jump_hint(stream_id: str) -> int | None:
+    """The chapter a client last asked this stream to prioritise, if any.
+    Stored in the shared disk cache because the hint may be POSTed to a
+    different worker from the one producing the stream."""
+    from .. import disk_cache
+
+    return disk_cache.get(_jump_hint_key(stream_id))
+
+
+def _fill_asset_prefix(frame: str, asset_url_prefix: str) -> str:
+    """Swap the placeholder in a cached chapter frame for the real prefix. It
+    lands inside already-encoded JSON, so escape it as json.dumps would."""
+    return frame.replace(
+        _ASSET_PREFIX_PLACEHOLDER, json.dumps(asset_url_prefix)[1:-1]
+    )
+
+
 def stream_book_content(
+    book_id: int,
+    version: str,
     epub_dir: str,
     epub_path: str,
     book_title: str,
@@ -115,11 +244,30 @@ def stream_book_content(
     start_chapter: int,
     chapter_pos: float,
     asset_url_prefix: str,
+    order: str = ORDER_SEQUENTIAL,
+    window: int | None = None,
+    stream_id: str | None = None,
+    read_book=None,
 ):
-    """Stream book content as newline-delimited JSON."""
-    try:
+    """Stream book content as newline-delimited JSON.
+
+    Chapters go out in `order`, limited to those within `window` of the
+    bookmark when set. Between chapters the stream checks for a jump hint (see
+    load_book_jump) and, if one arrived, re-sorts whatever is still unsent
+    nearest-first around the requested chapter.
+
+    `read_book`, when given, is :func:`read_book_file` bound to the book, so
+    a cached copy evicted mid-stream is fetched again; otherwise the file is
+    read from `epub_dir` directly.
+    """
+    if read_book is None:
         full_path = os.path.join(epub_dir, epub_path)
-        structure = get_epub_structure(full_path)
+
+        def read_book(read):
+            return read(full_path)
+
+    try:
+        structure = read_book(lambda path: _book_structure(book_id, path, version))
 
         yield (
             json.dumps(
@@ -132,70 +280,239 @@ def stream_book_content(
                     "spine_length": structure["spine_length"],
                     "start_chapter": start_chapter,
                     "chapter_pos": chapter_pos,
+                    "window": window,
+                    "stream_id": stream_id,
                 }
             )
             + "\n"
         )
 
-        # Rotate chapters list based on start_chapter
-        chapters = rotate_list(structure["chapters"], n=-start_chapter)
-
-        # Stream each chapter
-        for i, chapter in enumerate(chapters):
-            index = (i + start_chapter) % len(structure["chapters"])
-            chapter_content = process_chapter_content(
-                full_path, chapter["path"], structure["images"], asset_url_prefix
-            )
-
-            yield (
-                json.dumps(
-                    {
-                        "type": "chapter",
-                        "index": index,
-                        "href": chapter_content["href"],
-                        "title": chapter_content["title"] or f"Chapter {index + 1}",
-                        "content": chapter_content["content"],
-                    }
+        chapters = structure["chapters"]
+        if order == ORDER_NEAREST:
+            center = min(max(start_chapter, 0), max(len(chapters) - 1, 0))
+            pending = nearest_first(range(len(chapters)), center)
+        else:
+            # Rotate chapters list based on start_chapter
+            pending = rotate_list(list(range(len(chapters))), n=-start_chapter)
+        if window is not None:
+            pending = [i for i in pending if abs(i - start_chapter) <= window]
+
+        last_hint = None
+        while pending:
+            if stream_id and (hint := _jump_hint(stream_id)) != last_hint:
+                last_hint = hint
+                if hint is not None:
+                    pending = nearest_first(pending, hint)
+
+            chapter = chapters[pending.pop(0)]
+            frame = read_book(
+                lambda path, chapter=chapter: _chapter_frame(
+                    book_id, version, path, chapter, structure["images"]
                 )
-                + "\n"
             )
-
-            # Clear references to help garbage collection
-            chapter_content = None
+            yield _fill_asset_prefix(frame, asset_url_prefix)
 
     except Exception as e:
         yield json.dumps({"type": "error", "message": str(e)}) + "\n"
 
 
-@read_blueprint.route("/book_asset/<filename>/<path:asset_path>")
-def book_asset(filename, asset_path):
-    """Serve a file (image, font, etc) from inside an EPUB with long-lived caching."""
+@read_blueprint.route("/chapter/<filename>/<int:index>")
+def chapter(filename, index):
+    """A single rendered chapter, as the same JSON object /load_book streams.
+
+    Lets clients fetch chapters on demand instead of the whole book, and lets
+    the browser cache them: the strong ETag changes only if the EPUB does.
+    """
     book = get_book_or_404(filename)
     if not user_can_access_book(book):
         abort(403, description="Forbidden")
-    epub_path = os.path.join(current_app.config["BOOK_DIR"], book.filename)
-    if not os.path.exists(epub_path):
+    version = book_file_version(book)
+    if version and etag_matches(f"{book.id}-{version}-{index}"):
+        return "", 304
+
+    version = book_file_version(book, verify=True)
+    if version is None:
         abort(404, description="Book file not found")
+    etag = f"{book.id}-{version}-{index}"
+
+    def render(epub_path):
+        structure = _book_structure(book.id, epub_path, version)
+        if index >= len(structure["chapters"]):
+            abort(404, description="Chapter not found")
+        return _chapter_frame(
+            book.id,
+            version,
+            epub_path,
+            structure["chapters"][index],
+            structure["images"],
+        )
+
+    frame = read_book_file(book, render)
+    asset_url_prefix = url_for(
+        "read_routes.book_asset", filename=filename, asset_path=""
+    )
+    response = make_response(_fill_asset_prefix(frame, asset_url_prefix))
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Cache-Control"] = "public, max-age=31536000"
+    response.set_etag(etag)
+    return response
+
+
+@read_blueprint.route("/search_in_book/<filename>")
+def search_in_book(filename):
+    """Find ``?q=`` (a phrase, case-insensitive) in one book, in reading order.
+
+    Returns ``{"matches": [{"spine_index", "offset", "length", "snippet"}],
+    "more": bool}``, at most ``?limit=`` matches, so the reader can jump to a
+    chapter and position without loading the whole book. `offset` counts
+    characters of the chapter's text with whitespace collapsed.
+
+    Chapter text comes from the content index when it is current for this
+    revision of the file; otherwise chapters are parsed from the EPUB one by
+    one, stopping once the limit is reached.
+    """
+    book = get_book_or_404(filename)
+    if not user_can_access_book(book):
+        abort(403, description="Forbidden")
+    pattern = phrase_pattern(request.args.get("q") or "")
+    if pattern is None:
+        abort(400, description="q is required")
+    limit = request.args.get("limit", SEARCH_IN_BOOK_LIMIT, type=int)
+    limit = min(max(limit, 1), SEARCH_IN_BOOK_MAX_LIMIT)
+
+    version = book_file_version(book, verify=True)
+    if version is None:
+        abort(404, description="Book file not found")
+    if book.content_indexed_fingerprint == book.file_fingerprint:
+        chapters = (
+            db.session.query(ChapterText.spine_index, ChapterText.text)
+            .filter(ChapterText.book_id == book.id)
+            .order_by(ChapterText.spine_index)
+            .yield_per(8)
+        )
+        matches, more = find_in_chapters(chapters, pattern, limit)
+    else:
+
+        def search(epub_path):
+            structure = _book_structure(book.id, epub_path, version)
+            chapters = (
+                (chapter["spine_index"], chapter["text"])
+                for chapter in iter_chapter_texts(epub_path, structure["chapters"])
+            )
+            return find_in_chapters(chapters, pattern, limit)
+
+        matches, more = read_book_file(book, search)
+    return jsonify({"matches": matches, "more": more})
+
 
-    mtime = int(os.path.getmtime(epub_path))
-    etag = f"{book.id}-{mtime}-{asset_path}"
-    if request.if_none_match.contains(etag):
+@read_blueprint.route("/load_book/<filename>/jump", methods=["POST"])
+def load_book_jump(filename):
+    """Ask an in-flight /load_book stream to send `chapter_index` (and then its
+    neighbours) next, e.g. when the reader taps a TOC entry not yet loaded."""
+    book = get_book_or_404(filename)
+    if not user_can_access_book(book):
+        abort(403, description="Forbidden")
+
+    data = request.get_json(silent=True) or {}
+    stream_id = data.get("stream_id")
+    chapter_index = data.get("chapter_index")
+    if (
+        not isinstance(stream_id, str)
+        or not stream_id
+        or not isinstance(chapter_index, int)
+        or chapter_index < 0
+    ):
+        return jsonify({"error": "stream_id and chapter_index are required"}), 400
+
+    from .. import disk_cache
+
+    disk_cache.set(
+        _jump_hint_key(stream_id), chapter_index, timeout=_JUMP_HINT_TIMEOUT
+    )
+    return jsonify({"message": "Jump hint recorded"})
+
+
+_ASSET_CHUNK_SIZE = 64 * 1024
+
+
+@read_blueprint.route("/book_asset/<filename>/<path:asset_path>")
+def book_asset(filename, asset_path):
+    """Serve a file (image, font, etc) from inside an EPUB with long-lived caching.
+
+    Stored (uncompressed) members are served straight from the EPUB at their
+    data offset, via sendfile where the server supports it; deflated members
+    are decompressed in chunks. Single byte ranges are honoured either way.
+    """
+    book = get_book_or_404(filename)
+    if not user_can_access_book(book):
+        abort(403, description="Forbidden")
+    version = book_file_version(book)
+    if version and etag_matches(f"{book.id}-{version}-{asset_path}"):
         return "", 304
 
+    version = book_file_version(book, verify=True)
+    if version is None:
+        abort(404, description="Book file not found")
+    etag = f"{book.id}-{version}-{asset_path}"
+
+    def open_asset(epub_path):
+        """``(info, byte_range, body)``; body is None when the range can't
+        be satisfied. The body holds its own handle on the file."""
+        with open_epub(epub_path) as z:
+            info = z.getinfo(asset_path)
+            byte_range = _requested_byte_range(info.file_size, etag)
+            if byte_range is None:
+                return info, None, None
+            start, stop = byte_range
+            if is_stored(info):
+                body = wrap_file(
+                    request.environ,
+                    open_stored_member(epub_path, info, start, stop),
+                    buffer_size=_ASSET_CHUNK_SIZE,
+                )
+            else:
+                # Opened while the archive is leased; the member keeps its own
+                # reference to the file even if the pool closes the archive.
+                body = MemberStream(z.open(info), start, stop, _ASSET_CHUNK_SIZE)
+            return info, byte_range, body
+
     try:
-        with zipfile.ZipFile(epub_path) as z:
-            asset_bytes = z.read(asset_path)
+        info, byte_range, body = read_book_file(book, open_asset)
     except KeyError:
         abort(404, description="Asset not found")
+    if byte_range is None:
+        response = Response(status=416)
+        response.content_range = ContentRange("bytes", None, None, info.file_size)
+        return response
+    start, stop = byte_range
 
-    response = make_response(asset_bytes)
+    response = Response(body, direct_passthrough=True)
     mime_type, _ = mimetypes.guess_type(asset_path)
     response.headers["Content-Type"] = mime_type or "application/octet-stream"
     response.headers["Cache-Control"] = "public, max-age=31536000"
+    response.headers["Accept-Ranges"] = "bytes"
+    response.content_length = stop - start
+    if (start, stop) != (0, info.file_size):
+        response.status_code = 206
+        response.content_range = ContentRange("bytes", start, stop, info.file_size)
     response.set_etag(etag)
     return response
 
 
+def _requested_byte_range(size: int, etag: str) -> tuple[int, int] | None:
+    """(start, stop) to serve for the request's Range header: the whole member
+    when there's no usable single range, None when it can't be satisfied."""
+    requested = request.range
+    if requested is None:
+        return 0, size
+    if_range = request.if_range
+    if (if_range.etag or if_range.date) and if_range.etag != etag:
+        return 0, size  # client's copy is stale; send it the full asset
+    if requested.units != "bytes" or len(requested.ranges) != 1:
+        return 0, size  # multipart ranges aren't worth supporting here
+    return requested.range_for_length(size)
+
+
 @read_blueprint.route("/bookmark/<filename>", methods=["GET", "POST"])
 def bookmark(filename):
     """Get or update the user's bookmark for the book."""
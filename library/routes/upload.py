@@ -1,19 +1,25 @@
 import base64
 import os
 import re
+import tempfile
+import time
 import uuid
+from datetime import timezone
 
-from ebooklib import epub
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, session
 
+from ..duplicates import minhash, near_duplicates
+from ..identifiers import identifier_rows
 from ..models import Book, db
+from ..storage import BookStorage, LocalStorage, book_storage
 from ..utils import (
+    book_columns,
     cover_mimetype,
-    extract_metadata,
-    get_epub_cover_path,
+    extract_chapter_texts,
     read_epub_cover,
+    read_ingest_metadata,
 )
-from ._helpers import commit_or_rollback, json_login_required
+from ._helpers import commit_or_rollback, json_login_required, user_can_access_book
 
 upload_blueprint = Blueprint("upload_routes", __name__)
 
@@ -26,17 +32,80 @@ def _slugify(value: str) -> str:
     return value or "untitled"
 
 
-def generate_filename(title: str, author: str, book_dir: str) -> str:
-    """Build a unique <title>__<author>.epub filename, avoiding collisions on disk."""
+def generate_filename(title: str, author: str, storage: BookStorage | str) -> str:
+    """Build a unique <title>__<author>.epub filename, avoiding collisions in
+    `storage` (or a plain book directory)."""
+    if isinstance(storage, str):
+        storage = LocalStorage(storage)
     base = f"{_slugify(title)}__{_slugify(author)}"
     candidate = f"{base}.epub"
     i = 2
-    while os.path.exists(os.path.join(book_dir, candidate)):
+    while storage.exists(candidate):
         candidate = f"{base}_{i}.epub"
         i += 1
     return candidate
 
 
+# Session key: filenames this user's /upload_book calls stored, with when, so
+# /upload_book_metadata only takes over a scanned row for a file they staged.
+_STAGED_UPLOADS = "staged_uploads"
+_MAX_STAGED_UPLOADS = 20
+
+
+def _remember_upload(filename: str) -> None:
+    staged = session.get(_STAGED_UPLOADS, {})
+    staged[filename] = time.time()
+    # Bound the cookie; an upload whose form is never saved just ages out.
+    session[_STAGED_UPLOADS] = dict(
+        sorted(staged.items(), key=lambda item: item[1])[-_MAX_STAGED_UPLOADS:]
+    )
+
+
+def _is_unedited_scan(book: Book, filename: str, storage: BookStorage) -> bool:
+    """True if `book` is a row scan-library added for `filename` after this
+    user uploaded it, with nothing changed since: what the scanner writes
+    comes straight from the EPUB, so any edit shows up as a difference."""
+    staged_at = session.get(_STAGED_UPLOADS, {}).get(filename)
+    if staged_at is None or book.uploaded_by is not None or book.tags:
+        return False
+    if book.created_at.replace(tzinfo=timezone.utc).timestamp() < staged_at:
+        return False
+    try:
+        metadata = storage.read_ingest_metadata(filename)
+    except Exception:
+        return False
+    return (book.title, book.author, book.cover_path, book.genre) == (
+        metadata["title"],
+        metadata["author"],
+        metadata["cover_path"],
+        None,
+    )
+
+
+def _content_duplicates(epub_path: str) -> list[dict]:
+    """Indexed books the user can see whose text nearly matches the EPUB at
+    `epub_path` (see duplicates.py). Only a warning, so it never fails the
+    upload."""
+    try:
+        signature = minhash(extract_chapter_texts(epub_path))
+    except Exception as e:
+        current_app.logger.warning(f"Could not check {epub_path} for duplicates: {e}")
+        return []
+    if signature is None:
+        return []
+    threshold = current_app.config["LIBRARY_DUPLICATE_THRESHOLD"]
+    return [
+        {
+            "filename": book.filename,
+            "title": book.title,
+            "author": book.author,
+            "similarity": round(score, 3),
+        }
+        for book, score in near_duplicates(signature, threshold)
+        if user_can_access_book(book)
+    ]
+
+
 @upload_blueprint.route("/upload_book", methods=["POST"])
 @json_login_required
 def upload_book():
@@ -55,17 +124,20 @@ def upload_book():
             {"error": "Invalid file format. Please upload an EPUB file"}
         ), 400
 
-    # Use a temporary filename with timestamp to ensure uniqueness
+    # Stage under a unique temporary name; it is read here and only then
+    # handed to storage under its final name.
+    storage = book_storage()
     temp_filename = f"temp_{uuid.uuid4().hex}.epub"
-    temp_file_path = os.path.join(current_app.config["BOOK_DIR"], temp_filename)
+    temp_file_path = os.path.join(
+        storage.staging_dir() or tempfile.gettempdir(), temp_filename
+    )
     file.save(temp_file_path)
     current_app.logger.info(f"Temporarily saved uploaded file to {temp_file_path}")
 
     # Read the EPUB file to extract metadata
     try:
-        epub_book = epub.read_epub(temp_file_path, options={"ignore_ncx": True})
-        table_of_contents = epub_book.get_items_of_type(epub.EpubNav)
-        if not table_of_contents:
+        metadata = read_ingest_metadata(temp_file_path)
+        if not metadata["has_nav"]:
             os.remove(temp_file_path)
             return jsonify(
                 {
@@ -73,17 +145,22 @@ def upload_book():
                 }
             ), 400
 
-        metadata = extract_metadata(epub_book)
-        title, author = metadata.get("title", ""), metadata.get("author", "")
-        filename = generate_filename(title, author, current_app.config["BOOK_DIR"])
+        title, author = metadata["title"], metadata["author"]
+        cover_path = metadata["cover_path"]
+        cover_bytes = read_epub_cover(temp_file_path, cover_path)
+        duplicates = _content_duplicates(temp_file_path)
+        if duplicates:
+            current_app.logger.warning(
+                f"Upload {file.filename!r} nearly matches "
+                f"{', '.join(d['filename'] for d in duplicates)}"
+            )
 
-        # Rename the file to standardized name
-        final_file_path = os.path.join(current_app.config["BOOK_DIR"], filename)
-        os.rename(temp_file_path, final_file_path)
-        current_app.logger.info(f"Renamed file to {final_file_path}")
+        # Store the file under its standardized name
+        filename = generate_filename(title, author, storage)
+        storage.put_file(filename, temp_file_path)
+        current_app.logger.info(f"Stored upload as {filename}")
+        _remember_upload(filename)
 
-        cover_path = get_epub_cover_path(final_file_path)
-        cover_bytes = read_epub_cover(final_file_path, cover_path)
         cover_data_url = (
             f"data:{cover_mimetype(cover_path)};base64,"
             f"{base64.b64encode(cover_bytes).decode('utf-8')}"
@@ -98,6 +175,9 @@ def upload_book():
                 "author": author,
                 "cover": cover_data_url,
                 "cover_path": cover_path,
+                # Books already in the library with (nearly) the same text,
+                # most similar first, so the client can warn before saving.
+                "duplicates": duplicates,
             }
         )
 
@@ -120,32 +200,60 @@ def upload_book_metadata():
     if not new_filename:
         return jsonify({"error": "Missing new filename"}), 400
 
+    storage = book_storage()
+    # The file is in the library since upload_book, so a running `flask
+    # scan-library` may already have added it with the EPUB's own metadata.
+    # Take that row over rather than adding a second one, but never a row
+    # for any other book.
+    book = None
+    for existing in Book.query.filter(
+        Book.filename.in_([new_filename, original_filename])
+    ):
+        if existing.filename != original_filename or not _is_unedited_scan(
+            existing, original_filename, storage
+        ):
+            return jsonify({"error": f"{existing.filename} is already a book"}), 409
+        book = existing
+    if original_filename != new_filename and storage.exists(new_filename):
+        return jsonify({"error": f"{new_filename} already exists"}), 409
+
     if original_filename != new_filename:
         try:
-            original_filepath = os.path.join(
-                current_app.config["BOOK_DIR"], original_filename
-            )
-            new_filepath = os.path.join(current_app.config["BOOK_DIR"], new_filename)
-            os.rename(original_filepath, new_filepath)
+            storage.rename(original_filename, new_filename)
             current_app.logger.info(
-                f"Renamed file from {original_filepath} to {new_filepath}"
+                f"Renamed file from {original_filename} to {new_filename}"
             )
         except Exception as e:
             current_app.logger.error(f"Failed to rename file: {str(e)}")
             return jsonify({"error": "Failed to rename file: " + str(e)}), 500
 
+    try:
+        metadata = storage.read_ingest_metadata(new_filename)
+        stats = book_columns(metadata)
+        identifiers = identifier_rows(metadata["identifiers"])
+    except Exception as e:
+        # Not fatal: backfill-book-stats can fill these in later.
+        current_app.logger.warning(f"Could not measure {new_filename}: {str(e)}")
+        stats = {}
+        identifiers = []
+
     try:
         with commit_or_rollback():
-            db.session.add(
-                Book(
-                    title=data.get("title"),
-                    author=data.get("author"),
-                    genre=data.get("genre"),
-                    filename=new_filename,
-                    cover_path=data.get("cover_path"),
-                    access_level="standard",
-                )
-            )
+            if book is None:
+                book = Book(access_level="standard")
+                db.session.add(book)
+            book.title = data.get("title")
+            book.author = data.get("author")
+            book.genre = data.get("genre")
+            book.filename = new_filename
+            book.cover_path = data.get("cover_path")
+            if stats:  # Otherwise keep what the scan found, if anything
+                book.identifiers = identifiers
+            for field, value in stats.items():
+                setattr(book, field, value)
+        staged = session.get(_STAGED_UPLOADS, {})
+        if staged.pop(original_filename, None) is not None:
+            session[_STAGED_UPLOADS] = staged
         return jsonify({"message": "Book added successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
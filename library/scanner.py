@@ -0,0 +1,113 @@
+"""Incremental scanning of BOOK_DIR against a stat manifest.
+
+The manifest records ``(size, mtime_ns, inode)`` for every EPUB seen on the
+last pass, so a rescan only has to list the directory and compare stat
+results; EPUBs are opened only when they are new or changed. A file that
+disappears while another with the same inode appears is treated as a rename.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+MANIFEST_VERSION = 1
+
+# Marker file an admin can create in BOOK_DIR (``touch BOOK_DIR/.library``).
+# An unmounted share shows up as an empty directory, so scan-library refuses
+# to treat an empty listing as "every book was deleted", unless this file is
+# there to prove the listing comes from the real library.
+BOOK_DIR_SENTINEL = ".library"
+
+# Files modified more recently than this are assumed to still be copying in
+# and are left for the next pass.
+SETTLE_SECONDS = 2.0
+
+
+@dataclass
+class ScanDiff:
+    new: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # (old filename, new filename)
+    renamed: list[tuple[str, str]] = field(default_factory=list)
+    # Filename -> stat entry for everything that settled this pass.
+    seen: dict[str, list[int]] = field(default_factory=dict)
+    unsettled: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed or self.removed or self.renamed)
+
+
+def load_manifest(path: str) -> dict[str, list[int]]:
+    """Return ``{filename: [size, mtime_ns, inode]}``; empty if missing or
+    unreadable, which just makes the next scan a full one."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(path: str, files: dict[str, list[int]]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def has_sentinel(book_dir: str) -> bool:
+    return os.path.isfile(os.path.join(book_dir, BOOK_DIR_SENTINEL))
+
+
+def diff_directory(
+    book_dir: str, manifest: dict[str, list[int]], now: float | None = None
+) -> ScanDiff:
+    """Compare the EPUBs in `book_dir` with `manifest`."""
+    now = time.time() if now is None else now
+    diff = ScanDiff()
+
+    for entry in os.scandir(book_dir):
+        if not entry.name.endswith(".epub"):
+            continue
+        try:
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        if now - st.st_mtime < SETTLE_SECONDS:
+            diff.unsettled.append(entry.name)
+            continue
+        diff.seen[entry.name] = [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    for name in sorted(diff.seen):
+        previous = manifest.get(name)
+        if previous is None:
+            diff.new.append(name)
+        elif previous != diff.seen[name]:
+            diff.changed.append(name)
+    # Still-copying files keep their old entry rather than counting as removed.
+    diff.removed = sorted(
+        name
+        for name in manifest
+        if name not in diff.seen and name not in diff.unsettled
+    )
+
+    # Pair removed files with new ones on the same inode (and size): renames.
+    removed_by_inode = {
+        (manifest[name][2], manifest[name][0]): name for name in diff.removed
+    }
+    for name in list(diff.new):
+        size, _, inode = diff.seen[name]
+        old = removed_by_inode.pop((inode, size), None)
+        if old is not None:
+            diff.renamed.append((old, name))
+            diff.new.remove(name)
+            diff.removed.remove(old)
+
+    return diff
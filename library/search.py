@@ -0,0 +1,178 @@
+"""Catalog text search backed by SQLite FTS5.
+
+Title, author and genre filters become a MATCH against ``books_fts`` (see
+``models.BOOKS_FTS_DDL``). The index is trigram-tokenized, so a filter word
+matches anywhere inside a field, case-insensitively, just as the
+``ilike('%word%')`` filters it replaces did. The difference is that the
+lookup goes through the index and results can be ranked with bm25. Trigrams
+need three characters: shorter words can't use the index and are returned
+separately so the caller can fall back to LIKE for them.
+
+Book contents go into a second index, ``chapter_fts`` over ``chapter_texts``
+(see ``models.CHAPTER_FTS_DDL``): one row per spine chapter, word-tokenized,
+filled in the background by ``flask index-content`` rather than on upload.
+The same pass records each book's MinHash signature for duplicates.py.
+"""
+
+import html
+import re
+
+from sqlalchemy import column, table
+
+from .duplicates import minhash, store_signature
+from .models import Book, ChapterText, db
+from .utils import extract_chapter_texts, read_file_state
+
+FILTER_COLUMNS = ("title", "author", "genre")
+_MIN_INDEXED_WORD = 3
+
+# Lightweight handle for the virtual table. It is not part of db.metadata,
+# so create_all leaves its creation to the DDL in models.
+books_fts = table("books_fts", column("rowid"), column("rank"), column("books_fts"))
+chapter_fts = table(
+    "chapter_fts", column("rowid"), column("rank"), column("chapter_fts")
+)
+
+# snippet() wraps matches in these; they can't occur in extracted text, so
+# the snippet can be HTML-escaped first and the markers swapped for <mark>.
+_MARK_START, _MARK_END = "\x02", "\x03"
+SNIPPET_TOKENS = 16
+# Characters of context either side of a find-in-book match.
+SNIPPET_CONTEXT = 60
+
+
+def _quote(word: str) -> str:
+    # An FTS5 string: doubled quotes escape, and nothing inside is syntax.
+    return '"' + word.replace('"', '""') + '"'
+
+
+def filter_match(filters: dict | None) -> tuple[str | None, list[tuple[str, str]]]:
+    """Split title/author/genre filters into an FTS5 MATCH expression (None
+    when no word is indexable) and the ``(column, word)`` pairs too short to
+    look up by trigram. Every word must match its column."""
+    terms = []
+    short_words = []
+    for name in FILTER_COLUMNS:
+        for word in ((filters or {}).get(name) or "").split():
+            if len(word) >= _MIN_INDEXED_WORD:
+                terms.append(f"{name} : {_quote(word)}")
+            else:
+                short_words.append((name, word))
+    return (" AND ".join(terms) or None), short_words
+
+
+def content_match(query: str) -> str | None:
+    """FTS5 MATCH expression requiring every word of a free-text `query`;
+    a trailing ``*`` keeps a word as a prefix. None when there are no words."""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append(_quote(word) + (" *" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def snippet_column():
+    """SQL for a highlighted excerpt of the best-matching chapter column."""
+    return db.func.snippet(
+        column("chapter_fts"), -1, _MARK_START, _MARK_END, "…", SNIPPET_TOKENS
+    )
+
+
+def snippet_html(snippet: str) -> str:
+    """Escape a snippet() result and turn its match markers into <mark>."""
+    return (
+        html.escape(snippet)
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_END, "</mark>")
+    )
+
+
+def pending_content_query(refresh_all: bool = False):
+    """Books whose contents are not indexed, or were indexed from a file that
+    has since changed."""
+    query = Book.query
+    if not refresh_all:
+        query = query.filter(
+            db.or_(
+                Book.content_indexed_fingerprint.is_(None),
+                Book.content_indexed_fingerprint != Book.file_fingerprint,
+            )
+        )
+    return query
+
+
+def read_for_content_index(storage, filename: str) -> tuple:
+    """Read one EPUB for `flask index-content`: ``(filename, file_state,
+    chapters, error)``. Runs in worker processes, so it takes and returns
+    only plain, picklable values."""
+    try:
+        state, chapters = storage.read_local(
+            filename, lambda path: (read_file_state(path), extract_chapter_texts(path))
+        )
+        return filename, state, chapters, None
+    except Exception as e:
+        return filename, None, None, str(e)
+
+
+def store_content_index(book: Book, state: dict, chapters: list[dict]) -> None:
+    """Replace `book`'s indexed chapters and content signature (see
+    duplicates.py) with those of `chapters`, recording the file state they
+    were read from. The caller commits."""
+    ChapterText.query.filter_by(book_id=book.id).delete(synchronize_session=False)
+    db.session.add_all(
+        ChapterText(
+            book_id=book.id,
+            spine_index=chapter["spine_index"],
+            title=(chapter["title"] or "")[:500] or None,
+            text=chapter["text"],
+        )
+        for chapter in chapters
+    )
+    store_signature(book, minhash(chapters))
+    for key, value in state.items():
+        setattr(book, key, value)
+    book.content_indexed_fingerprint = state["file_fingerprint"]
+
+
+def phrase_pattern(query: str) -> re.Pattern | None:
+    """Case-insensitive pattern for `query` as a literal phrase, matching any
+    run of whitespace between its words as chapter text collapses whitespace.
+    None when `query` has no words."""
+    words = query.split()
+    if not words:
+        return None
+    return re.compile(r"\s+".join(map(re.escape, words)), re.IGNORECASE)
+
+
+def find_in_chapters(chapters, pattern: re.Pattern, limit: int) -> tuple[list, bool]:
+    """Matches of `pattern` in `chapters` (``(spine_index, text)`` pairs, in
+    reading order) as ``({"spine_index", "offset", "length", "snippet"}, ...)``
+    plus whether there were more than `limit`. Offsets count characters of
+    the indexed plain text (see utils.chapter_plain_text). Stops pulling
+    chapters as soon as the limit is passed."""
+    matches = []
+    for spine_index, text in chapters:
+        for m in pattern.finditer(text):
+            if len(matches) == limit:
+                return matches, True
+            start, end = m.span()
+            lo = max(0, start - SNIPPET_CONTEXT)
+            hi = min(len(text), end + SNIPPET_CONTEXT)
+            snippet = (
+                ("…" if lo else "")
+                + html.escape(text[lo:start])
+                + "<mark>"
+                + html.escape(text[start:end])
+                + "</mark>"
+                + html.escape(text[end:hi])
+                + ("…" if hi < len(text) else "")
+            )
+            matches.append({
+                "spine_index": spine_index,
+                "offset": start,
+                "length": end - start,
+                "snippet": snippet,
+            })
+    return matches, False
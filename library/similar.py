@@ -0,0 +1,290 @@
+""""More like this": each book's nearest neighbours by TF-IDF cosine similarity.
+
+A book is a TF-IDF vector over the words of its indexed chapter text (see
+search.py) plus its title, author and genre. Only its TERMS_PER_BOOK
+heaviest terms are kept, L2-normalised, which drops the words every book
+uses and keeps the vectors small enough to score in pure Python. Three
+tables hold the result (see models.SIMILAR_DDL):
+
+* ``similar_terms``: how many books each term appears in.
+* ``book_terms``: each book's kept terms and weights, indexed by term, so the
+  books sharing a term with a given one are an indexed lookup away.
+* ``book_neighbours``: each book's SIMILAR_BOOKS closest books, so
+  /similar/<filename> is a single indexed read.
+
+``flask build-similar`` recomputes all of it from scratch. Books indexed
+after that (uploads, changed files) are added by ``flask index-content`` via
+update_similar_books: the new vector is weighted with the stored document
+frequencies, scored against the books it shares terms with, and the book
+joins whichever neighbour lists it now ranks in. Other books' weights are
+not revisited, so they drift slowly as the library grows; rerun
+build-similar now and then to bring everything back in line.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import (
+    Book,
+    ChapterText,
+    book_neighbours,
+    book_terms,
+    db,
+    similar_terms,
+)
+
+TERMS_PER_BOOK = 100
+SIMILAR_BOOKS = 10
+
+# Title, author and genre words count as this many occurrences, so they
+# weigh about as much as a word the text uses often.
+_METADATA_COUNT = 20
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+_MAX_TERM = 100  # similar_terms.term length
+_CHUNK = 500  # Bound parameters per IN (...)
+
+_BOOK_COLUMNS = (Book.id, Book.title, Book.author, Book.genre)
+
+
+def _words(text: str | None) -> list[str]:
+    return [word[:_MAX_TERM] for word in _WORD_RE.findall((text or "").lower())]
+
+
+def term_counts(book) -> Counter:
+    """Term occurrences in `book` (a row with id, title, author and genre)
+    and its indexed chapter text. Author and genre words are kept apart from
+    the same words in text, so "by Austen" and "about Austen" differ."""
+    counts = Counter()
+    texts = (
+        db.session.query(ChapterText.text)
+        .filter(ChapterText.book_id == book.id)
+        .yield_per(8)
+    )
+    for (text,) in texts:
+        counts.update(_words(text))
+    for word in _words(book.title):
+        counts[word] += _METADATA_COUNT
+    for word in _words(book.author):
+        counts[f"author:{word}"[:_MAX_TERM]] += _METADATA_COUNT
+    for word in _words(book.genre):
+        counts[f"genre:{word}"[:_MAX_TERM]] += _METADATA_COUNT
+    return counts
+
+
+def tfidf_vector(counts: Counter, doc_counts, total: int) -> dict[str, float]:
+    """The TERMS_PER_BOOK heaviest terms of `counts` by sublinear TF-IDF,
+    L2-normalised. `doc_counts` maps term to the number of books it appears
+    in (this book included), out of `total`."""
+    weights = {
+        term: (1 + math.log(count))
+        * (math.log((1 + total) / (1 + doc_counts.get(term, 1))) + 1)
+        for term, count in counts.items()
+    }
+    top = heapq.nlargest(TERMS_PER_BOOK, weights.items(), key=lambda item: item[1])
+    norm = math.sqrt(sum(weight * weight for _, weight in top)) or 1.0
+    return {term: weight / norm for term, weight in top}
+
+
+def _chunks(items: list, size: int = _CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _indexed_books():
+    return (
+        db.session.query(
+            *_BOOK_COLUMNS,
+            Book.content_indexed_fingerprint,
+            Book.similar_indexed_fingerprint,
+        )
+        .filter(Book.content_indexed_fingerprint.is_not(None))
+        .order_by(Book.id)
+    )
+
+
+def rebuild_similar() -> tuple[int, int]:
+    """Recompute every indexed book's vector and neighbours. Returns
+    ``(books, neighbour rows)``. Reads each book's text twice (document
+    frequencies first, then vectors) rather than holding it all in memory.
+    The caller commits."""
+    books = _indexed_books().all()
+    doc_counts = Counter()
+    for book in books:
+        doc_counts.update(term_counts(book).keys())
+
+    vectors = {
+        book.id: tfidf_vector(term_counts(book), doc_counts, len(books))
+        for book in books
+    }
+    postings = defaultdict(list)
+    for book_id, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((book_id, weight))
+
+    neighbour_rows = []
+    for book_id, vector in vectors.items():
+        scores = defaultdict(float)
+        for term, weight in vector.items():
+            for other_id, other_weight in postings[term]:
+                scores[other_id] += weight * other_weight
+        scores.pop(book_id, None)
+        neighbour_rows.extend(
+            {"book_id": book_id, "neighbour_id": other_id, "score": score}
+            for other_id, score in heapq.nlargest(
+                SIMILAR_BOOKS, scores.items(), key=lambda item: (item[1], -item[0])
+            )
+        )
+
+    for table in (similar_terms, book_terms, book_neighbours):
+        db.session.execute(delete(table))
+    for rows in _chunks(
+        [{"term": term, "doc_count": count} for term, count in doc_counts.items()],
+        10_000,
+    ):
+        db.session.execute(insert(similar_terms), rows)
+    term_rows = [
+        {"book_id": book_id, "term": term, "weight": weight}
+        for book_id, vector in vectors.items()
+        for term, weight in vector.items()
+    ]
+    for rows in _chunks(term_rows, 10_000):
+        db.session.execute(insert(book_terms), rows)
+    for rows in _chunks(neighbour_rows, 10_000):
+        db.session.execute(insert(book_neighbours), rows)
+    for book in books:
+        db.session.query(Book).filter(Book.id == book.id).update(
+            {Book.similar_indexed_fingerprint: book.content_indexed_fingerprint},
+            synchronize_session=False,
+        )
+    return len(books), len(neighbour_rows)
+
+
+def pending_similar_query():
+    """Indexed books whose vector is missing or was built from other text."""
+    return _indexed_books().filter(
+        Book.similar_indexed_fingerprint.is_distinct_from(
+            Book.content_indexed_fingerprint
+        )
+    )
+
+
+def _add_book(book) -> None:
+    """Give one book (new, or with changed text) a vector and neighbours,
+    and add it to the lists of the books it now ranks among."""
+    for table in (book_terms, book_neighbours):
+        db.session.execute(delete(table).where(table.c.book_id == book.id))
+    db.session.execute(
+        delete(book_neighbours).where(book_neighbours.c.neighbour_id == book.id)
+    )
+
+    counts = term_counts(book)
+    terms = list(counts)
+    # Count a new book's terms. A changed book's were counted when it was
+    # added; close enough until the next rebuild.
+    if book.similar_indexed_fingerprint is None:
+        for chunk in _chunks(terms):
+            stmt = sqlite_insert(similar_terms).values(
+                [{"term": term, "doc_count": 1} for term in chunk]
+            )
+            db.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["term"],
+                    set_={"doc_count": similar_terms.c.doc_count + 1},
+                )
+            )
+    doc_counts = {}
+    for chunk in _chunks(terms):
+        doc_counts.update(
+            db.session.execute(
+                select(similar_terms.c.term, similar_terms.c.doc_count).where(
+                    similar_terms.c.term.in_(chunk)
+                )
+            ).all()
+        )
+    total = 1 + db.session.query(func.count(Book.id)).filter(
+        Book.similar_indexed_fingerprint.is_not(None), Book.id != book.id
+    ).scalar()
+    vector = tfidf_vector(counts, doc_counts, total)
+
+    scores = defaultdict(float)
+    for term_row in db.session.execute(
+        select(book_terms.c.book_id, book_terms.c.term, book_terms.c.weight).where(
+            book_terms.c.term.in_(list(vector))
+        )
+    ):
+        scores[term_row.book_id] += vector[term_row.term] * term_row.weight
+    scores.pop(book.id, None)
+
+    if vector:
+        db.session.execute(
+            insert(book_terms),
+            [
+                {"book_id": book.id, "term": term, "weight": weight}
+                for term, weight in vector.items()
+            ],
+        )
+    nearest = heapq.nlargest(
+        SIMILAR_BOOKS, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+    if nearest:
+        db.session.execute(
+            insert(book_neighbours),
+            [
+                {"book_id": book.id, "neighbour_id": other_id, "score": score}
+                for other_id, score in nearest
+            ],
+        )
+
+    # Join the lists that are short, or whose weakest entry it beats.
+    for chunk in _chunks(list(scores)):
+        # SQLite takes a bare column alongside min() from the minimum row.
+        lists = db.session.execute(
+            select(
+                book_neighbours.c.book_id,
+                func.count(),
+                func.min(book_neighbours.c.score),
+                book_neighbours.c.neighbour_id,
+            )
+            .where(book_neighbours.c.book_id.in_(chunk))
+            .group_by(book_neighbours.c.book_id)
+        ).all()
+        weakest = {row[0]: row[1:] for row in lists}
+        for other_id in chunk:
+            n, weakest_score, weakest_id = weakest.get(other_id, (0, 0.0, None))
+            if n >= SIMILAR_BOOKS:
+                if scores[other_id] <= weakest_score:
+                    continue
+                db.session.execute(
+                    delete(book_neighbours).where(
+                        book_neighbours.c.book_id == other_id,
+                        book_neighbours.c.neighbour_id == weakest_id,
+                    )
+                )
+            db.session.execute(
+                insert(book_neighbours).values(
+                    book_id=other_id, neighbour_id=book.id, score=scores[other_id]
+                )
+            )
+
+    db.session.query(Book).filter(Book.id == book.id).update(
+        {Book.similar_indexed_fingerprint: book.content_indexed_fingerprint},
+        synchronize_session=False,
+    )
+
+
+def update_similar_books(batch_size: int = 20) -> int:
+    """Add every pending book (see pending_similar_query) to the neighbour
+    lists, committing a batch at a time. Returns how many were added."""
+    added = 0
+    for book in pending_similar_query().all():
+        _add_book(book)
+        added += 1
+        if added % batch_size == 0:
+            db.session.commit()
+    db.session.commit()
+    return added
@@ -1,6 +1,9 @@
-let offset = 8;
+// Opaque keyset cursor for the next /load_more page (X-Next-Cursor); null
+// means start from the top. The server seeds it after its first batch and
+// leaves it null when that batch was everything.
+let nextCursor = window.nextCursor ?? null;
 let isLoading = false;
-let allImagesLoaded = false;
+let allImagesLoaded = nextCursor === null;
 let currentFilters = {};
 // View state — 'all' (every book, newest first) or 'mine' (only started, by last_read).
 // Server renders the initial batch using window.initialView; localStorage may override it.
@@ -13,7 +16,8 @@ let currentLayout = localStorage.getItem('libraryLayout') === 'shelf' ? 'shelf'
 // can re-render without re-fetching.
 const loadedBooks = [];
 // Total books available for the current view+filter. Server seeds it on
-// initial render; each /load_more response refreshes it via X-Total-Count.
+// initial render; the first /load_more page of a filter refreshes it via
+// X-Total-Count (later pages omit the header).
 // Used to cap the number of loading skeletons we render.
 let totalBooks = (typeof window.totalBooks === 'number') ? window.totalBooks : null;
 
@@ -192,15 +196,19 @@ function loadMoreImages() {
 
     const queryParams = new URLSearchParams(currentFilters);
     queryParams.set('view', currentView);
+    const firstPage = nextCursor === null;
+    if (!firstPage) queryParams.set('cursor', nextCursor);
 
-    $.get(appUrl(`/load_more/${offset}?${queryParams.toString()}`), function(data, _status, jqXHR) {
+    $.get(appUrl(`/load_more?${queryParams.toString()}`), function(data, _status, jqXHR) {
         skeletons.forEach(el => el.remove());
         const reported = parseInt(jqXHR.getResponseHeader('X-Total-Count'), 10);
         if (!Number.isNaN(reported)) totalBooks = reported;
+        nextCursor = jqXHR.getResponseHeader('X-Next-Cursor');
+        if (!nextCursor) allImagesLoaded = true;
 
         if (data.length === 0) {
             allImagesLoaded = true;
-            if (offset === 0) {
+            if (firstPage) {
                 renderEmptyState();
                 $('#library').hide();
             }
@@ -213,7 +221,6 @@ function loadMoreImages() {
             });
             repaintShelfPlanks();
         }
-        offset += 8;
         isLoading = false;
         requestAnimationFrame(tryLoadMoreIfPageStillShort);
     }).fail(function() {
@@ -346,7 +353,7 @@ function updateViewToggleUI() {
 }
 
 function reloadLibrary() {
-    offset = 0;
+    nextCursor = null;
     allImagesLoaded = false;
     loadedBooks.length = 0;
     $('#emptyState').hide();
@@ -436,7 +443,7 @@ function updateLayoutToggleUI() {
 // Add filter handling
 function applyFilters() {
     // Reset pagination
-    offset = 0;
+    nextCursor = null;
     allImagesLoaded = false;
     
     // Collect filter values
@@ -613,6 +620,7 @@ function generateMetadataHtml(data, isUpload = false) {
                 ${adminOnlyField}
             </div>
         </section>
+        ${isUpload ? '' : '<section class="meta-similar" id="metadata-similar" hidden></section>'}
         <footer class="meta-footer">
             ${created}
             <div class="meta-footer-actions">
@@ -630,11 +638,34 @@ function showMetadata(filename) {
         $('#metadataOverlay').css('display', 'flex').fadeIn();
         initializeTagInput('tags-input', 'tags-container', data.tags);
         focusFirstMetadataField();
+        loadSimilarBooks(filename);
     }).fail(function() {
         showToast('Could not load book metadata', 'error');
     });
 }
 
+// "More like this": precomputed neighbours, filled in once they arrive. The
+// panel stays hidden when there are none (e.g. contents not indexed yet).
+function loadSimilarBooks(filename) {
+    $.get(appUrl(`/similar/${encodeURIComponent(filename)}`), function(books) {
+        const panel = document.getElementById('metadata-similar');
+        if (!panel || !books.length) return;
+        const items = books.map(b => `
+            <button type="button" class="meta-similar__item"
+                    data-action="show-metadata" data-filename="${escapeHtml(b.filename)}"
+                    title="${escapeHtml(b.title)} — ${escapeHtml(b.author)}">
+                <img src="${escapeHtml(b.cover)}" alt="" loading="lazy">
+                <span>${escapeHtml(b.title)}</span>
+            </button>
+        `).join('');
+        panel.innerHTML = `
+            <span class="meta-label">More like this</span>
+            <div class="meta-similar__list">${items}</div>
+        `;
+        panel.hidden = false;
+    });
+}
+
 function showUploadMetadata(data) {
     $('#metadataContent').html(generateMetadataHtml(data, true));
     $('#metadataOverlay').css('display', 'flex').fadeIn();
@@ -11,6 +11,14 @@ let lastSaveTimeout = null;
 let selectedRange = null;
 let hrefChapterMapping = {};
 
+// Chapter the reader asked for before it had streamed in. The server is told
+// to send it next (see requestChapter); we jump once it arrives.
+let pendingJump = null;
+let streamFinished = false;
+// Chapters either side of the bookmark streamed when navigator.connection.saveData
+// is set.
+const SAVE_DATA_WINDOW = 2;
+
 // Reading mode: 'scroll' (default, vertical) or 'paginate' (CSS column-based
 // horizontal pagination). Bookmark.position is a 0..1 fraction in both modes;
 // scroll mode treats it as scrollY/scrollHeight, paginate mode as
@@ -427,7 +435,14 @@ window.addEventListener('DOMContentLoaded', () => {
     // Show controls immediately on load
     document.querySelector('.top-controls').classList.add('visible');
     
-    fetch(appUrl(`/load_book/${filename}`))
+    // 'nearest' streams the bookmarked chapter, then its neighbours outward.
+    // On data-saver connections only a window around it is streamed; the rest
+    // is fetched from /chapter as the reader gets there.
+    let loadUrl = `/load_book/${filename}?order=nearest`;
+    if (navigator.connection && navigator.connection.saveData) {
+        loadUrl += `&window=${SAVE_DATA_WINDOW}`;
+    }
+    fetch(appUrl(loadUrl))
         .then(response => {
             const reader = response.body.getReader();
             const decoder = new TextDecoder("utf-8");
@@ -450,54 +465,14 @@ window.addEventListener('DOMContentLoaded', () => {
                             displayBookMetadata();
                             break;
                         case 'chapter':
-                            currentChapter = data;
-                            chapterNum = currentChapter.index;
-                            hrefChapterMapping[currentChapter.href] = chapterNum;
-
-                            // Ungrey every TOC entry pointing at this spine index, and
-                            // for synthetic entries (no real NCX) replace the placeholder
-                            // title with the one scraped from the chapter HTML.
-                            document.querySelectorAll(
-                                `#toc-content .toc-item[data-spine-index="${chapterNum}"]`
-                            ).forEach(item => {
-                                item.classList.remove('unprocessed');
-                                if (item.dataset.synthetic === 'true' && currentChapter.title) {
-                                    item.textContent = currentChapter.title;
-                                }
-                            });
-
-                            allChapters[chapterNum] = currentChapter;
-                            if (chapterNum == currentChapterNum) {
-                                document.getElementById('loading-spinner').style.display = 'none';
-                                document.getElementById('reader-content').style.display = 'block';
-                                applyReadingModeClass();
-                                updateReadingModeButton();
-                                displayChapter();
-
-                                // Wait for next paint to ensure content is rendered
-                                requestAnimationFrame(() => {
-                                    if (isPaginated()) {
-                                        layoutPaginatedChapter();
-                                        currentPageIndex = Math.round(
-                                            currentPagePosition * Math.max(0, totalPages - 1)
-                                        );
-                                        applyPageTransform(false);
-                                        updateProgressBar();
-                                        updateChapterNumberLabel();
-                                    } else {
-                                        window.scrollTo({
-                                            top: currentPagePosition * document.documentElement.scrollHeight,
-                                            behavior: 'instant'
-                                        });
-                                    }
-                                });
-                            }
+                            handleChapter(data);
                     }    
                 }
             }
             function readStream() {
                 reader.read().then(({done, value}) => {
                     if (done) {
+                        streamFinished = true;
                         if (buffer) {
                             processChunk('');
                         }
@@ -516,6 +491,62 @@ window.addEventListener('DOMContentLoaded', () => {
         })
 });
 
+// Store a rendered chapter (from the stream or /chapter) and show it if it's
+// the one the reader is waiting on.
+function handleChapter(data) {
+    currentChapter = data;
+    chapterNum = currentChapter.index;
+    hrefChapterMapping[currentChapter.href] = chapterNum;
+
+    // Ungrey every TOC entry pointing at this spine index, and
+    // for synthetic entries (no real NCX) replace the placeholder
+    // title with the one scraped from the chapter HTML.
+    document.querySelectorAll(
+        `#toc-content .toc-item[data-spine-index="${chapterNum}"]`
+    ).forEach(item => {
+        item.classList.remove('unprocessed');
+        if (item.dataset.synthetic === 'true' && currentChapter.title) {
+            item.textContent = currentChapter.title;
+        }
+    });
+
+    allChapters[chapterNum] = currentChapter;
+    if (pendingJump && pendingJump.index === chapterNum) {
+        const {index, sectionId} = pendingJump;
+        pendingJump = null;
+        // May beat the bookmarked chapter, so reveal the reader here too.
+        document.getElementById('loading-spinner').style.display = 'none';
+        document.getElementById('reader-content').style.display = 'block';
+        applyReadingModeClass();
+        updateReadingModeButton();
+        jumpToChapter(index, sectionId);
+    } else if (chapterNum == currentChapterNum) {
+        document.getElementById('loading-spinner').style.display = 'none';
+        document.getElementById('reader-content').style.display = 'block';
+        applyReadingModeClass();
+        updateReadingModeButton();
+        displayChapter();
+
+        // Wait for next paint to ensure content is rendered
+        requestAnimationFrame(() => {
+            if (isPaginated()) {
+                layoutPaginatedChapter();
+                currentPageIndex = Math.round(
+                    currentPagePosition * Math.max(0, totalPages - 1)
+                );
+                applyPageTransform(false);
+                updateProgressBar();
+                updateChapterNumberLabel();
+            } else {
+                window.scrollTo({
+                    top: currentPagePosition * document.documentElement.scrollHeight,
+                    behavior: 'instant'
+                });
+            }
+        });
+    }
+}
+
 function displayBookMetadata() {
     document.getElementById('book-title').textContent = currentBook.title;
     document.getElementById('book-author').textContent = `by ${currentBook.author}`;
@@ -637,6 +668,11 @@ function displayChapter() {
 }
 
 function nextChapter() {
+    if (currentChapterNum < currentBook.spine_length - 1
+            && !allChapters[currentChapterNum + 1]) {
+        requestChapter(currentChapterNum + 1);
+        return;
+    }
     if (currentChapterNum < currentBook.spine_length - 1) {
         currentChapterNum++;
         displayChapter();
@@ -660,6 +696,10 @@ function nextChapter() {
 }
 
 function prevChapter() {
+    if (currentChapterNum > 0 && !allChapters[currentChapterNum - 1]) {
+        requestChapter(currentChapterNum - 1);
+        return;
+    }
     if (currentChapterNum > 0) {
         currentChapterNum--;
         displayChapter();
@@ -679,8 +719,39 @@ function prevChapter() {
     }
 }
 
+// Ask the in-flight /load_book stream to send `index` next, then jump to it
+// when it lands. Fire-and-forget: worst case it arrives in normal order. Once
+// the stream is done, or `index` lies outside its window, fetch the chapter
+// on its own instead.
+function requestChapter(index, sectionId) {
+    if (!currentBook) return;
+    pendingJump = {index, sectionId};
+    document.getElementById('toc-menu').classList.remove('visible');
+    const outsideWindow = currentBook.window != null
+        && Math.abs(index - currentBook.start_chapter) > currentBook.window;
+    if (streamFinished || outsideWindow || !currentBook.stream_id) {
+        fetch(appUrl(`/chapter/${filename}/${index}`))
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(handleChapter)
+            .catch(error => console.error('Error loading chapter:', error));
+        return;
+    }
+    fetch(appUrl(`/load_book/${filename}/jump`), {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({stream_id: currentBook.stream_id, chapter_index: index}),
+    }).catch(error => console.error('Error sending jump hint:', error));
+}
+
 function jumpToChapter(index, sectionId) {
-    if (index < 0 || !allChapters[index]) return;
+    if (index < 0) return;
+    if (!allChapters[index]) {
+        requestChapter(index, sectionId);
+        return;
+    }
     currentChapterNum = index;
     displayChapter();
 
@@ -0,0 +1,514 @@
+"""Where the EPUB files live.
+
+Everything that lists, reads, writes or deletes a book's file goes through a
+:class:`BookStorage`, picked by BOOK_STORAGE: :class:`LocalStorage` for a
+directory (BOOK_DIR, possibly a NAS mount) or :class:`S3Storage` for an
+S3-compatible bucket, so several app nodes can serve one library.
+
+Ingest only needs the zip central directory and the OPF, so :meth:`open`
+returns a seekable file that S3 serves with ranged GETs; covers are read the
+same way (:meth:`read_uncached`). Reading a book (chapters, assets, downloads)
+goes through :meth:`local_path`, which fills :mod:`library.file_cache` on
+first use and is then a local disk read; :meth:`read_local` also copes with
+that copy being evicted before it's opened.
+"""
+
+import hashlib
+import hmac
+import io
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
+
+import httpx
+from flask import current_app
+from lxml import etree
+
+from .file_cache import LocalFileCache
+from .utils import read_file_state, read_ingest_metadata
+
+# Read-ahead for ranged reads; a zip's end records and central directory
+# usually fit in one request.
+_RANGE_BUFFER_SIZE = 256 * 1024
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+_S3_NS = {"s3": "http://s3.amazonaws.com/doc/2006-03-01/"}
+
+
+# Hidden subdirectory of a LocalStorage root that uploads are staged in.
+STAGING_SUBDIR = ".staging"
+
+
+class StorageError(OSError):
+    """The storage backend refused or failed a request."""
+
+
+@dataclass(frozen=True)
+class FileStat:
+    size: int
+    mtime_ns: int
+
+    def as_tuple(self) -> tuple[int, int]:
+        return self.size, self.mtime_ns
+
+
+class BookStorage(ABC):
+    """Flat namespace of EPUB files addressed by filename."""
+
+    def __init__(self, cache: LocalFileCache | None = None):
+        self.cache = cache
+
+    @abstractmethod
+    def stat(self, name: str) -> FileStat:
+        """Size and mtime of `name`; raises FileNotFoundError if missing."""
+
+    @abstractmethod
+    def list(self):
+        """Yield ``(name, FileStat)`` for every ``.epub`` in storage."""
+
+    @abstractmethod
+    def open(self, name: str):
+        """A seekable binary file for reading `name`."""
+
+    @abstractmethod
+    def local_path(
+        self, name: str, size: int | None = None, mtime_ns: int | None = None
+    ) -> str:
+        """A local path holding the current contents of `name`, for reads.
+
+        `size` and `mtime_ns` describe the file when the caller already has
+        them (e.g. recorded on ``Book``), saving a stat of the backend.
+        """
+
+    @abstractmethod
+    def put_file(self, name: str, src_path: str) -> None:
+        """Store the local file `src_path` as `name`, consuming `src_path`."""
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        """Remove `name`; missing files are not an error."""
+
+    @abstractmethod
+    def rename(self, old: str, new: str) -> None:
+        """Move `old` to `new`, replacing any file already there."""
+
+    @abstractmethod
+    def rewrite(self, name: str, edit) -> None:
+        """Apply ``edit(local_path)``, which modifies the EPUB in place, and
+        store the result as `name`."""
+
+    def staging_dir(self) -> str | None:
+        """Directory for uploads on their way into storage (None: system
+        temp)."""
+        return None
+
+    def read_local(
+        self,
+        name: str,
+        read,
+        size: int | None = None,
+        mtime_ns: int | None = None,
+    ):
+        """``read(path)`` on :meth:`local_path`'s copy of `name`.
+
+        A cached copy can be evicted by another reader between the lookup and
+        `read` opening it; on FileNotFoundError the copy is fetched again and
+        `read` retried once. Anything that opens the path later than that
+        (e.g. a stream) should open it inside `read`.
+        """
+        try:
+            return read(self.local_path(name, size, mtime_ns))
+        except FileNotFoundError:
+            return read(self.local_path(name, size, mtime_ns))
+
+    def read_uncached(self, name: str, read):
+        """``read(source)`` on `name` straight from the backend, leaving the
+        local cache alone: for reads of a member or two (e.g. a cover), where
+        copying the whole EPUB in would only evict books being read. `source`
+        is a local path or a seekable binary file (ranged reads for S3)."""
+        with self.open(name) as f:
+            return read(f)
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.stat(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def file_state(self, name: str) -> dict:
+        """:func:`~library.utils.read_file_state` for `name`."""
+        stat = self.stat(name)
+        with self.open(name) as f:
+            return read_file_state(f, stat.as_tuple())
+
+    def read_ingest_metadata(self, name: str) -> dict:
+        """:func:`~library.utils.read_ingest_metadata` for `name`."""
+        stat = self.stat(name)
+        with self.open(name) as f:
+            return read_ingest_metadata(f, stat.as_tuple())
+
+
+class LocalStorage(BookStorage):
+    """EPUBs in a directory on this machine (or a mount of one)."""
+
+    def __init__(self, root: str, cache: LocalFileCache | None = None):
+        super().__init__(cache)
+        self.root = os.path.abspath(root)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def stat(self, name):
+        st = os.stat(self.path(name))
+        return FileStat(st.st_size, st.st_mtime_ns)
+
+    def list(self):
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".epub"):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            yield entry.name, FileStat(st.st_size, st.st_mtime_ns)
+
+    def open(self, name):
+        return open(self.path(name), "rb")
+
+    def local_path(self, name, size=None, mtime_ns=None):
+        if self.cache is None:
+            return self.path(name)
+        return self.cache.path(self.root, name, size, mtime_ns)
+
+    def read_uncached(self, name, read):
+        # A path, so the read goes through the archive pool.
+        return read(self.path(name))
+
+    def put_file(self, name, src_path):
+        shutil.move(src_path, self.path(name))
+        self._invalidate(name)
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+        self._invalidate(name)
+
+    def rename(self, old, new):
+        os.rename(self.path(old), self.path(new))
+        self._invalidate(old)
+
+    def rewrite(self, name, edit):
+        edit(self.path(name))
+        self._invalidate(name)
+
+    def staging_dir(self):
+        # Same filesystem as the books, so put_file is a rename, but out of
+        # the top-level listing that scan-library and list() read, so a
+        # half-processed upload is never taken for a book.
+        path = os.path.join(self.root, STAGING_SUBDIR)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _invalidate(self, name: str) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(name)
+
+
+class _RangedReader(io.RawIOBase):
+    """Seekable read-only view of an object, fetched with ranged GETs."""
+
+    def __init__(self, storage: "S3Storage", key: str, size: int):
+        self._storage = storage
+        self._key = key
+        self._size = size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, b):
+        if self._pos >= self._size or not len(b):
+            return 0
+        end = min(self._pos + len(b), self._size) - 1
+        data = self._storage._get_range(self._key, self._pos, end)
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class S3Storage(BookStorage):
+    """EPUBs as objects under `prefix` in an S3-compatible bucket.
+
+    Talks to the bucket with path-style, SigV4-signed requests over httpx, so
+    it works against AWS, MinIO and other compatible servers without an SDK.
+    Reads for serving go through `cache`, which is required.
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        cache: LocalFileCache,
+        prefix: str = "",
+        region: str = "us-east-1",
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        super().__init__(cache)
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self._transport = transport
+        self._client = None
+        self._pid = None
+
+    def __getstate__(self):
+        # Pickled into import workers; each process opens its own connections.
+        state = self.__dict__.copy()
+        state["_client"] = None
+        return state
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None or self._pid != os.getpid():
+            self._client = httpx.Client(transport=self._transport, timeout=60.0)
+            self._pid = os.getpid()
+        return self._client
+
+    def stat(self, name):
+        response = self._request("HEAD", self._key(name))
+        return FileStat(
+            int(response.headers["Content-Length"]),
+            _mtime_ns(parsedate_to_datetime(response.headers["Last-Modified"])),
+        )
+
+    def list(self):
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": self.prefix}
+            if token:
+                query["continuation-token"] = token
+            response = self._request("GET", "", query=query)
+            root = etree.fromstring(response.content)
+            for item in root.iterfind("s3:Contents", _S3_NS):
+                name = item.findtext("s3:Key", namespaces=_S3_NS)[len(self.prefix) :]
+                if "/" in name or not name.endswith(".epub"):
+                    continue
+                modified = datetime.fromisoformat(
+                    item.findtext("s3:LastModified", namespaces=_S3_NS)
+                )
+                yield name, FileStat(
+                    int(item.findtext("s3:Size", namespaces=_S3_NS)),
+                    _mtime_ns(modified),
+                )
+            if root.findtext("s3:IsTruncated", namespaces=_S3_NS) != "true":
+                return
+            token = root.findtext("s3:NextContinuationToken", namespaces=_S3_NS)
+
+    def open(self, name):
+        raw = _RangedReader(self, self._key(name), self.stat(name).size)
+        return io.BufferedReader(raw, buffer_size=_RANGE_BUFFER_SIZE)
+
+    def local_path(self, name, size=None, mtime_ns=None):
+        for attempt in range(2):
+            if attempt or size is None or mtime_ns is None:
+                size, mtime_ns = self.stat(name).as_tuple()
+            path = self.cache.lookup(
+                name, size, mtime_ns, lambda dest: self._download(name, dest)
+            )
+            if path is not None:
+                return path
+            # The object changed since `size` was recorded (or mid-download);
+            # try once more against a fresh stat.
+        raise StorageError(f"Could not cache {name} locally")
+
+    def put_file(self, name, src_path):
+        with open(src_path, "rb") as f:
+            self._request(
+                "PUT",
+                self._key(name),
+                content=f,
+                headers={"Content-Length": str(os.fstat(f.fileno()).st_size)},
+            )
+        os.remove(src_path)
+        self.cache.invalidate(name)
+
+    def delete(self, name):
+        # S3 DELETE succeeds whether or not the key exists.
+        self._request("DELETE", self._key(name))
+        self.cache.invalidate(name)
+
+    def rename(self, old, new):
+        source = quote(f"/{self.bucket}/{self._key(old)}", safe="/-_.~")
+        self._request("PUT", self._key(new), headers={"x-amz-copy-source": source})
+        self.delete(old)
+
+    def rewrite(self, name, edit):
+        fd, temp_path = tempfile.mkstemp(suffix=".epub")
+        os.close(fd)
+        try:
+            self.read_local(name, lambda path: shutil.copyfile(path, temp_path))
+            edit(temp_path)
+            self.put_file(name, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def _get_range(self, key: str, start: int, end: int) -> bytes:
+        response = self._request(
+            "GET", key, headers={"Range": f"bytes={start}-{end}"}
+        )
+        return response.content
+
+    def _download(self, name: str, dest: str) -> None:
+        request = self._build_request("GET", self._key(name))
+        with self.client.stream(**request) as response:
+            _raise_for_status(response, name)
+            with open(dest, "wb") as f:
+                for chunk in response.iter_bytes(_DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+    def _request(self, method, key, query=None, headers=None, content=None):
+        response = self.client.request(
+            **self._build_request(method, key, query, headers), content=content
+        )
+        _raise_for_status(response, key)
+        return response
+
+    def _build_request(self, method, key, query=None, headers=None) -> dict:
+        path = quote(f"/{self.bucket}/{key}".rstrip("/"), safe="/-_.~")
+        query_string = "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}"
+            for k, v in sorted((query or {}).items())
+        )
+        url = f"{self.endpoint_url}{path}"
+        if query_string:
+            url = f"{url}?{query_string}"
+        return {
+            "method": method,
+            "url": url,
+            "headers": self._sign(method, path, query_string, dict(headers or {})),
+        }
+
+    def _sign(self, method: str, path: str, query_string: str, headers: dict) -> dict:
+        """Add AWS Signature Version 4 headers (unsigned payload)."""
+        if not self.access_key_id:
+            return headers
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{now:%Y%m%d}/{self.region}/s3/aws4_request"
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = "UNSIGNED-PAYLOAD"
+
+        signed = {"host": urlsplit(self.endpoint_url).netloc}
+        signed.update(
+            (k.lower(), str(v).strip())
+            for k, v in headers.items()
+            if k.lower().startswith("x-amz-") or k.lower() == "range"
+        )
+        signed_names = ";".join(sorted(signed))
+        canonical_request = "\n".join(
+            [
+                method,
+                path,
+                query_string,
+                "".join(f"{k}:{signed[k]}\n" for k in sorted(signed)),
+                signed_names,
+                "UNSIGNED-PAYLOAD",
+            ]
+        )
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            ]
+        )
+        key = f"AWS4{self.secret_access_key}".encode()
+        for part in (f"{now:%Y%m%d}", self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key_id}/{scope}, "
+            f"SignedHeaders={signed_names}, Signature={signature}"
+        )
+        return headers
+
+
+def _mtime_ns(modified: datetime) -> int:
+    # HEAD reports whole seconds and listings may add milliseconds; truncate
+    # both so the same object always gets the same mtime.
+    return int(modified.timestamp()) * 10**9
+
+
+def _raise_for_status(response: httpx.Response, key: str) -> None:
+    if response.status_code == 404:
+        raise FileNotFoundError(f"No such object: {key}")
+    if response.status_code >= 300:
+        if not response.is_stream_consumed:
+            response.read()
+        raise StorageError(
+            f"{response.request.method} {key}: HTTP {response.status_code} "
+            f"{response.text[:200]}"
+        )
+
+
+def create_book_storage(config, cache: LocalFileCache) -> BookStorage:
+    """Build the storage named by BOOK_STORAGE from app config."""
+    kind = config["BOOK_STORAGE"]
+    if kind == "local":
+        return LocalStorage(config["BOOK_DIR"], cache)
+    if kind == "s3":
+        missing = [k for k in ("S3_ENDPOINT_URL", "S3_BUCKET") if not config.get(k)]
+        if missing:
+            raise RuntimeError(f"BOOK_STORAGE=s3 requires {', '.join(missing)}")
+        if not cache.enabled:
+            raise RuntimeError("BOOK_STORAGE=s3 requires EPUB_LOCAL_CACHE_DIR")
+        return S3Storage(
+            config["S3_ENDPOINT_URL"],
+            config["S3_BUCKET"],
+            cache,
+            prefix=config["S3_PREFIX"],
+            region=config["S3_REGION"],
+            access_key_id=config["S3_ACCESS_KEY_ID"],
+            secret_access_key=config["S3_SECRET_ACCESS_KEY"],
+        )
+    raise RuntimeError(f"Unknown BOOK_STORAGE: {kind!r}")
+
+
+def book_storage() -> BookStorage:
+    """The current app's book storage."""
+    return current_app.extensions["book_storage"]
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 import posixpath
@@ -9,6 +10,9 @@ from urllib.parse import unquote
 
 from bs4 import BeautifulSoup
 from lxml import etree
+from lxml import html as lxml_html
+
+from .archives import epub_archives, open_epub
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -30,6 +34,12 @@ def rotate_list(items: list, n: int) -> list:
     return items[-n:] + items[:-n]
 
 
+def nearest_first(indices, center: int) -> list[int]:
+    """Order `indices` by distance from `center`, stepping forward before
+    back at each distance: center, center+1, center-1, center+2, ..."""
+    return sorted(indices, key=lambda i: (abs(i - center), i < center))
+
+
 def _normalize_internal_epub_path(path: str) -> str:
     """Normalize a path as stored in the DB / OPF for zipfile lookup.
 
@@ -44,12 +54,9 @@ def _normalize_internal_epub_path(path: str) -> str:
     return posixpath.normpath(p).lstrip("/")
 
 
-def _discover_cover_path_in_open_zip(z: zipfile.ZipFile) -> str:
-    """Return the package-relative path inside the zip to the cover resource.
-
-    Tries EPUB2 ``<meta name="cover" content="id"/>`` first, then EPUB3 manifest
-    items marked ``properties="... cover-image ..."``.
-    """
+def _read_package_document(z: zipfile.ZipFile) -> tuple[str, etree._Element]:
+    """Return ``(opf_path, opf_root)`` for the package document named in
+    ``META-INF/container.xml``."""
     t = etree.fromstring(z.read("META-INF/container.xml"))
     root_el = t.xpath("/u:container/u:rootfiles/u:rootfile", namespaces=namespaces)
     if not root_el:
@@ -58,10 +65,10 @@ def _discover_cover_path_in_open_zip(z: zipfile.ZipFile) -> str:
     if not rootfile_path:
         raise ValueError("EPUB rootfile missing full-path attribute")
     rootfile_path = rootfile_path.replace("\\", "/")
+    return rootfile_path, etree.fromstring(z.read(rootfile_path))
 
-    t = etree.fromstring(z.read(rootfile_path))
-    opf_dir = posixpath.dirname(rootfile_path)
 
+def _cover_path_from_package(t: etree._Element, opf_dir: str) -> str:
     href = None
     cover_meta = t.xpath("//opf:metadata/opf:meta[@name='cover']", namespaces=namespaces)
     if cover_meta:
@@ -89,8 +96,131 @@ def _discover_cover_path_in_open_zip(z: zipfile.ZipFile) -> str:
     return posixpath.normpath(posixpath.join(opf_dir, href)).lstrip("/")
 
 
-def get_epub_cover_path(path: str) -> str:
-    with zipfile.ZipFile(path) as z:
+def _discover_cover_path_in_open_zip(z: zipfile.ZipFile) -> str:
+    """Return the package-relative path inside the zip to the cover resource.
+
+    Tries EPUB2 ``<meta name="cover" content="id"/>`` first, then EPUB3 manifest
+    items marked ``properties="... cover-image ..."``.
+    """
+    rootfile_path, t = _read_package_document(z)
+    return _cover_path_from_package(t, posixpath.dirname(rootfile_path))
+
+
+# read_ingest_metadata keys that map one-to-one onto Book columns.
+EPUB_STAT_FIELDS = ("epub_text_size", "chapter_count", "image_count")
+# read_file_state keys (also returned by read_ingest_metadata), likewise.
+FILE_STATE_FIELDS = ("file_size", "file_mtime_ns", "file_fingerprint")
+
+
+def book_columns(metadata: dict) -> dict:
+    """The Book column values carried in a read_ingest_metadata result."""
+    return {field: metadata[field] for field in EPUB_STAT_FIELDS + FILE_STATE_FIELDS}
+
+
+def _zip_fingerprint(z: zipfile.ZipFile) -> str:
+    """Content fingerprint from the central directory alone.
+
+    Every member's name, CRC-32 and size go into the hash, so any change to
+    the book's contents changes it, while a bare ``touch`` or a copy to
+    another disk does not.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for info in z.infolist():
+        h.update(f"{info.filename}\0{info.CRC:08x}\0{info.file_size}\n".encode())
+    return h.hexdigest()
+
+
+def _file_state(stat: tuple[int, int], z: zipfile.ZipFile) -> dict:
+    size, mtime_ns = stat
+    return {
+        "file_size": size,
+        "file_mtime_ns": mtime_ns,
+        "file_fingerprint": _zip_fingerprint(z),
+    }
+
+
+def _stat_of(source) -> tuple[int, int]:
+    st = os.stat(source)
+    return st.st_size, st.st_mtime_ns
+
+
+def read_file_state(source, stat: tuple[int, int] | None = None) -> dict:
+    """Size, mtime and content fingerprint of an EPUB, as stored on ``Book``
+    so ETags and cache keys can be built without touching the file.
+
+    `source` is a path or a seekable binary file; `stat` is its
+    ``(size, mtime_ns)``, taken from the path when omitted.
+    """
+    if stat is None:
+        stat = _stat_of(source)
+    with zipfile.ZipFile(source) as z:
+        return _file_state(stat, z)
+
+
+def _dc_text(t: etree._Element, name: str) -> str | None:
+    for el in t.xpath(f"//opf:metadata/dc:{name}", namespaces=namespaces):
+        text = (el.text or "").strip()
+        if text:
+            return text
+    return None
+
+
+def read_ingest_metadata(source, stat: tuple[int, int] | None = None) -> dict:
+    """Read what ingest needs from an EPUB without decoding its content.
+
+    Only the zip central directory, ``container.xml`` and the OPF are read, so
+    cost is independent of how many chapters or images the book carries.
+    Returns ``title``, ``author``, ``identifiers`` (``[{"scheme", "value"}]``
+    in document order), ``has_nav`` (an EPUB3 nav document is declared),
+    ``cover_path`` (``None`` when the package names no cover), and the
+    :data:`EPUB_STAT_FIELDS` and :data:`FILE_STATE_FIELDS` stored on ``Book``.
+
+    `source` and `stat` are as for :func:`read_file_state`; a ranged-read file
+    from remote storage works as well as a local path.
+    """
+    if stat is None:
+        stat = _stat_of(source)
+    with zipfile.ZipFile(source) as z:
+        rootfile_path, t = _read_package_document(z)
+        text_size = _text_size_in_open_zip(z)
+        file_state = _file_state(stat, z)
+
+    manifest = t.xpath("//opf:manifest/opf:item", namespaces=namespaces)
+    media_types = {item.get("id"): item.get("media-type") or "" for item in manifest}
+    spine = t.xpath("//opf:spine/opf:itemref/@idref", namespaces=namespaces)
+
+    identifiers = []
+    for el in t.xpath("//opf:metadata/dc:identifier", namespaces=namespaces):
+        value = (el.text or "").strip()
+        if value:
+            scheme = el.get(f"{{{namespaces['opf']}}}scheme") or el.get("scheme")
+            identifiers.append({"scheme": scheme, "value": value})
+
+    has_nav = any("nav" in (item.get("properties") or "").split() for item in manifest)
+
+    try:
+        cover_path = _cover_path_from_package(t, posixpath.dirname(rootfile_path))
+    except ValueError:
+        cover_path = None
+
+    return {
+        "title": _dc_text(t, "title") or "Unknown Title",
+        "author": _dc_text(t, "creator") or "Unknown Author",
+        "identifiers": identifiers,
+        "has_nav": has_nav,
+        "cover_path": cover_path,
+        "epub_text_size": text_size,
+        # Same rule as get_epub_structure's chapter list.
+        "chapter_count": sum(
+            media_types.get(idref) == "application/xhtml+xml" for idref in spine
+        ),
+        "image_count": sum(mt.startswith("image/") for mt in media_types.values()),
+        **file_state,
+    }
+
+
+def get_epub_cover_path(source) -> str:
+    with zipfile.ZipFile(source) as z:
         return _discover_cover_path_in_open_zip(z)
 
 
@@ -162,14 +292,21 @@ def _unwrap_html_cover_to_image(
     return raw
 
 
-def read_epub_cover(epub_file_path: str, cover_path: str | None = None) -> bytes:
+def read_epub_cover(epub_file_path, cover_path: str | None = None) -> bytes:
     """Return the raw bytes of an EPUB's cover image.
 
     Tries the path stored in the database first (when provided), then fresh
     discovery from the package document. Handles EPUB3 ``cover-image`` items and
     XHTML cover wrappers that reference a raster file.
+
+    `epub_file_path` may also be a seekable binary file, e.g. a ranged-read
+    file from remote storage; only the cover's members are read from it.
     """
-    with zipfile.ZipFile(epub_file_path) as z:
+    if isinstance(epub_file_path, str | os.PathLike):
+        opened = open_epub(epub_file_path)
+    else:
+        opened = zipfile.ZipFile(epub_file_path)
+    with opened as z:
         try:
             discovered = _discover_cover_path_in_open_zip(z)
         except Exception as exc:
@@ -209,23 +346,28 @@ def read_epub_cover(epub_file_path: str, cover_path: str | None = None) -> bytes
 _HTML_EXTENSIONS = (".html", ".xhtml", ".htm")
 
 
+def _text_size_in_open_zip(z: zipfile.ZipFile) -> int:
+    return sum(
+        info.file_size
+        for info in z.infolist()
+        if info.filename.lower().endswith(_HTML_EXTENSIONS)
+    )
+
+
 def epub_text_size(epub_file_path: str) -> int:
     """Total uncompressed bytes of HTML/XHTML content inside an EPUB.
 
     A cheap proxy for "book length" used to size spine thickness in the
     bookshelf view. Reads only the zip's central directory — no decompression,
-    no parsing — so it's fast enough to compute on first request and cache.
+    no parsing. Stored on ``Book.epub_text_size`` at ingest; this is the
+    fallback for rows that predate that column.
     """
-    total = 0
     try:
-        with zipfile.ZipFile(epub_file_path) as z:
-            for info in z.infolist():
-                if info.filename.lower().endswith(_HTML_EXTENSIONS):
-                    total += info.file_size
+        with open_epub(epub_file_path) as z:
+            return _text_size_in_open_zip(z)
     except (zipfile.BadZipFile, FileNotFoundError, OSError) as e:
         logger.warning(f"Could not measure text size for {epub_file_path}: {e}")
         return 0
-    return total
 
 
 def normalize_path(path):
@@ -250,6 +392,27 @@ def _outside_nav(elem) -> bool:
     return True
 
 
+_TITLE_EPUB_TYPES = ("chapter", "title", "subtitle")
+_TITLE_CLASS_RE = re.compile(
+    r"(?:^|[-_])(chapter[-_]?title|chaptertitle|chapter[-_]?heading"
+    r"|section[-_]?title|heading|^title$)(?:[-_]|$)",
+    re.IGNORECASE,
+)
+
+
+def _title_from_item_name(item) -> str | None:
+    """Chapter title derived from the spine item's filename, if it has one."""
+    if not hasattr(item, "get_name"):
+        return None
+    filename = item.get_name()
+    basename = os.path.splitext(os.path.basename(filename))[0]
+    clean_name = basename.replace("_", " ").replace("-", " ")
+    for prefix in ("chapter", "ch", "section", "part"):
+        if clean_name.lower().startswith(prefix):
+            clean_name = clean_name[len(prefix):].strip()
+    return clean_name.title() if clean_name else None
+
+
 def get_chapter_title(item, soup):
     """Best-effort chapter title extraction.
 
@@ -264,7 +427,7 @@ def get_chapter_title(item, soup):
     """
 
     # 1. epub:type semantic markers
-    for elem in soup.find_all(attrs={"epub:type": ["chapter", "title", "subtitle"]}):
+    for elem in soup.find_all(attrs={"epub:type": list(_TITLE_EPUB_TYPES)}):
         if not _outside_nav(elem):
             continue
         if title := _clean_title(elem.get_text()):
@@ -280,11 +443,7 @@ def get_chapter_title(item, soup):
                 return title
 
     # 3. Common chapter-title class / id names
-    title_pattern = re.compile(
-        r"(?:^|[-_])(chapter[-_]?title|chaptertitle|chapter[-_]?heading"
-        r"|section[-_]?title|heading|^title$)(?:[-_]|$)",
-        re.IGNORECASE,
-    )
+    title_pattern = _TITLE_CLASS_RE
     for elem in soup.find_all(class_=title_pattern):
         if not _outside_nav(elem):
             continue
@@ -303,15 +462,8 @@ def get_chapter_title(item, soup):
             return title
 
     # 5. Filename-derived
-    if hasattr(item, "get_name"):
-        filename = item.get_name()
-        basename = os.path.splitext(os.path.basename(filename))[0]
-        clean_name = basename.replace("_", " ").replace("-", " ")
-        for prefix in ("chapter", "ch", "section", "part"):
-            if clean_name.lower().startswith(prefix):
-                clean_name = clean_name[len(prefix):].strip()
-        if clean_name:
-            return clean_name.title()
+    if title := _title_from_item_name(item):
+        return title
 
     # 6. First short paragraph (under 60 chars — chapter epigraphs / openers)
     first_para = soup.find("p")
@@ -323,21 +475,79 @@ def get_chapter_title(item, soup):
     return None
 
 
-def extract_metadata(epub_book):
-    """Extract metadata from an epub book."""
-    try:
-        # Get title, fallback to filename if not found
-        title = epub_book.get_metadata("DC", "title")
-        title = title[0][0] if title else "Unknown Title"
+def _lxml_outside_nav(elem) -> bool:
+    return next(elem.iterancestors("nav"), None) is None
 
-        # Get author, fallback to "Unknown Author" if not found
-        author = epub_book.get_metadata("DC", "creator")
-        author = author[0][0] if author else "Unknown Author"
 
-        return {"title": title, "author": author}
-    except Exception as e:
-        logger.error(f"Error extracting metadata: {str(e)}")
-        return None
+def _lxml_class_matches(elem) -> bool:
+    """Mirror bs4's class_=regex semantics: match any single class or the
+    whole attribute value."""
+    classes = elem.get("class")
+    if not classes:
+        return False
+    return any(
+        _TITLE_CLASS_RE.search(c) for c in classes.split()
+    ) or bool(_TITLE_CLASS_RE.search(classes))
+
+
+def get_chapter_title_lxml(item, root):
+    """get_chapter_title() for a tree parsed with lxml.html.
+
+    Same resolution order and same answers as the BeautifulSoup version, just
+    walking an lxml element tree instead of a soup.
+    """
+    elements = list(root.iter(etree.Element))
+
+    # 1. epub:type semantic markers
+    for elem in elements:
+        if elem.get("epub:type") not in _TITLE_EPUB_TYPES:
+            continue
+        if not _lxml_outside_nav(elem):
+            continue
+        if title := _clean_title(elem.text_content()):
+            return title
+
+    # 2. Heading tags by specificity
+    for tag_name in ("h1", "h2", "h3"):
+        for heading in root.iter(tag_name):
+            if not _lxml_outside_nav(heading):
+                continue
+            if title := _clean_title(heading.text_content()):
+                return title
+
+    # 3. Common chapter-title class / id names
+    for elem in elements:
+        if not _lxml_class_matches(elem) or not _lxml_outside_nav(elem):
+            continue
+        if title := _clean_title(elem.text_content()):
+            return title
+    for elem in elements:
+        elem_id = elem.get("id")
+        if not elem_id or not _TITLE_CLASS_RE.search(elem_id):
+            continue
+        if not _lxml_outside_nav(elem):
+            continue
+        if title := _clean_title(elem.text_content()):
+            return title
+
+    # 4. <title> in <head>
+    head_title = next(root.iter("title"), None)
+    if head_title is not None:
+        if title := _clean_title(head_title.text_content()):
+            return title
+
+    # 5. Filename-derived
+    if title := _title_from_item_name(item):
+        return title
+
+    # 6. First short paragraph
+    first_para = next(root.iter("p"), None)
+    if first_para is not None:
+        text = _clean_title(first_para.text_content())
+        if text and len(text) < 60:
+            return text
+
+    return None
 
 
 def update_epub_cover(epub_file_path: str, new_cover_bytes: bytes) -> None:
@@ -361,6 +571,7 @@ def update_epub_cover(epub_file_path: str, new_cover_bytes: bytes) -> None:
 
     # Replace the original EPUB file with the updated version
     shutil.move(temp_path, epub_file_path)
+    epub_archives.invalidate(epub_file_path)
 
 
 _NCX_NS = {"ncx": "http://www.daisy.org/z3986/2005/ncx/"}
@@ -585,7 +796,7 @@ def get_epub_structure(epub_path: str) -> dict:
     The TOC resolution chain (nav doc → NCX → Contents page → synthetic) is
     documented in detail at docs/toc-resolution.md.
     """
-    with zipfile.ZipFile(epub_path) as z:
+    with open_epub(epub_path) as z:
         container = etree.fromstring(z.read("META-INF/container.xml"))
         rootfile_path = container.xpath(
             "/u:container/u:rootfiles/u:rootfile", namespaces=namespaces
@@ -660,49 +871,160 @@ def get_epub_structure(epub_path: str) -> dict:
         }
 
 
+_TEXT_BLOCK_TAGS = tuple(
+    "p div br li dt dd tr td th blockquote section article aside pre"
+    " h1 h2 h3 h4 h5 h6".split()
+)
+
+
+def chapter_plain_text(content: bytes) -> tuple[str | None, str]:
+    """Reader-visible title and whitespace-collapsed body text of a chapter
+    document, for the full-text index."""
+    parser = lxml_html.HTMLParser(encoding="utf-8")
+    root = lxml_html.document_fromstring(content, parser=parser)
+    title = get_chapter_title_lxml(None, root)
+    for element in root.xpath("//script | //style"):
+        element.drop_tree()
+    body = root.find("body")
+    target = body if body is not None else root
+    # Keep adjacent blocks ("<h1>One</h1><p>Two</p>") from running together.
+    for element in target.iter(*_TEXT_BLOCK_TAGS):
+        element.tail = " " + (element.tail or "")
+    return title, " ".join(target.text_content().split())
+
+
+def iter_chapter_texts(epub_path: str, chapters: list[dict]):
+    """Yield ``{"spine_index", "title", "text"}`` for each of `chapters` (as
+    listed by get_epub_structure), parsing one document at a time so a
+    caller that stops early never reads the rest. Unreadable documents are
+    logged and skipped."""
+    with open_epub(epub_path) as z:
+        for chapter in chapters:
+            try:
+                title, text = chapter_plain_text(z.read(chapter["path"]))
+            except KeyError:
+                logger.warning(f"{epub_path}: spine item {chapter['path']} missing")
+                continue
+            except (etree.LxmlError, ValueError) as e:
+                logger.warning(f"{epub_path}: could not parse {chapter['path']}: {e}")
+                continue
+            yield {"spine_index": chapter["index"], "title": title, "text": text}
+
+
+def extract_chapter_texts(epub_path: str) -> list[dict]:
+    """Text of every spine chapter of the EPUB at `epub_path`, in the order
+    and numbering of get_epub_structure (see iter_chapter_texts)."""
+    chapters = get_epub_structure(epub_path)["chapters"]
+    return list(iter_chapter_texts(epub_path, chapters))
+
+
+_IMAGE_TAGS = ("img", "image", "svg")
+_IMAGE_ATTRIBUTES = ("src", "href", "xlink:href")
+
+
+def _chapter_link_attrs(href: str) -> dict | None:
+    """Attributes that turn an in-book <a href> into a reader JS hook, or None
+    for same-page anchors that the browser can follow on its own."""
+    if href.startswith("#"):
+        return None
+    href = href.split("#")
+    return {
+        "chapter-link": href[0],
+        "section-link": href[1] if len(href) > 1 else "",
+        "href": "javascript:void(0);",
+        "onclick": "handleChapterLink(this)",
+    }
+
+
+def _asset_url(image_path: str, images: dict, asset_url_prefix: str) -> str | None:
+    """URL for an image reference under asset_url_prefix, or None if the
+    reference doesn't point at a manifest image."""
+    normalized_path = normalize_path(unquote(image_path))
+    if normalized_path in images:
+        return asset_url_prefix + images[normalized_path]["path"]
+    return None
+
+
+def _render_chapter_bs4(
+    content: bytes, images: dict, asset_url_prefix: str
+) -> tuple[str | None, str]:
+    """Rewrite a chapter with BeautifulSoup. Slow but very forgiving; kept as
+    the fallback for markup lxml can't make sense of."""
+    soup = BeautifulSoup(content.decode("utf-8"), "html.parser")
+
+    title = get_chapter_title(None, soup)
+
+    # Process internal links
+    for element in soup.find_all("a"):
+        if href := element.get("href"):
+            for attr, value in (_chapter_link_attrs(href) or {}).items():
+                element[attr] = value
+
+    # Rewrite image refs to point at the asset URL route
+    for element in soup.find_all(list(_IMAGE_TAGS)):
+        for attr in _IMAGE_ATTRIBUTES:
+            if image_path := element.get(attr):
+                try:
+                    if url := _asset_url(image_path, images, asset_url_prefix):
+                        element[attr] = url
+                        if element.name == "img":
+                            element["loading"] = "lazy"
+                except Exception as e:
+                    logger.warning(f"Failed to process image {image_path}: {e}")
+
+    return title, str(soup.body) if soup.body else str(soup)
+
+
+def _render_chapter_lxml(
+    content: bytes, images: dict, asset_url_prefix: str
+) -> tuple[str | None, str]:
+    """Rewrite a chapter with lxml's HTML parser.
+
+    Same rewrites and title as _render_chapter_bs4(), several times faster.
+    Raises etree.LxmlError / ValueError on documents it can't parse.
+    """
+    parser = lxml_html.HTMLParser(encoding="utf-8")
+    root = lxml_html.document_fromstring(content, parser=parser)
+
+    title = get_chapter_title_lxml(None, root)
+
+    for element in root.iter("a"):
+        if href := element.get("href"):
+            for attr, value in (_chapter_link_attrs(href) or {}).items():
+                element.set(attr, value)
+
+    for element in root.iter(*_IMAGE_TAGS):
+        for attr in _IMAGE_ATTRIBUTES:
+            if image_path := element.get(attr):
+                try:
+                    if url := _asset_url(image_path, images, asset_url_prefix):
+                        element.set(attr, url)
+                        if element.tag == "img":
+                            element.set("loading", "lazy")
+                except Exception as e:
+                    logger.warning(f"Failed to process image {image_path}: {e}")
+
+    body = root.find("body")
+    target = body if body is not None else root
+    return title, lxml_html.tostring(target, encoding="unicode", with_tail=False)
+
+
 def process_chapter_content(
     epub_path: str, chapter_path: str, images: dict, asset_url_prefix: str
 ) -> dict:
     """Process a single chapter's content, rewriting image refs to URLs under
     asset_url_prefix (e.g. '/book_asset/<filename>/')."""
-    with zipfile.ZipFile(epub_path) as z:
-        content = z.read(chapter_path).decode("utf-8")
-        soup = BeautifulSoup(content, "html.parser")
-
-        title = get_chapter_title(None, soup)
-
-        # Process internal links
-        for element in soup.find_all("a"):
-            if href := element.get("href"):
-                if not href.startswith("#"):
-                    href = href.split("#")
-                    href_path = href[0]
-                    section = href[1] if len(href) > 1 else ""
-
-                    element["chapter-link"] = href_path
-                    element["section-link"] = section
-                    element["href"] = "javascript:void(0);"
-                    element["onclick"] = "handleChapterLink(this)"
-
-        # Rewrite image refs to point at the asset URL route
-        image_attributes = ["src", "href", "xlink:href"]
-        for element in soup.find_all(["img", "image", "svg"]):
-            for attr in image_attributes:
-                if image_path := element.get(attr):
-                    try:
-                        normalized_path = normalize_path(unquote(image_path))
-                        if normalized_path in images:
-                            element[attr] = (
-                                asset_url_prefix
-                                + images[normalized_path]["path"]
-                            )
-                            if element.name == "img":
-                                element["loading"] = "lazy"
-                    except Exception as e:
-                        logger.warning(f"Failed to process image {image_path}: {e}")
+    with open_epub(epub_path) as z:
+        content = z.read(chapter_path)
 
-        return {
-            "title": title,
-            "href": chapter_path.split("/")[-1],
-            "content": str(soup.body) if soup.body else str(soup),
-        }
+    try:
+        title, body = _render_chapter_lxml(content, images, asset_url_prefix)
+    except (etree.LxmlError, ValueError) as e:
+        logger.warning(f"lxml could not parse {chapter_path}, using bs4: {e}")
+        title, body = _render_chapter_bs4(content, images, asset_url_prefix)
+
+    return {
+        "title": title,
+        "href": chapter_path.split("/")[-1],
+        "content": body,
+    }
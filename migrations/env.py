@@ -51,6 +51,18 @@ def get_metadata():
     return target_db.metadata
 
 
+# FTS5 tables (and their _data/_idx/_docsize/_config/_content shadow tables)
+# are created with raw DDL in the migrations and aren't in the metadata, so
+# autogenerate must not try to drop them.
+FTS_TABLE_PREFIXES = ('books_fts', 'chapter_fts')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and name.startswith(FTS_TABLE_PREFIXES):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +77,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +106,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
@@ -0,0 +1,41 @@
+"""add book_identifiers
+
+Revision ID: a3d7f1c9e5b2
+Revises: f2c6e9a4b7d1
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "a3d7f1c9e5b2"
+down_revision = "f2c6e9a4b7d1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing books get their identifiers from
+    # `flask backfill-book-stats --all`.
+    op.create_table(
+        "book_identifiers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("scheme", sa.String(length=16), nullable=False),
+        sa.Column("value", sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("book_identifiers", schema=None) as batch_op:
+        batch_op.create_index(
+            "idx_identifier_scheme_value", ["scheme", "value"], unique=False
+        )
+        batch_op.create_index("idx_identifier_book", ["book_id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("book_identifiers", schema=None) as batch_op:
+        batch_op.drop_index("idx_identifier_book")
+        batch_op.drop_index("idx_identifier_scheme_value")
+    op.drop_table("book_identifiers")
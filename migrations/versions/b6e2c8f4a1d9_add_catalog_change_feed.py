@@ -0,0 +1,85 @@
+"""add catalog change counter, books.change_seq and tombstones
+
+Revision ID: b6e2c8f4a1d9
+Revises: a3d7f1c9e5b2
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "b6e2c8f4a1d9"
+down_revision = "a3d7f1c9e5b2"
+branch_labels = None
+depends_on = None
+
+# Copied rather than imported from library.models; see e8b3d6f4a2c7.
+TRIGGER_DDL = (
+    """CREATE TRIGGER catalog_books_ai AFTER INSERT ON books BEGIN
+        UPDATE catalog_state SET seq = seq + 1 WHERE id = 1;
+        UPDATE books SET change_seq = (SELECT seq FROM catalog_state WHERE id = 1)
+        WHERE id = new.id;
+        DELETE FROM catalog_tombstones WHERE book_id = new.id;
+    END""",
+    """CREATE TRIGGER catalog_books_au AFTER UPDATE OF
+        title, author, filename, access_level, epub_text_size, file_mtime_ns,
+        file_fingerprint
+    ON books
+    WHEN old.title IS NOT new.title OR old.author IS NOT new.author
+        OR old.filename IS NOT new.filename
+        OR old.access_level IS NOT new.access_level
+        OR old.epub_text_size IS NOT new.epub_text_size
+        OR old.file_mtime_ns IS NOT new.file_mtime_ns
+        OR old.file_fingerprint IS NOT new.file_fingerprint
+    BEGIN
+        UPDATE catalog_state SET seq = seq + 1 WHERE id = 1;
+        UPDATE books SET change_seq = (SELECT seq FROM catalog_state WHERE id = 1)
+        WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER catalog_books_ad AFTER DELETE ON books BEGIN
+        UPDATE catalog_state SET seq = seq + 1 WHERE id = 1;
+        INSERT OR REPLACE INTO catalog_tombstones (book_id, change_seq)
+        SELECT old.id, seq FROM catalog_state WHERE id = 1;
+    END""",
+)
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than a batch copy, which would drop the
+    # triggers already on books. Existing rows start at seq 0, which every
+    # snapshot taken from now on already covers.
+    op.add_column(
+        "books",
+        sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.create_index("idx_book_change_seq", "books", ["change_seq"])
+    op.create_table(
+        "catalog_state",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO catalog_state (id, seq) VALUES (1, 0)")
+    op.create_table(
+        "catalog_tombstones",
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("book_id"),
+    )
+    op.create_index(
+        "ix_catalog_tombstones_change_seq", "catalog_tombstones", ["change_seq"]
+    )
+    for statement in TRIGGER_DDL:
+        op.execute(statement)
+
+
+def downgrade():
+    for trigger in ("catalog_books_ad", "catalog_books_au", "catalog_books_ai"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.drop_index("ix_catalog_tombstones_change_seq", table_name="catalog_tombstones")
+    op.drop_table("catalog_tombstones")
+    op.drop_table("catalog_state")
+    op.drop_index("idx_book_change_seq", table_name="books")
+    # Native DROP COLUMN (SQLite 3.35+), for the same reason as upgrade().
+    op.execute("ALTER TABLE books DROP COLUMN change_seq")
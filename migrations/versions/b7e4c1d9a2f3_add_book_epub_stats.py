@@ -0,0 +1,30 @@
+"""add book epub stats
+
+Revision ID: b7e4c1d9a2f3
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "b7e4c1d9a2f3"
+down_revision = "a1b2c3d4e5f6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable: existing rows are filled in by `flask backfill-book-stats`.
+    with op.batch_alter_table("books", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("epub_text_size", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("chapter_count", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("image_count", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("books", schema=None) as batch_op:
+        batch_op.drop_column("image_count")
+        batch_op.drop_column("chapter_count")
+        batch_op.drop_column("epub_text_size")
@@ -0,0 +1,32 @@
+"""add book file state
+
+Revision ID: c3f8a5e2b6d1
+Revises: b7e4c1d9a2f3
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c3f8a5e2b6d1"
+down_revision = "b7e4c1d9a2f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable: recorded on first request or by `flask backfill-book-stats`.
+    with op.batch_alter_table("books", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("file_size", sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column("file_mtime_ns", sa.BigInteger(), nullable=True))
+        batch_op.add_column(
+            sa.Column("file_fingerprint", sa.String(length=32), nullable=True)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("books", schema=None) as batch_op:
+        batch_op.drop_column("file_fingerprint")
+        batch_op.drop_column("file_mtime_ns")
+        batch_op.drop_column("file_size")
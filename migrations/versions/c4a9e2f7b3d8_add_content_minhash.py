@@ -0,0 +1,45 @@
+"""add books.content_minhash and book_lsh_buckets for duplicate detection
+
+Revision ID: c4a9e2f7b3d8
+Revises: b6e2c8f4a1d9
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "c4a9e2f7b3d8"
+down_revision = "b6e2c8f4a1d9"
+branch_labels = None
+depends_on = None
+
+# Copied rather than imported from library.models; see e8b3d6f4a2c7.
+TRIGGER_DDL = """CREATE TRIGGER books_lsh_buckets_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_lsh_buckets WHERE book_id = old.id;
+    END"""
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than a batch copy, which would drop the
+    # triggers on books. Signatures are filled in by `flask index-content
+    # --all`.
+    op.add_column("books", sa.Column("content_minhash", sa.LargeBinary()))
+    op.create_table(
+        "book_lsh_buckets",
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("band", sa.SmallInteger(), nullable=False),
+        sa.Column("bucket", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("book_id", "band"),
+    )
+    op.create_index("idx_lsh_band_bucket", "book_lsh_buckets", ["band", "bucket"])
+    op.execute(TRIGGER_DDL)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS books_lsh_buckets_ad")
+    op.drop_index("idx_lsh_band_bucket", table_name="book_lsh_buckets")
+    op.drop_table("book_lsh_buckets")
+    # Native DROP COLUMN (SQLite 3.35+), for the same reason as upgrade().
+    op.execute("ALTER TABLE books DROP COLUMN content_minhash")
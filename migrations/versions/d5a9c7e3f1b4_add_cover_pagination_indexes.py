@@ -0,0 +1,34 @@
+"""add cover pagination indexes
+
+Revision ID: d5a9c7e3f1b4
+Revises: c3f8a5e2b6d1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+revision = "d5a9c7e3f1b4"
+down_revision = "c3f8a5e2b6d1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination of the cover grid: (sort key, id) seeks instead of
+    # OFFSET scans. The access_level variant serves non-admin users.
+    with op.batch_alter_table("books", schema=None) as batch_op:
+        batch_op.create_index("idx_book_created_id", ["created_at", "id"])
+        batch_op.create_index(
+            "idx_book_access_created_id", ["access_level", "created_at", "id"]
+        )
+    with op.batch_alter_table("bookmarks", schema=None) as batch_op:
+        batch_op.create_index("idx_user_last_read", ["user_id", "last_read"])
+
+
+def downgrade():
+    with op.batch_alter_table("bookmarks", schema=None) as batch_op:
+        batch_op.drop_index("idx_user_last_read")
+    with op.batch_alter_table("books", schema=None) as batch_op:
+        batch_op.drop_index("idx_book_access_created_id")
+        batch_op.drop_index("idx_book_created_id")
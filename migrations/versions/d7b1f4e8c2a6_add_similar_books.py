@@ -0,0 +1,67 @@
+"""add similar_terms, book_terms and book_neighbours for "more like this"
+
+Revision ID: d7b1f4e8c2a6
+Revises: c4a9e2f7b3d8
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "d7b1f4e8c2a6"
+down_revision = "c4a9e2f7b3d8"
+branch_labels = None
+depends_on = None
+
+# Copied rather than imported from library.models; see e8b3d6f4a2c7.
+TRIGGER_DDL = """CREATE TRIGGER books_similar_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_terms WHERE book_id = old.id;
+        DELETE FROM book_neighbours
+        WHERE book_id = old.id OR neighbour_id = old.id;
+    END"""
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than a batch copy, which would drop the
+    # triggers on books. Lists are filled by `flask build-similar`.
+    op.add_column("books", sa.Column("similar_indexed_fingerprint", sa.String(32)))
+    op.create_table(
+        "similar_terms",
+        sa.Column("term", sa.String(100), nullable=False),
+        sa.Column("doc_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("term"),
+    )
+    op.create_table(
+        "book_terms",
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("term", sa.String(100), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("book_id", "term"),
+    )
+    op.create_index("idx_book_terms_term", "book_terms", ["term"])
+    op.create_table(
+        "book_neighbours",
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("neighbour_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["neighbour_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("book_id", "neighbour_id"),
+    )
+    op.create_index(
+        "idx_book_neighbours_neighbour", "book_neighbours", ["neighbour_id"]
+    )
+    op.execute(TRIGGER_DDL)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS books_similar_ad")
+    op.drop_index("idx_book_neighbours_neighbour", table_name="book_neighbours")
+    op.drop_table("book_neighbours")
+    op.drop_index("idx_book_terms_term", table_name="book_terms")
+    op.drop_table("book_terms")
+    op.drop_table("similar_terms")
+    # Native DROP COLUMN (SQLite 3.35+), for the same reason as upgrade().
+    op.execute("ALTER TABLE books DROP COLUMN similar_indexed_fingerprint")
@@ -0,0 +1,52 @@
+"""add books_fts full-text index
+
+Revision ID: e8b3d6f4a2c7
+Revises: d5a9c7e3f1b4
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+revision = "e8b3d6f4a2c7"
+down_revision = "d5a9c7e3f1b4"
+branch_labels = None
+depends_on = None
+
+# Copied rather than imported from library.models, so this revision keeps
+# creating the schema it was written for. A later batch migration that
+# recreates the books table drops these triggers and must recreate them.
+FTS_DDL = (
+    """CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, author, genre,
+        content='books', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, genre)
+        VALUES (new.id, new.title, new.author, new.genre);
+    END""",
+    """CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.genre);
+    END""",
+    """CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, genre ON books
+    BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.genre);
+        INSERT INTO books_fts(rowid, title, author, genre)
+        VALUES (new.id, new.title, new.author, new.genre);
+    END""",
+)
+
+
+def upgrade():
+    for statement in FTS_DDL:
+        op.execute(statement)
+    # Index the books that already exist.
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    for trigger in ("books_fts_au", "books_fts_ad", "books_fts_ai"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS books_fts")
@@ -0,0 +1,76 @@
+"""add chapter_texts and chapter_fts full-text index over book contents
+
+Revision ID: f2c6e9a4b7d1
+Revises: e8b3d6f4a2c7
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "f2c6e9a4b7d1"
+down_revision = "e8b3d6f4a2c7"
+branch_labels = None
+depends_on = None
+
+# Copied rather than imported from library.models; see e8b3d6f4a2c7.
+FTS_DDL = (
+    """CREATE VIRTUAL TABLE chapter_fts USING fts5(
+        title, text,
+        content='chapter_texts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER chapter_fts_ai AFTER INSERT ON chapter_texts BEGIN
+        INSERT INTO chapter_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END""",
+    """CREATE TRIGGER chapter_fts_ad AFTER DELETE ON chapter_texts BEGIN
+        INSERT INTO chapter_fts(chapter_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END""",
+    """CREATE TRIGGER chapter_fts_au AFTER UPDATE ON chapter_texts BEGIN
+        INSERT INTO chapter_fts(chapter_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO chapter_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END""",
+    """CREATE TRIGGER books_chapter_texts_ad AFTER DELETE ON books BEGIN
+        DELETE FROM chapter_texts WHERE book_id = old.id;
+    END""",
+)
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than a batch copy, which would drop the
+    # books_fts triggers along with the old table.
+    op.add_column(
+        "books", sa.Column("content_indexed_fingerprint", sa.String(length=32))
+    )
+    op.create_table(
+        "chapter_texts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("spine_index", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=500), nullable=True),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("book_id", "spine_index", name="unique_book_chapter"),
+    )
+    for statement in FTS_DDL:
+        op.execute(statement)
+
+
+def downgrade():
+    for trigger in (
+        "books_chapter_texts_ad",
+        "chapter_fts_au",
+        "chapter_fts_ad",
+        "chapter_fts_ai",
+    ):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS chapter_fts")
+    op.drop_table("chapter_texts")
+    # Native DROP COLUMN (SQLite 3.35+), for the same reason as upgrade().
+    op.execute("ALTER TABLE books DROP COLUMN content_indexed_fingerprint")
@@ -36,11 +36,13 @@ def build_epub3(
     nav_entries: list[dict] | None = None,
     include_cover: bool = True,
     cover_meta_name: bool = True,
+    identifiers: list[tuple[str | None, str]] = (),
 ) -> bytes:
     """EPUB3 with a nav doc.
 
     chapters: [(filename, html_body)]
     nav_entries: [{"title": ..., "href": "ch1.xhtml", "children": [...]}]
+    identifiers: extra [(opf:scheme or None, value)] after the unique one
     """
     chapters = chapters or [
         ("ch1.xhtml", "<h1>One</h1><p>chapter one</p>"),
@@ -70,12 +72,19 @@ def build_epub3(
         )
     else:
         cover_meta = ""
+    extra_identifiers = "".join(
+        f'<dc:identifier opf:scheme="{scheme}">{value}</dc:identifier>'
+        if scheme
+        else f"<dc:identifier>{value}</dc:identifier>"
+        for scheme, value in identifiers
+    )
 
     opf = dedent(f"""\
         <?xml version="1.0" encoding="utf-8"?>
         <package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
-          <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+          <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
             <dc:identifier id="id">test-{title}</dc:identifier>
+            {extra_identifiers}
             <dc:title>{title}</dc:title>
             <dc:creator>{author}</dc:creator>
             {cover_meta}
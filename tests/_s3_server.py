@@ -0,0 +1,105 @@
+"""Minimal in-memory S3-compatible server (WSGI) for storage tests.
+
+Implements just what :class:`library.storage.S3Storage` uses — HEAD, GET
+(whole, ranged and ListObjectsV2), PUT (upload and server-side copy) and
+DELETE on path-style URLs — and records every request so tests can assert on
+traffic, the way they would against a MinIO container.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.parse import parse_qs, unquote
+from xml.sax.saxutils import escape
+
+
+class FakeS3:
+    def __init__(self, bucket: str, page_size: int = 1000):
+        self.bucket = bucket
+        self.page_size = page_size
+        self.objects: dict[str, tuple[bytes, datetime]] = {}
+        # (method, key, Range header or None)
+        self.requests: list[tuple[str, str, str | None]] = []
+        self.authorizations: list[str | None] = []
+        self.bytes_sent = 0
+        self._clock = 1_700_000_000
+
+    def put(self, key: str, data: bytes) -> None:
+        # Each write gets a later Last-Modified, whole seconds like real S3.
+        self._clock += 1
+        self.objects[key] = (data, datetime.fromtimestamp(self._clock, timezone.utc))
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        path = environ["PATH_INFO"].lstrip("/")
+        bucket, _, key = path.partition("/")
+        query = {k: v[0] for k, v in parse_qs(environ.get("QUERY_STRING", "")).items()}
+        range_header = environ.get("HTTP_RANGE")
+        self.requests.append((method, key, range_header))
+        self.authorizations.append(environ.get("HTTP_AUTHORIZATION"))
+
+        if bucket != self.bucket:
+            return self._respond(start_response, "404 Not Found", b"NoSuchBucket")
+        if method == "GET" and not key and query.get("list-type") == "2":
+            return self._list(start_response, query)
+        if method == "PUT":
+            copy_source = environ.get("HTTP_X_AMZ_COPY_SOURCE")
+            if copy_source:
+                source_key = unquote(copy_source).lstrip("/").partition("/")[2]
+                if source_key not in self.objects:
+                    return self._respond(start_response, "404 Not Found", b"")
+                self.put(key, self.objects[source_key][0])
+            else:
+                length = int(environ.get("CONTENT_LENGTH") or 0)
+                self.put(key, environ["wsgi.input"].read(length))
+            return self._respond(start_response, "200 OK", b"")
+        if method == "DELETE":
+            self.objects.pop(key, None)
+            return self._respond(start_response, "204 No Content", b"")
+
+        if key not in self.objects:
+            return self._respond(start_response, "404 Not Found", b"NoSuchKey")
+        data, modified = self.objects[key]
+        headers = [("Last-Modified", format_datetime(modified, usegmt=True))]
+        if method == "HEAD":
+            headers.append(("Content-Length", str(len(data))))
+            start_response("200 OK", headers)
+            return [b""]
+        if range_header:
+            start, _, end = range_header.removeprefix("bytes=").partition("-")
+            start, end = int(start), min(int(end), len(data) - 1)
+            return self._respond(
+                start_response, "206 Partial Content", data[start : end + 1], headers
+            )
+        return self._respond(start_response, "200 OK", data, headers)
+
+    def _list(self, start_response, query):
+        prefix = query.get("prefix", "")
+        keys = sorted(k for k in self.objects if k.startswith(prefix))
+        after = query.get("continuation-token")
+        if after:
+            keys = [k for k in keys if k > after]
+        page, rest = keys[: self.page_size], keys[self.page_size :]
+        contents = "".join(
+            f"<Contents><Key>{escape(k)}</Key>"
+            f"<LastModified>{self.objects[k][1].strftime('%Y-%m-%dT%H:%M:%S.123Z')}"
+            f"</LastModified><Size>{len(self.objects[k][0])}</Size></Contents>"
+            for k in page
+        )
+        more = (
+            f"<IsTruncated>true</IsTruncated>"
+            f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>"
+            if rest
+            else "<IsTruncated>false</IsTruncated>"
+        )
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{self.bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"{contents}{more}</ListBucketResult>"
+        ).encode()
+        return self._respond(start_response, "200 OK", body)
+
+    def _respond(self, start_response, status, body, headers=()):
+        self.bytes_sent += len(body)
+        start_response(status, [*headers, ("Content-Length", str(len(body)))])
+        return [body]
@@ -22,13 +22,14 @@ def book_dir(tmp_path):
 
 
 @pytest.fixture
-def app(book_dir, monkeypatch):
+def app(book_dir, tmp_path, monkeypatch):
     """A Flask app wired to an in-memory SQLite and a temp BOOK_DIR."""
     monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key-not-used")
     app = create_app({
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
         "BOOK_DIR": str(book_dir),
+        "EPUB_CACHE_DIR": str(tmp_path / "epub_cache"),
         "WTF_CSRF_ENABLED": False,
     })
     with app.app_context():
@@ -18,6 +18,7 @@ def test_create_app_uses_test_default_when_testing(monkeypatch, tmp_path):
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
         "BOOK_DIR": str(tmp_path),
+        "EPUB_CACHE_DIR": str(tmp_path / "epub_cache"),
     })
     assert app.config["SECRET_KEY"]
 
@@ -31,6 +32,7 @@ def test_create_app_falls_back_to_random_key_with_warning(monkeypatch, book_dir,
         app = create_app({
             "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
             "BOOK_DIR": str(book_dir),
+            "EPUB_CACHE_DIR": str(book_dir / "epub_cache"),
         })
     assert app.config["SECRET_KEY"]
     assert any("SECRET_KEY" in rec.message for rec in caplog.records)
@@ -42,6 +44,7 @@ def test_create_app_honors_explicit_secret_key(book_dir):
         "SECRET_KEY": "from-overrides",
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
         "BOOK_DIR": str(book_dir),
+        "EPUB_CACHE_DIR": str(book_dir / "epub_cache"),
     })
     assert app.config["SECRET_KEY"] == "from-overrides"
 
@@ -54,4 +57,34 @@ def test_create_app_refuses_missing_book_dir(monkeypatch, tmp_path):
         create_app({
             "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
             "BOOK_DIR": str(missing),
+            "EPUB_CACHE_DIR": str(tmp_path / "epub_cache"),
+        })
+
+
+def test_create_app_s3_storage_skips_book_dir_check(monkeypatch, tmp_path):
+    """With books in a bucket, BOOK_DIR need not exist; reads get a local cache."""
+    from library.storage import S3Storage
+
+    monkeypatch.setenv("SECRET_KEY", "x")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "BOOK_DIR": str(tmp_path / "not-mounted"),
+        "EPUB_CACHE_DIR": str(tmp_path / "epub_cache"),
+        "BOOK_STORAGE": "s3",
+        "S3_ENDPOINT_URL": "http://minio:9000",
+        "S3_BUCKET": "library",
+    })
+    assert isinstance(app.extensions["book_storage"], S3Storage)
+    assert app.config["EPUB_LOCAL_CACHE_DIR"]
+
+
+def test_create_app_s3_storage_requires_bucket(book_dir):
+    with pytest.raises(RuntimeError, match="S3_BUCKET"):
+        create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "BOOK_DIR": str(book_dir),
+            "EPUB_CACHE_DIR": str(book_dir / "epub_cache"),
+            "BOOK_STORAGE": "s3",
+            "S3_ENDPOINT_URL": "http://minio:9000",
         })
@@ -0,0 +1,135 @@
+import os
+import threading
+
+import pytest
+
+from library.archives import ArchivePool
+from library.utils import read_epub_cover, update_epub_cover
+from tests._epub_builder import build_epub3
+
+
+@pytest.fixture
+def epub_file(tmp_path):
+    def _write(name: str = "book.epub") -> str:
+        p = tmp_path / name
+        p.write_bytes(build_epub3())
+        return str(p)
+
+    return _write
+
+
+def test_pool_reuses_open_archive(epub_file):
+    pool = ArchivePool()
+    path = epub_file()
+    with pool.open(path) as z1:
+        pass
+    with pool.open(path) as z2:
+        assert z2.read("mimetype") == b"application/epub+zip"
+    assert z1 is z2
+    assert len(pool) == 1
+
+
+def test_pool_reopens_when_file_changes(epub_file):
+    pool = ArchivePool()
+    path = epub_file()
+    with pool.open(path) as z1:
+        pass
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    with pool.open(path) as z2:
+        pass
+    assert z2 is not z1
+    assert z1.fp is None  # the stale handle was closed
+
+
+def test_pool_is_bounded_lru(epub_file):
+    pool = ArchivePool(maxsize=2)
+    a, b, c = epub_file("a.epub"), epub_file("b.epub"), epub_file("c.epub")
+    with pool.open(a) as za:
+        pass
+    with pool.open(b):
+        pass
+    with pool.open(a):  # a is now most recent, so b is evicted next
+        pass
+    with pool.open(c):
+        pass
+    assert len(pool) == 2
+    assert za.fp is not None
+    with pool.open(a) as again:
+        assert again is za
+
+
+def test_evicted_archive_stays_open_until_released(epub_file):
+    pool = ArchivePool(maxsize=1)
+    a, b = epub_file("a.epub"), epub_file("b.epub")
+    with pool.open(a) as za:
+        with pool.open(b):
+            pass
+        # Evicted from the pool, but still usable by the thread holding it.
+        assert za.read("mimetype") == b"application/epub+zip"
+    assert za.fp is None
+
+
+def test_invalidate_closes_and_forgets(epub_file):
+    pool = ArchivePool()
+    path = epub_file()
+    with pool.open(path) as z:
+        pass
+    pool.invalidate(path)
+    assert len(pool) == 0
+    assert z.fp is None
+
+
+def test_concurrent_reads_share_one_archive(epub_file):
+    pool = ArchivePool()
+    path = epub_file()
+    errors, seen = [], set()
+
+    def worker():
+        try:
+            for _ in range(50):
+                with pool.open(path) as z:
+                    seen.add(id(z))
+                    assert z.read("OEBPS/cover.png").startswith(b"\x89PNG")
+        except Exception as e:  # surfaced via the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(pool) == 1
+
+
+def test_update_epub_cover_is_visible_through_the_pool(epub_file):
+    path = epub_file()
+    read_epub_cover(path, "OEBPS/cover.png")  # warm the shared pool
+    new_bytes = b"\x89PNG\r\n\x1a\n" + b"new cover"
+    update_epub_cover(path, new_bytes)
+    assert read_epub_cover(path, "OEBPS/cover.png") == new_bytes
+
+
+def test_stored_member_slice_is_positioned_at_member_data(epub_file):
+    import zipfile
+
+    from library.archives import is_stored, open_stored_member
+
+    path = epub_file()
+    with zipfile.ZipFile(path) as z:
+        info = z.getinfo("OEBPS/cover.png")
+        expected = z.read(info)
+    assert is_stored(info)
+
+    member = open_stored_member(path, info, 4, 20)
+    try:
+        # sendfile starts from the descriptor's current offset
+        with open(path, "rb") as raw:
+            raw.seek(os.lseek(member.fileno(), 0, os.SEEK_CUR))
+            assert raw.read(16) == expected[4:20]
+        assert member.read(10) == expected[4:14]
+        assert member.read() == expected[14:20]
+        assert member.read() == b""
+    finally:
+        member.close()
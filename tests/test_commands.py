@@ -1,13 +1,23 @@
 """Tests for Flask CLI commands."""
 
+import os
 import sqlite3
 
 import pytest
 from click.testing import CliRunner
 
 from library import BOOK_DIR_SENTINEL, create_app
-from library.commands import backup_db_command
-from library.models import Book, db
+from library.commands import (
+    backfill_book_stats_command,
+    backup_db_command,
+    build_similar_command,
+    find_duplicates_command,
+    import_books_command,
+    index_content_command,
+    scan_library_command,
+)
+from library.models import Book, BookIdentifier, ChapterText, book_neighbours, db
+from tests._epub_builder import build_epub3
 
 
 @pytest.fixture
@@ -22,6 +32,7 @@ def file_backed_app(tmp_path, monkeypatch):
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
         "BOOK_DIR": str(book_dir),
+        "EPUB_CACHE_DIR": str(tmp_path / "epub_cache"),
     })
     with app.app_context():
         db.create_all()
@@ -84,6 +95,7 @@ def test_backup_db_refuses_in_memory_database(tmp_path, monkeypatch):
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
         "BOOK_DIR": str(book_dir),
+        "EPUB_CACHE_DIR": str(tmp_path / "epub_cache"),
     })
     runner = CliRunner()
     with app.app_context():
@@ -107,3 +119,343 @@ def test_backup_db_ignores_unrelated_files_when_rotating(file_backed_app, tmp_pa
 
     assert (dest / "README").exists()
     assert (dest / "library-2024.db").exists()
+
+
+# --- import-books ---------------------------------------------------------------
+
+
+def _import(app, *args):
+    with app.app_context():
+        result = CliRunner().invoke(import_books_command, list(args))
+        titles = sorted(b.title for b in Book.query.all())
+    assert result.exit_code == 0, result.output
+    return titles
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_import_books_reads_new_files(file_backed_app, tmp_path, jobs):
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    for name in ("a", "b", "c"):
+        (book_dir / f"{name}.epub").write_bytes(build_epub3(title=name.upper()))
+    titles = _import(app, "--jobs", jobs, "--batch-size", "2")
+    assert titles == ["A", "B", "C", "X"]
+    with app.app_context():
+        book = Book.query.filter_by(filename="a.epub").one()
+        assert book.epub_text_size > 0
+        assert book.chapter_count == 3
+        assert book.image_count == 1
+
+
+def test_import_books_stores_identifiers(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    (tmp_path / "books" / "a.epub").write_bytes(
+        build_epub3(title="A", identifiers=[(None, "urn:isbn:0306406152")])
+    )
+    _import(app)
+    with app.app_context():
+        book = Book.query.filter_by(filename="a.epub").one()
+        assert [(i.scheme, i.value) for i in book.identifiers] == [
+            ("isbn", "9780306406157")
+        ]
+
+
+def test_import_books_skips_known_filenames(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    # x.epub is already a row; a file by that name must not be re-imported.
+    (tmp_path / "books" / "x.epub").write_bytes(build_epub3(title="Other"))
+    assert _import(app) == ["X"]
+
+
+def test_import_books_reports_per_file_errors(file_backed_app, tmp_path, caplog):
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    (book_dir / "good.epub").write_bytes(build_epub3(title="Good"))
+    (book_dir / "broken.epub").write_bytes(b"not a zip")
+    with caplog.at_level("INFO", logger="library.commands"):
+        assert _import(app, "--jobs", "2") == ["Good", "X"]
+    assert "broken.epub" in caplog.text
+    assert "Errors: 1 books" in caplog.text
+    assert "books/s" in caplog.text
+
+
+def test_import_books_retries_a_failed_batch_book_by_book(
+    file_backed_app, tmp_path, mocker
+):
+    import library.commands as commands_module
+
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    for name in ("a", "b", "c"):
+        (book_dir / f"{name}.epub").write_bytes(build_epub3(title=name.upper()))
+
+    real_commit = commands_module._commit_import_batch
+    calls = []
+
+    def flaky(filenames):
+        calls.append(list(filenames))
+        if len(calls) == 2:
+            db.session.rollback()
+            return False
+        return real_commit(filenames)
+
+    mocker.patch.object(commands_module, "_commit_import_batch", side_effect=flaky)
+    assert _import(app, "--batch-size", "1") == ["A", "B", "C", "X"]
+
+
+def test_import_books_pins_a_conflict_on_its_file(
+    file_backed_app, tmp_path, mocker, caplog
+):
+    import library.commands as commands_module
+
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    for name in ("a", "b", "c"):
+        (book_dir / f"{name}.epub").write_bytes(build_epub3(title=name.upper()))
+
+    read_many = commands_module._read_many_for_import
+
+    def racing_upload(*args):
+        # Another process adds b.epub after import-books listed the files.
+        with db.engine.begin() as conn:
+            conn.execute(
+                Book.__table__.insert().values(
+                    title="Racer", author="Z", filename="b.epub"
+                )
+            )
+        yield from read_many(*args)
+
+    mocker.patch.object(
+        commands_module, "_read_many_for_import", side_effect=racing_upload
+    )
+    with caplog.at_level("INFO", logger="library.commands"):
+        assert _import(app) == ["A", "C", "Racer", "X"]
+    assert "Successfully imported: 2 books" in caplog.text
+    assert "Errors: 1 books\n  - b.epub: " in caplog.text
+
+
+# --- scan-library ---------------------------------------------------------------
+
+
+def _settled_epub(path, title):
+    import time
+
+    path.write_bytes(build_epub3(title=title))
+    then = time.time() - 60
+    os.utime(path, (then, then))
+
+
+def _scan(app, tmp_path, *args):
+    manifest = str(tmp_path / "manifest.json")
+    with app.app_context():
+        result = CliRunner().invoke(
+            scan_library_command, ["--manifest", manifest, *args]
+        )
+        books = {b.filename: b.title for b in Book.query.all()}
+    assert result.exit_code == 0, result.output
+    return books
+
+
+def test_scan_library_adds_new_files_once(file_backed_app, tmp_path, mocker):
+    import library.storage as storage_module
+
+    app, _ = file_backed_app
+    _settled_epub(tmp_path / "books" / "a.epub", "A")
+    assert _scan(app, tmp_path) == {"x.epub": "X", "a.epub": "A"}
+
+    spy = mocker.spy(storage_module, "read_ingest_metadata")
+    _scan(app, tmp_path)
+    assert spy.call_count == 0
+
+
+def test_scan_library_follows_renames(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    _settled_epub(book_dir / "a.epub", "A")
+    _scan(app, tmp_path)
+
+    os.rename(book_dir / "a.epub", book_dir / "b.epub")
+    assert _scan(app, tmp_path) == {"x.epub": "X", "b.epub": "A"}
+
+
+def test_scan_library_only_prunes_when_asked(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    _settled_epub(book_dir / "a.epub", "A")
+    _settled_epub(book_dir / "b.epub", "B")
+    _scan(app, tmp_path)
+
+    os.remove(book_dir / "a.epub")
+    assert "a.epub" in _scan(app, tmp_path)
+    # The removal is still pending in the manifest until it is acted on.
+    assert "a.epub" not in _scan(app, tmp_path, "--prune")
+
+
+def test_scan_library_ignores_an_empty_mount(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    _settled_epub(book_dir / "a.epub", "A")
+    _scan(app, tmp_path)
+
+    os.remove(book_dir / "a.epub")
+    os.remove(book_dir / BOOK_DIR_SENTINEL)
+    assert "a.epub" in _scan(app, tmp_path, "--prune")
+
+
+def test_scan_library_trusts_an_empty_dir_with_the_sentinel(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    book_dir = tmp_path / "books"
+    _settled_epub(book_dir / "a.epub", "A")
+    _scan(app, tmp_path)
+
+    os.remove(book_dir / "a.epub")
+    assert "a.epub" not in _scan(app, tmp_path, "--prune")
+
+
+def test_scan_library_watch_survives_a_failed_pass(file_backed_app, tmp_path, mocker):
+    import library.commands as commands_module
+
+    app, _ = file_backed_app
+    _settled_epub(tmp_path / "books" / "a.epub", "A")
+    mocker.patch.object(commands_module.time, "sleep")
+    scan_once = commands_module._scan_once
+    passes = []
+
+    def flaky_scan(*args):
+        passes.append(len(passes))
+        if len(passes) == 2:
+            raise FileNotFoundError("b.epub vanished")
+        if len(passes) == 4:
+            raise KeyboardInterrupt
+        return scan_once(*args)
+
+    mocker.patch.object(commands_module, "_scan_once", side_effect=flaky_scan)
+    assert _scan(app, tmp_path, "--watch") == {"a.epub": "A", "x.epub": "X"}
+    assert len(passes) == 4
+
+
+# --- backfill-book-stats --------------------------------------------------------
+
+
+def test_backfill_book_stats_fills_missing_rows(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    (tmp_path / "books" / "x.epub").write_bytes(build_epub3(title="X"))
+    with app.app_context():
+        result = CliRunner().invoke(backfill_book_stats_command, [])
+        assert result.exit_code == 0, result.output
+        assert "updated 1 book(s), 0 error(s)" in result.output
+        book = Book.query.filter_by(filename="x.epub").one()
+        assert book.epub_text_size > 0
+        assert book.chapter_count == 3
+
+        # Already-measured rows are skipped unless --all is given.
+        result = CliRunner().invoke(backfill_book_stats_command, [])
+        assert "updated 0 book(s)" in result.output
+        result = CliRunner().invoke(backfill_book_stats_command, ["--all"])
+        assert "updated 1 book(s)" in result.output
+
+
+def test_backfill_book_stats_all_refreshes_identifiers(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    (tmp_path / "books" / "x.epub").write_bytes(
+        build_epub3(title="X", identifiers=[("calibre", "7"), ("ISBN", "0306406152")])
+    )
+    with app.app_context():
+        for _ in range(2):
+            result = CliRunner().invoke(backfill_book_stats_command, ["--all"])
+            assert result.exit_code == 0, result.output
+        assert sorted(
+            db.session.query(BookIdentifier.scheme, BookIdentifier.value)
+        ) == [("calibre", "7"), ("isbn", "9780306406157")]
+
+
+def test_backfill_book_stats_reports_missing_files(file_backed_app):
+    app, _ = file_backed_app
+    with app.app_context():
+        result = CliRunner().invoke(backfill_book_stats_command, [])
+        assert result.exit_code == 0, result.output
+        assert "updated 0 book(s), 1 error(s)" in result.output
+        assert Book.query.filter_by(filename="x.epub").one().epub_text_size is None
+
+
+# --- index-content --------------------------------------------------------------
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_index_content_indexes_new_and_changed_books(file_backed_app, tmp_path, jobs):
+    app, _ = file_backed_app
+    epub = tmp_path / "books" / "x.epub"
+    epub.write_bytes(build_epub3(title="X"))
+    with app.app_context():
+        result = CliRunner().invoke(index_content_command, ["--jobs", jobs])
+        assert result.exit_code == 0, result.output
+        assert "indexed 1 book(s), 0 error(s)" in result.output
+        texts = [c.text for c in ChapterText.query.order_by(ChapterText.spine_index)]
+        assert texts == ["Chapter 1 Chapter 2", "One chapter one", "Two chapter two"]
+
+        # Nothing to do until the file changes.
+        result = CliRunner().invoke(index_content_command, [])
+        assert "indexed 0 book(s)" in result.output
+
+        epub.write_bytes(
+            build_epub3(title="X", chapters=[("ch1.xhtml", "<p>rewritten</p>")])
+        )
+        book = Book.query.filter_by(filename="x.epub").one()
+        book.file_fingerprint = "stale"
+        db.session.commit()
+        result = CliRunner().invoke(index_content_command, [])
+        assert "indexed 1 book(s)" in result.output
+        assert [c.text for c in ChapterText.query][-1] == "rewritten"
+
+
+def test_index_content_leaves_unreadable_books_pending(file_backed_app):
+    app, _ = file_backed_app
+    with app.app_context():
+        result = CliRunner().invoke(index_content_command, [])
+        assert result.exit_code == 0, result.output
+        assert "indexed 0 book(s), 1 error(s)" in result.output
+        book = Book.query.filter_by(filename="x.epub").one()
+        assert book.content_indexed_fingerprint is None
+
+
+def test_index_content_adds_books_to_similar_lists(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    (tmp_path / "books" / "x.epub").write_bytes(build_epub3(title="X"))
+    (tmp_path / "books" / "z.epub").write_bytes(build_epub3(title="Z"))
+    with app.app_context():
+        db.session.add(Book(title="Z", author="Y", filename="z.epub"))
+        db.session.commit()
+        CliRunner().invoke(index_content_command, [])
+        pairs = db.session.query(
+            book_neighbours.c.book_id, book_neighbours.c.neighbour_id
+        ).all()
+        assert len(pairs) == 2
+
+        db.session.execute(book_neighbours.delete())
+        result = CliRunner().invoke(build_similar_command, [])
+        assert result.exit_code == 0, result.output
+        assert "build-similar: 2 book(s), 2 neighbour link(s)" in result.output
+
+
+# --- find-duplicates ------------------------------------------------------------
+
+
+def test_find_duplicates_reports_indexed_copies(file_backed_app, tmp_path):
+    app, _ = file_backed_app
+    body = "<p>" + " ".join(f"word{i}" for i in range(400)) + "</p>"
+    for name in ("x", "x_2"):
+        (tmp_path / "books" / f"{name}.epub").write_bytes(
+            build_epub3(title="X", chapters=[("ch1.xhtml", body)])
+        )
+    with app.app_context():
+        db.session.add(Book(title="X again", author="Y", filename="x_2.epub"))
+        db.session.commit()
+        result = CliRunner().invoke(find_duplicates_command, [])
+        assert "0 group(s)" in result.output  # Not indexed yet
+
+        CliRunner().invoke(index_content_command, [])
+        result = CliRunner().invoke(find_duplicates_command, [])
+        assert result.exit_code == 0, result.output
+        assert "Group 1 (2 books):" in result.output
+        assert "100%  x_2.epub  'X again' by Y" in result.output
+        assert "1 group(s), 1 extra copies" in result.output
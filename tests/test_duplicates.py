@@ -0,0 +1,82 @@
+import random
+
+from library.duplicates import (
+    duplicate_groups,
+    minhash,
+    near_duplicates,
+    similarity,
+    store_signature,
+)
+from library.models import Book, book_lsh_buckets, db
+
+
+def _text(seed, words=3000):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(20000)}" for _ in range(words))
+
+
+def _chapters(*texts):
+    return [{"spine_index": i, "title": None, "text": t} for i, t in enumerate(texts)]
+
+
+def _book(title, chapters, access_level="standard"):
+    book = Book(
+        title=title,
+        author="Author",
+        filename=f"{title}.epub",
+        access_level=access_level,
+    )
+    db.session.add(book)
+    db.session.flush()
+    store_signature(book, minhash(chapters))
+    db.session.commit()
+    return book
+
+
+def test_minhash_estimates_shared_text():
+    text = _text(1)
+    same = minhash(_chapters(text))
+    assert same == minhash(_chapters(text.upper()))
+    # A new front page and a few edits barely move it; other text shares nothing.
+    edited = minhash(_chapters("Second edition. " + text.replace("w1", "x1", 5)))
+    assert similarity(same, edited) > 0.9
+    assert similarity(same, minhash(_chapters(_text(2)))) < 0.1
+
+
+def test_minhash_of_short_and_empty_text():
+    assert len(minhash(_chapters("one two"))) == 128
+    assert minhash(_chapters("", " ... ")) is None
+
+
+def test_near_duplicates_finds_copies_only(app):
+    text = _text(1)
+    original = _book("original", _chapters(text[:9000], text[9000:]))
+    copy = _book("copy", _chapters(text))  # Split into chapters differently
+    _book("other", _chapters(_text(2)))
+
+    matches = near_duplicates(minhash(_chapters(text)), 0.8)
+    assert [book for book, _ in matches] == [copy, original]
+    assert matches[0][1] == 1.0
+    others = near_duplicates(minhash(_chapters(text)), 0.8, exclude_id=copy.id)
+    assert [book for book, _ in others] == [original]
+
+
+def test_duplicate_groups_joins_chains_of_matches(app):
+    text = _text(1)
+    a = _book("a", _chapters(text))
+    b = _book("b", _chapters(text + " " + _text(3, words=300)))
+    c = _book("c", _chapters(text + " " + _text(4, words=300)))
+    _book("other", _chapters(_text(2)))
+    d = _book("d", _chapters(_text(5)))
+    e = _book("e", _chapters(_text(5)))
+
+    assert duplicate_groups(0.8) == [[a.id, b.id, c.id], [d.id, e.id]]
+    assert duplicate_groups(1.0) == [[d.id, e.id]]
+
+
+def test_deleting_a_book_drops_its_buckets(app):
+    book = _book("a", _chapters(_text(1)))
+    assert db.session.query(book_lsh_buckets).count() == 16
+    db.session.delete(book)
+    db.session.commit()
+    assert db.session.query(book_lsh_buckets).count() == 0
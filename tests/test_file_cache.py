@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from library.file_cache import LocalFileCache
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    source = tmp_path / "nas"
+    source.mkdir()
+    return source, tmp_path / "ssd"
+
+
+def _write(path, data, mtime=None):
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_disabled_cache_reads_source(dirs):
+    source, cache_dir = dirs
+    _write(source / "a.epub", b"a")
+    cache = LocalFileCache(None, 1024)
+    assert cache.path(str(source), "a.epub") == str(source / "a.epub")
+
+
+def test_copies_in_then_serves_copy(dirs, mocker):
+    source, cache_dir = dirs
+    _write(source / "a.epub", b"a" * 10)
+    cache = LocalFileCache(str(cache_dir), 1024)
+
+    path = cache.path(str(source), "a.epub")
+    assert path == str(cache_dir / "a.epub")
+    assert (cache_dir / "a.epub").read_bytes() == b"a" * 10
+
+    copy = mocker.spy(LocalFileCache, "_fill")
+    st = os.stat(source / "a.epub")
+    assert cache.path(str(source), "a.epub", st.st_size, st.st_mtime_ns) == path
+    assert copy.call_count == 0
+
+
+def test_refills_when_source_mtime_changes(dirs):
+    source, cache_dir = dirs
+    _write(source / "a.epub", b"old", mtime=1_000_000)
+    cache = LocalFileCache(str(cache_dir), 1024)
+    cache.path(str(source), "a.epub")
+
+    _write(source / "a.epub", b"new", mtime=2_000_000)
+    path = cache.path(str(source), "a.epub")
+    assert open(path, "rb").read() == b"new"
+
+
+def test_evicts_least_recently_read(dirs):
+    source, cache_dir = dirs
+    for name in ("a", "b", "c"):
+        _write(source / f"{name}.epub", b"x" * 40)
+    cache = LocalFileCache(str(cache_dir), 100)
+
+    cache.path(str(source), "a.epub")
+    cache.path(str(source), "b.epub")
+    # Make "a" look recently read, "b" stale.
+    now = time.time()
+    os.utime(cache_dir / "b.epub", (now - 3600, os.stat(cache_dir / "b.epub").st_mtime))
+    cache.path(str(source), "c.epub")
+
+    assert sorted(os.listdir(cache_dir)) == ["a.epub", "c.epub"]
+
+
+def test_files_larger_than_budget_bypass_cache(dirs):
+    source, cache_dir = dirs
+    _write(source / "big.epub", b"x" * 200)
+    cache = LocalFileCache(str(cache_dir), 100)
+    assert cache.path(str(source), "big.epub") == str(source / "big.epub")
+    assert not cache_dir.exists() or not os.listdir(cache_dir)
+
+
+def test_missing_source_is_passed_through(dirs):
+    source, cache_dir = dirs
+    cache = LocalFileCache(str(cache_dir), 100)
+    assert cache.path(str(source), "gone.epub") == str(source / "gone.epub")
+
+
+def test_invalidate_removes_copy(dirs):
+    source, cache_dir = dirs
+    _write(source / "a.epub", b"a")
+    cache = LocalFileCache(str(cache_dir), 100)
+    cache.path(str(source), "a.epub")
+    cache.invalidate("a.epub")
+    assert not (cache_dir / "a.epub").exists()
@@ -0,0 +1,47 @@
+import pytest
+
+from library.identifiers import normalize_identifiers, normalize_isbn
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "9780306406157",
+        "978-0-306-40615-7",
+        "0306406152",
+        "0-306-40615-2",
+        "urn:isbn:0306406152",
+        "ISBN 978 0 306 40615 7",
+    ],
+)
+def test_normalize_isbn_accepts_common_notations(text):
+    assert normalize_isbn(text) == "9780306406157"
+
+
+def test_normalize_isbn_handles_x_check_digit():
+    assert normalize_isbn("0-8044-2957-X") == "9780804429573"
+    assert normalize_isbn("080442957x") == "9780804429573"
+
+
+@pytest.mark.parametrize(
+    "text", ["", None, "0306406153", "9780306406158", "1234567890123", "abc"]
+)
+def test_normalize_isbn_rejects_invalid(text):
+    assert normalize_isbn(text) is None
+
+
+def test_normalize_identifiers_keeps_known_schemes_once():
+    identifiers = [
+        {"scheme": None, "value": "test-Book"},
+        {"scheme": "ISBN", "value": "0-306-40615-2"},
+        {"scheme": None, "value": "urn:isbn:9780306406157"},
+        {"scheme": None, "value": "urn:uuid:12345678-1234-5678-1234-56781234567A"},
+        {"scheme": "uuid", "value": "not-a-uuid"},
+        {"scheme": "calibre", "value": "42"},
+        {"scheme": "DOI", "value": "10.1000/182"},
+    ]
+    assert normalize_identifiers(identifiers) == [
+        ("isbn", "9780306406157"),
+        ("uuid", "12345678-1234-5678-1234-56781234567a"),
+        ("calibre", "42"),
+    ]
@@ -1,4 +1,4 @@
-from library.matching import rank_matches, score_book
+from library.matching import CandidateIndex, IndexedBook, rank_matches, score_book
 
 
 class _Book:
@@ -62,3 +62,46 @@ def test_rank_matches_respects_limit():
     books = [_Book("Dune", "Frank Herbert", f"{i}.epub") for i in range(10)]
     ranked = rank_matches("Dune", "Frank Herbert", books, threshold=0.6, limit=3)
     assert len(ranked) == 3
+
+
+# --- CandidateIndex -------------------------------------------------------------
+
+
+def _index(*books):
+    index = CandidateIndex()
+    index.rebuild(
+        (i, title, author, f"{i}.epub", level)
+        for i, (title, author, level) in enumerate(books)
+    )
+    return index
+
+
+def test_candidates_prefer_shared_rare_terms():
+    index = _index(
+        ("The Hobbit", "J.R.R. Tolkien", "standard"),
+        ("The Road", "Cormac McCarthy", "standard"),
+        ("The Hobit", "Tolkien", "standard"),  # misspelt: trigrams still overlap
+        *(("The Book", f"Author {i}", "standard") for i in range(50)),
+    )
+    found = [b.title for b in index.candidates("The Hobbit", "Tolkien", 2)]
+    assert found == ["The Hobbit", "The Hobit"]
+    assert index.candidates("", "", 5) == []
+
+
+def test_candidates_filter_access_level_before_cutting():
+    index = _index(
+        *(("Dune", "Frank Herbert", "admin") for _ in range(5)),
+        ("Dune", "Frank Herbert", "standard"),
+    )
+    [book] = index.candidates("Dune", "Herbert", 1, access_levels={"standard"})
+    assert book.access_level == "standard"
+
+
+def test_candidate_index_add_and_remove():
+    index = _index(("Dune", "Frank Herbert", "standard"))
+    index.add(IndexedBook(0, "Emma", "Jane Austen", "0.epub", "standard"))
+    assert index.candidates("Dune", "", 5) == []
+    assert [b.title for b in index.candidates("Emma", "", 5)] == ["Emma"]
+    index.remove(0)
+    assert len(index) == 0
+    assert index.candidates("Emma", "", 5) == []
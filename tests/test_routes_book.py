@@ -1,6 +1,10 @@
 import os
 
-from library.models import Book, db
+import pytest
+
+from library.matching import CandidateIndex
+from library.models import Book, BookIdentifier, db
+from library.routes import index as index_routes
 
 # --- index / load_more ----------------------------------------------------------
 
@@ -58,12 +62,236 @@ def test_load_more_includes_total_count_header(client, book):
     assert r.headers["X-Total-Count"] == "0"
 
 
+def test_load_more_reads_stored_text_size(client, book, mocker):
+    import library.routes.index as index_module
+
+    book.epub_text_size = 12345
+    db.session.commit()
+    spy = mocker.spy(index_module, "epub_text_size")
+    items = client.get("/load_more/0").get_json()
+    assert items[0]["length"] == 12345
+    assert spy.call_count == 0
+
+
+def test_load_more_measures_books_without_stored_size(client, book):
+    from library.utils import epub_text_size
+
+    assert book.epub_text_size is None
+    items = client.get("/load_more/0").get_json()
+    epub_path = os.path.join(client.application.config["BOOK_DIR"], book.filename)
+    assert items[0]["length"] == epub_text_size(epub_path) > 0
+
+
 def test_index_template_exposes_total_books(client, book):
     """Server-rendered initial total_books seeds window.totalBooks."""
     r = client.get("/")
     assert b"window.totalBooks = 1" in r.data
 
 
+def _add_books(count, created_at=None):
+    """`count` rows with a stored text size (so listing never opens a file)."""
+    from datetime import datetime
+
+    created_at = created_at or datetime(2024, 1, 1)
+    books = [
+        Book(
+            title=f"Book {i}",
+            author="Author",
+            filename=f"book_{i:02d}.epub",
+            epub_text_size=1,
+            created_at=created_at,
+        )
+        for i in range(count)
+    ]
+    db.session.add_all(books)
+    db.session.commit()
+    return books
+
+
+def _walk_pages(client, query=""):
+    """Follow X-Next-Cursor from the first page; returns filenames per page."""
+    pages = []
+    url = f"/load_more?{query}"
+    while True:
+        r = client.get(url)
+        assert r.status_code == 200
+        pages.append([item["filename"] for item in r.get_json()])
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+        url = f"/load_more?{query}&cursor={cursor}"
+
+
+def test_load_more_cursor_walks_every_book_once(client):
+    # Identical created_at: order and paging fall back to the id tiebreak.
+    books = _add_books(19)
+    pages = _walk_pages(client)
+    assert [len(page) for page in pages] == [8, 8, 3]
+    assert [f for page in pages for f in page] == [
+        b.filename for b in reversed(books)
+    ]
+
+
+def test_load_more_cursor_ignores_books_added_while_scrolling(client):
+    from datetime import datetime
+
+    books = _add_books(10)
+    r = client.get("/load_more")
+    first = [item["filename"] for item in r.get_json()]
+    # Newer books land at the top of the list and must not push a book from
+    # the first page onto the second.
+    db.session.add(Book(title="New", author="A", filename="new.epub",
+                        epub_text_size=1, created_at=datetime(2025, 1, 1)))
+    db.session.commit()
+
+    r = client.get(f"/load_more?cursor={r.headers['X-Next-Cursor']}")
+    second = [item["filename"] for item in r.get_json()]
+    assert first + second == [b.filename for b in reversed(books)]
+    assert "X-Next-Cursor" not in r.headers
+
+
+def test_load_more_cursor_pages_my_books_by_last_read(standard_client, standard_user):
+    from datetime import datetime, timedelta
+
+    from library.choices import BookProgressChoice
+    from library.models import Bookmark
+
+    books = _add_books(10)
+    # Shuffled read times, with some ties to exercise the id tiebreak.
+    last_read = {b.id: datetime(2024, 6, 1) - timedelta(hours=(i * 7) % 5)
+                 for i, b in enumerate(books)}
+    for b in books:
+        db.session.add(Bookmark(user_id=standard_user.id, book_id=b.id,
+                                status=BookProgressChoice.IN_PROGRESS,
+                                last_read=last_read[b.id]))
+    db.session.commit()
+
+    pages = _walk_pages(standard_client, "view=mine")
+    expected = sorted(books, key=lambda b: (last_read[b.id], b.id), reverse=True)
+    assert [f for page in pages for f in page] == [b.filename for b in expected]
+
+
+def test_load_more_rejects_bad_cursor(client, book):
+    assert client.get("/load_more?cursor=not-a-cursor").status_code == 400
+
+
+def test_load_more_rejects_cursor_from_other_view(standard_client, standard_user):
+    _add_books(9)
+    cursor = standard_client.get("/load_more?view=all").headers["X-Next-Cursor"]
+    r = standard_client.get(f"/load_more?view=mine&cursor={cursor}")
+    assert r.status_code == 400
+
+
+def test_load_more_counts_total_on_first_page_only(client, mocker):
+    import library.routes.index as index_module
+
+    _add_books(9)
+    spy = mocker.spy(index_module, "count_books")
+    r = client.get("/load_more")
+    assert r.headers["X-Total-Count"] == "9"
+    r = client.get(f"/load_more?cursor={r.headers['X-Next-Cursor']}")
+    assert len(r.get_json()) == 1
+    assert "X-Total-Count" not in r.headers
+    # The total came from the page query; no separate COUNT ran.
+    assert spy.call_count == 0
+
+
+def test_load_more_tag_filter_lists_multi_tagged_book_once(
+    standard_client, standard_user
+):
+    from library.models import Tag, book_tags
+
+    tagged, other, untagged = _add_books(3)
+    fav = Tag(name="fav", user_id=standard_user.id)
+    sci = Tag(name="sci-fi", user_id=standard_user.id)
+    db.session.add_all([fav, sci])
+    db.session.flush()
+    for book, tag in ((tagged, fav), (tagged, sci), (other, sci)):
+        db.session.execute(book_tags.insert().values(
+            book_id=book.id, tag_id=tag.id, user_id=standard_user.id
+        ))
+    db.session.commit()
+
+    r = standard_client.get("/load_more?tags=fav,sci-fi")
+    assert sorted(item["filename"] for item in r.get_json()) == [
+        tagged.filename, other.filename
+    ]
+    assert r.headers["X-Total-Count"] == "2"
+
+    r = standard_client.get("/load_more?tags=fav,Unread")
+    assert {item["filename"] for item in r.get_json()} == {
+        tagged.filename, other.filename, untagged.filename
+    }
+
+
+def _filenames(client, url):
+    return [item["filename"] for item in client.get(url).get_json()]
+
+
+def test_load_more_filter_matches_substrings_via_index(client):
+    a, b = _add_books(2)
+    a.title, a.author, a.genre = "The Left Hand of Darkness", "Ursula K. Le Guin", "SF"
+    b.title, b.author = "Dune", "Frank Herbert"
+    db.session.commit()
+
+    assert _filenames(client, "/load_more?title=DARK") == [a.filename]
+    assert _filenames(client, "/load_more?author=guin&title=hand") == [a.filename]
+    # Too short for a trigram; matched with LIKE instead.
+    assert _filenames(client, "/load_more?title=of") == [a.filename]
+    assert _filenames(client, "/load_more?genre=sf&author=herbert") == []
+
+
+def test_load_more_filter_index_follows_book_writes(client):
+    (book,) = _add_books(1)
+    book.title = "Renamed Title"
+    db.session.commit()
+    assert _filenames(client, "/load_more?title=renamed") == [book.filename]
+    assert _filenames(client, "/load_more?title=Book") == []
+
+    db.session.delete(book)
+    db.session.commit()
+    assert _filenames(client, "/load_more?title=renamed") == []
+
+
+def test_load_more_filter_ranks_by_relevance(client):
+    from datetime import datetime
+
+    loose, exact = _add_books(2)
+    loose.title = "A Long Survey of Desert Planets Including Dune"
+    exact.title = "Dune"
+    # Newest-first would put `loose` first.
+    loose.created_at = datetime(2025, 1, 1)
+    db.session.commit()
+
+    assert _filenames(client, "/load_more?title=dune") == [
+        exact.filename, loose.filename
+    ]
+
+
+def test_load_more_ranked_cursor_walks_every_match_once(client):
+    books = _add_books(19)
+    for i, b in enumerate(books):
+        b.title = "Match " + "padding " * (i % 4)
+    db.session.commit()
+
+    pages = _walk_pages(client, "title=match")
+    filenames = [f for page in pages for f in page]
+    assert sorted(filenames) == sorted(b.filename for b in books)
+    assert [len(page) for page in pages] == [8, 8, 3]
+
+
+def test_load_more_rejects_unranked_cursor_for_search(client):
+    _add_books(9)
+    cursor = client.get("/load_more").headers["X-Next-Cursor"]
+    assert client.get(f"/load_more?title=book&cursor={cursor}").status_code == 400
+
+
+def test_index_template_seeds_next_cursor(client):
+    assert b"window.nextCursor = null" in client.get("/").data
+    _add_books(9)
+    assert b'window.nextCursor = "' in client.get("/").data
+
+
 # --- view=mine vs view=all ------------------------------------------------------
 
 
@@ -230,6 +458,48 @@ def test_cover_cache_invalidates_when_file_mtime_changes(client, book, app, mock
     assert spy.call_count == 2
 
 
+def test_cover_304_needs_no_filesystem_access(client, book, mocker):
+    etag = client.get(f"/cover/{book.filename}").headers["ETag"]
+    stat = mocker.spy(os, "stat")
+    r = client.get(f"/cover/{book.filename}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert stat.call_count == 0
+
+
+def test_first_request_records_file_state(client, book):
+    assert book.file_fingerprint is None
+    client.get(f"/cover/{book.filename}")
+    db.session.refresh(book)
+    epub_path = os.path.join(client.application.config["BOOK_DIR"], book.filename)
+    assert book.file_size == os.path.getsize(epub_path)
+    assert book.file_mtime_ns == os.stat(epub_path).st_mtime_ns
+    assert book.file_fingerprint
+
+
+def test_cover_etag_rechecked_after_verify_interval(client, app, book):
+    from library import cache
+    from tests._epub_builder import build_epub3
+
+    etag = client.get(f"/cover/{book.filename}").headers["ETag"]
+    epub_path = os.path.join(app.config["BOOK_DIR"], book.filename)
+    with open(epub_path, "wb") as f:
+        f.write(build_epub3(title="Rewritten"))
+
+    # Within the interval the recorded state is trusted...
+    r = client.get(f"/cover/{book.filename}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    # ...once it lapses the file is re-checked and the stale ETag misses.
+    cache.delete(f"file_checked:{book.id}")
+    r = client.get(f"/cover/{book.filename}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+
+
+def test_cover_404s_when_file_missing(client, app, book):
+    os.remove(os.path.join(app.config["BOOK_DIR"], book.filename))
+    assert client.get(f"/cover/{book.filename}").status_code == 404
+
+
 # --- /download ------------------------------------------------------------------
 
 
@@ -321,3 +591,228 @@ def test_books_search_excludes_restricted_for_standard_user(standard_client, boo
     db.session.commit()
     r = standard_client.get("/books?title=Test%20Book&author=Test%20Author")
     assert r.get_json()["matches"] == []
+
+
+def _match_filenames(client, title, author=""):
+    r = client.get("/books", query_string={"title": title, "author": author})
+    return [m["filename"] for m in r.get_json()["matches"]]
+
+
+def test_books_search_index_follows_commits(standard_client, book, mocker):
+    assert _match_filenames(standard_client, "Test Book") == [book.filename]
+    rebuild = mocker.spy(CandidateIndex, "rebuild")
+
+    dune = Book(title="Dune", author="Frank Herbert", filename="dune.epub")
+    db.session.add(dune)
+    db.session.commit()
+    assert _match_filenames(standard_client, "Dune") == ["dune.epub"]
+
+    dune.title = "Children of Dune"
+    db.session.commit()
+    assert _match_filenames(standard_client, "Children of Dune") == ["dune.epub"]
+
+    db.session.delete(dune)
+    db.session.commit()
+    assert _match_filenames(standard_client, "Children of Dune") == []
+
+    # Updated in place, not reloaded.
+    assert rebuild.call_count == 0
+
+
+def test_books_search_index_ignores_rolled_back_and_unrelated_writes(
+    standard_client, book, mocker
+):
+    _match_filenames(standard_client, "Test Book")
+    rebuild = mocker.spy(CandidateIndex, "rebuild")
+    db.session.add(Book(title="Dune", author="Frank Herbert", filename="dune.epub"))
+    db.session.flush()
+    db.session.rollback()
+    book.file_size = 123
+    db.session.commit()
+    assert _match_filenames(standard_client, "Dune") == []
+    assert rebuild.call_count == 0
+
+
+def test_books_search_index_catches_up_with_raw_writes(standard_client, book, mocker):
+    _match_filenames(standard_client, "Test Book")
+    rebuild = mocker.spy(CandidateIndex, "rebuild")
+    # As another worker or a bulk job might: no ORM involved.
+    db.session.execute(
+        Book.__table__.insert().values(
+            title="Dune",
+            author="Frank Herbert",
+            filename="dune.epub",
+            access_level="standard",
+            created_at=book.created_at,
+        )
+    )
+    db.session.execute(Book.__table__.delete().where(Book.id == book.id))
+    db.session.commit()
+    assert _match_filenames(standard_client, "Dune") == ["dune.epub"]
+    assert _match_filenames(standard_client, "Test Book") == []
+    assert rebuild.call_count == 0
+
+
+def test_books_match_scores_each_item_in_order(standard_client, book):
+    db.session.add(Book(title="Dune", author="Frank Herbert", filename="dune.epub"))
+    db.session.add(
+        Book(
+            title="Dune Messiah",
+            author="Frank Herbert",
+            filename="messiah.epub",
+            access_level="restricted",
+        )
+    )
+    db.session.commit()
+    items = [
+        {"title": "Dune", "author": "Herbert, Frank"},
+        {"title": "War and Peace", "author": "Tolstoy"},
+        {"title": "The Test Book"},
+        {"title": "  ", "author": None},
+        {"title": "Dune", "author": "Herbert, Frank"},
+    ]
+    r = standard_client.post("/books/match", json={"items": items})
+    assert r.status_code == 200
+    results = r.get_json()["results"]
+    assert len(results) == len(items)
+    # Same answers as one GET /books per item.
+    for item, result in zip(items, results, strict=True):
+        if not (item.get("title") or "").strip():
+            assert result["matches"] == []
+            continue
+        single = standard_client.get(
+            "/books", query_string={k: v for k, v in item.items() if v}
+        )
+        assert result["matches"] == single.get_json()["matches"]
+    assert [m["filename"] for m in results[0]["matches"]] == ["dune.epub"]
+    assert results[1]["matches"] == []
+    assert results[2]["matches"][0]["filename"] == book.filename
+
+
+def _with_isbn(book, isbn="9780306406157"):
+    book.identifiers.append(BookIdentifier(scheme="isbn", value=isbn))
+    db.session.commit()
+    return book
+
+
+def test_books_search_answers_isbn_from_identifiers(standard_client, book, mocker):
+    _with_isbn(book)
+    rank = mocker.spy(index_routes, "rank_matches")
+    r = standard_client.get("/books?isbn=0-306-40615-2&title=Something%20Else")
+    assert r.get_json()["matches"] == [
+        {
+            "title": "Test Book",
+            "author": "Test Author",
+            "filename": book.filename,
+            "score": 1.0,
+        }
+    ]
+    assert rank.call_count == 0
+
+
+def test_books_search_falls_back_when_isbn_is_unknown(standard_client, book):
+    _with_isbn(book)
+    assert _match_filenames(standard_client, "Test Book") == [book.filename]
+    r = standard_client.get("/books?isbn=9780804429573&title=Test%20Book")
+    assert [m["filename"] for m in r.get_json()["matches"]] == [book.filename]
+    assert standard_client.get("/books?isbn=9780804429573").get_json() == {
+        "matches": []
+    }
+    # Not a valid ISBN and nothing else to go on.
+    assert standard_client.get("/books?isbn=123").status_code == 400
+
+
+def test_books_search_isbn_respects_access_level(standard_client, book):
+    _with_isbn(book)
+    book.access_level = "restricted"
+    db.session.commit()
+    assert standard_client.get("/books?isbn=9780306406157").get_json() == {
+        "matches": []
+    }
+
+
+def test_books_match_looks_up_isbns_together(standard_client, book):
+    _with_isbn(book)
+    items = [
+        {"isbn": "0306406152"},
+        {"isbn": "9780804429573", "title": "Test Book"},
+        {"isbn": "9780804429573"},
+    ]
+    results = standard_client.post("/books/match", json={"items": items}).get_json()
+    assert [[m["score"] for m in r["matches"]] for r in results["results"]] == [
+        [1.0],
+        [pytest.approx(1.0)],
+        [],
+    ]
+
+
+def test_books_match_requires_auth(client):
+    assert client.post("/books/match", json={"items": []}).status_code == 401
+
+
+def test_books_match_validates_payload(standard_client, monkeypatch):
+    assert standard_client.post("/books/match", json={}).status_code == 400
+    r = standard_client.post("/books/match", json={"items": ["Dune"]})
+    assert r.status_code == 400
+    monkeypatch.setattr(index_routes, "BOOKS_MATCH_MAX_ITEMS", 2)
+    r = standard_client.post("/books/match", json={"items": [{"title": "x"}] * 3})
+    assert r.status_code == 400
+    assert standard_client.post("/books/match", json={"items": []}).get_json() == {
+        "results": []
+    }
+
+
+# --- local EPUB cache -----------------------------------------------------------
+
+
+@pytest.fixture
+def local_cache_dir(app, tmp_path):
+    from library.file_cache import epub_file_cache
+
+    cache_dir = tmp_path / "ssd"
+    epub_file_cache.cache_dir = str(cache_dir)
+    epub_file_cache.max_bytes = 10 * 1024 * 1024
+    yield cache_dir
+    epub_file_cache.cache_dir = None
+
+
+def test_reads_go_through_local_cache(client, book, local_cache_dir):
+    # A cover is two small members; copying the whole EPUB for it would only
+    # churn the cache.
+    assert client.get(f"/cover/{book.filename}").status_code == 200
+    assert not (local_cache_dir / book.filename).exists()
+
+    r = client.get(f"/download/{book.filename}")
+    assert r.status_code == 200
+    assert r.data[:4] == b"PK\x03\x04"
+    assert r.headers["Content-Disposition"] == "attachment; filename=test_book.epub"
+
+
+def test_reads_refetch_a_copy_evicted_before_it_is_opened(
+    client, book, local_cache_dir, monkeypatch
+):
+    from library.file_cache import epub_file_cache
+
+    lookup = epub_file_cache.lookup
+
+    def lookup_then_evict(*args):
+        # Another worker's eviction lands between the lookup and the open.
+        path = lookup(*args)
+        os.remove(path)
+        monkeypatch.setattr(epub_file_cache, "lookup", lookup)
+        return path
+
+    for url in (
+        f"/chapter/{book.filename}/0",
+        f"/download/{book.filename}",
+    ):
+        monkeypatch.setattr(epub_file_cache, "lookup", lookup_then_evict)
+        assert client.get(url).status_code == 200
+        assert (local_cache_dir / book.filename).exists()
+
+
+def test_delete_book_drops_local_copy(admin_client, book, local_cache_dir):
+    admin_client.get(f"/chapter/{book.filename}/0")
+    assert (local_cache_dir / book.filename).exists()
+    admin_client.delete(f"/book/{book.filename}")
+    assert not (local_cache_dir / book.filename).exists()
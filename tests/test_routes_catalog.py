@@ -0,0 +1,96 @@
+import gzip
+import json
+
+from library.models import Book, db
+
+
+def _add(title, author="Frank Herbert", access_level="standard", **columns):
+    book = Book(
+        title=title,
+        author=author,
+        filename=f"{title.lower().replace(' ', '_')}.epub",
+        access_level=access_level,
+        **columns,
+    )
+    db.session.add(book)
+    db.session.commit()
+    return book
+
+
+def _rows(payload, key):
+    fields = payload["fields"]
+    return {row[0]: dict(zip(fields, row, strict=True)) for row in payload[key]}
+
+
+def test_snapshot_lists_visible_books(client):
+    dune = _add(
+        "Dune", epub_text_size=1234, file_mtime_ns=255, file_fingerprint="abc"
+    )
+    _add("Secret", access_level="restricted")
+    r = client.get("/catalog/snapshot")
+    assert r.status_code == 200
+    payload = r.get_json()
+    assert payload["token"] == "2"
+    assert _rows(payload, "books") == {
+        dune.id: {
+            "id": dune.id,
+            "filename": "dune.epub",
+            "title_tokens": ["dune"],
+            "author_tokens": ["frank", "herbert"],
+            "length": 1234,
+            "cover_version": "ff-abc",
+        }
+    }
+
+
+def test_snapshot_revalidates_and_compresses(admin_client):
+    for i in range(50):
+        _add(f"Book {i}", access_level="restricted" if i % 2 else "standard")
+    r = admin_client.get("/catalog/snapshot", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(r.data))["books"]) == 50
+    etag = r.headers["ETag"]
+
+    r = admin_client.get("/catalog/snapshot", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    _add("One More")
+    r = admin_client.get("/catalog/snapshot", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.get_json()["books"]) == 51
+
+
+def test_changes_return_only_what_moved(standard_client):
+    gone = _add("Gone")
+    dune = _add("Dune")
+    emma = _add("Emma", author="Jane Austen")
+    token = standard_client.get("/catalog/snapshot").get_json()["token"]
+
+    r = standard_client.get(f"/catalog/changes?since={token}")
+    assert r.get_json()["upserts"] == [] and r.get_json()["deletes"] == []
+
+    dune.title = "Dune Messiah"
+    dune.file_size = 99  # Not synced: no change recorded
+    emma.file_size = 5
+    emma.access_level = "restricted"
+    db.session.delete(gone)
+    db.session.commit()
+    added = _add("Added")
+
+    payload = standard_client.get(f"/catalog/changes?since={token}").get_json()
+    assert sorted(_rows(payload, "upserts")) == [dune.id, added.id]
+    assert _rows(payload, "upserts")[dune.id]["title_tokens"] == ["dune", "messiah"]
+    assert payload["deletes"] == sorted([emma.id, gone.id])
+
+    # Nothing since the new token.
+    payload = standard_client.get(
+        f"/catalog/changes?since={payload['token']}"
+    ).get_json()
+    assert payload["upserts"] == [] and payload["deletes"] == []
+
+
+def test_changes_reject_bad_tokens(client):
+    _add("Dune")
+    assert client.get("/catalog/changes").status_code == 400
+    assert client.get("/catalog/changes?since=abc").status_code == 400
+    assert client.get("/catalog/changes?since=-1").status_code == 400
+    assert client.get("/catalog/changes?since=99").status_code == 410
@@ -1,5 +1,5 @@
 from library.choices import BookProgressChoice
-from library.models import Bookmark, Tag, db
+from library.models import Book, Bookmark, Tag, book_neighbours, db
 
 
 def test_get_metadata_returns_book_fields(client, book):
@@ -189,3 +189,88 @@ def test_list_tags_does_not_leak_other_users_tags(standard_client):
 
     r = standard_client.get("/tags")
     assert "other-private" not in r.get_json()
+
+
+# --- /update_cover --------------------------------------------------------------
+
+
+def test_update_cover_records_new_file_state(standard_client, book):
+    import io
+
+    etag = standard_client.get(f"/cover/{book.filename}").headers["ETag"]
+    old_fingerprint = book.file_fingerprint
+
+    r = standard_client.post(
+        "/update_cover",
+        data={
+            "filename": book.filename,
+            "cover": (io.BytesIO(b"\x89PNG\r\n\x1a\nNEW"), "cover.png"),
+        },
+        content_type="multipart/form-data",
+    )
+    assert r.status_code == 200
+    db.session.refresh(book)
+    assert book.file_fingerprint != old_fingerprint
+    version = f"{book.file_mtime_ns:x}-{book.file_fingerprint}"
+    assert r.get_json()["cover"].endswith(f"?v={version}")
+
+    # The old ETag no longer matches, without waiting for re-verification.
+    r = standard_client.get(f"/cover/{book.filename}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+
+
+def test_similar_lists_visible_neighbours_best_first(client, book):
+    near = Book(title="Near", author="A", filename="near.epub")
+    nearer = Book(title="Nearer", author="A", filename="nearer.epub")
+    hidden = Book(
+        title="Hidden", author="A", filename="hidden.epub", access_level="restricted"
+    )
+    db.session.add_all([near, nearer, hidden])
+    db.session.flush()
+    db.session.execute(
+        book_neighbours.insert(),
+        [
+            {"book_id": book.id, "neighbour_id": near.id, "score": 0.41},
+            {"book_id": book.id, "neighbour_id": nearer.id, "score": 0.72},
+            {"book_id": book.id, "neighbour_id": hidden.id, "score": 0.9},
+            {"book_id": near.id, "neighbour_id": book.id, "score": 0.41},
+        ],
+    )
+    db.session.commit()
+
+    r = client.get(f"/similar/{book.filename}")
+    assert r.status_code == 200
+    assert r.get_json() == [
+        {
+            "filename": "nearer.epub",
+            "title": "Nearer",
+            "author": "A",
+            "cover": "/cover/nearer.epub",
+            "score": 0.72,
+        },
+        {
+            "filename": "near.epub",
+            "title": "Near",
+            "author": "A",
+            "cover": "/cover/near.epub",
+            "score": 0.41,
+        },
+    ]
+    assert client.get("/similar/hidden.epub").status_code == 403
+    assert client.get("/similar/missing.epub").status_code == 404
+    assert client.get("/similar/nearer.epub").get_json() == []
+
+
+def test_similar_shows_restricted_neighbours_to_admins(admin_client, book):
+    hidden = Book(
+        title="Hidden", author="A", filename="hidden.epub", access_level="restricted"
+    )
+    db.session.add(hidden)
+    db.session.flush()
+    db.session.execute(
+        book_neighbours.insert(),
+        [{"book_id": book.id, "neighbour_id": hidden.id, "score": 0.9}],
+    )
+    db.session.commit()
+    r = admin_client.get(f"/similar/{book.filename}")
+    assert [b["filename"] for b in r.get_json()] == ["hidden.epub"]
@@ -1,7 +1,14 @@
 import json
+import os
 
+import pytest
+
+from library import utils
 from library.choices import BookProgressChoice
-from library.models import Bookmark, db
+from library.models import Book, Bookmark, db
+from library.search import read_for_content_index, store_content_index
+from library.storage import book_storage
+from tests._epub_builder import _TINY_PNG, build_epub3
 
 
 def _read_ndjson(response):
@@ -170,3 +177,413 @@ def test_book_asset_allows_admin_for_restricted(admin_client, book):
     _restrict(book)
     r = admin_client.get(f"/book_asset/{book.filename}/OEBPS/cover.png")
     assert r.status_code == 200
+
+
+# --- structure cache ------------------------------------------------------------
+
+
+def test_load_book_reuses_cached_structure(client, book, mocker):
+    """A second open of the same book must not re-parse the OPF/nav."""
+    import library.routes.reader as reader_module
+    spy = mocker.spy(reader_module, "get_epub_structure")
+
+    first = _read_ndjson(client.get(f"/load_book/{book.filename}"))
+    second = _read_ndjson(client.get(f"/load_book/{book.filename}"))
+
+    assert spy.call_count == 1
+    assert first[0]["toc"] == second[0]["toc"]
+
+
+def test_structure_cache_is_shared_across_app_instances(app, book, mocker):
+    """Another worker (a second app on the same cache dir) hits the same entry."""
+    import library.routes.reader as reader_module
+    from library import create_app
+
+    app.test_client().get(f"/load_book/{book.filename}")
+    other = create_app(dict(app.config))
+    spy = mocker.spy(reader_module, "get_epub_structure")
+    epub_path = os.path.join(app.config["BOOK_DIR"], book.filename)
+    with other.app_context():
+        reader_module._book_structure(
+            book.id, epub_path, reader_module.book_file_version(book)
+        )
+    assert spy.call_count == 0
+
+
+def test_structure_cache_misses_after_file_rewrite(client, app, book, mocker):
+    import library.routes.reader as reader_module
+    spy = mocker.spy(reader_module, "get_epub_structure")
+
+    client.get(f"/load_book/{book.filename}").get_data()
+    epub_path = os.path.join(app.config["BOOK_DIR"], book.filename)
+    st = os.stat(epub_path)
+    os.utime(epub_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    client.get(f"/load_book/{book.filename}").get_data()
+
+    assert spy.call_count == 2
+
+
+# --- chapter frame cache --------------------------------------------------------
+
+
+def test_load_book_reuses_rendered_chapters(client, book, mocker):
+    import library.routes.reader as reader_module
+    spy = mocker.spy(reader_module, "process_chapter_content")
+
+    first = _read_ndjson(client.get(f"/load_book/{book.filename}"))
+    calls = spy.call_count
+    second = _read_ndjson(client.get(f"/load_book/{book.filename}"))
+
+    assert calls == first[0]["spine_length"]
+    assert spy.call_count == calls
+    assert first[1:] == second[1:]
+
+
+def test_cached_chapters_follow_the_request_mount_path(client, app, book_dir):
+    """One cached render serves both the bare and the /library-prefixed mount."""
+    from library.models import Book, db
+    from tests._epub_builder import build_epub3
+
+    (book_dir / "pics.epub").write_bytes(
+        build_epub3(chapters=[("ch1.xhtml", '<p>x</p><img src="cover.png"/>')])
+    )
+    db.session.add(Book(title="Pics", author="A", filename="pics.epub"))
+    db.session.commit()
+
+    def image_chapter(**kwargs):
+        events = _read_ndjson(client.get("/load_book/pics.epub", **kwargs))
+        return next(e for e in events[1:] if "<img" in e["content"])["content"]
+
+    bare = image_chapter()
+    mounted = image_chapter(headers={"X-Forwarded-Prefix": "/library"})
+
+    assert 'src="/book_asset/pics.epub/OEBPS/cover.png"' in bare
+    assert 'src="/library/book_asset/pics.epub/OEBPS/cover.png"' in mounted
+    assert "@@" not in bare + mounted
+
+
+# --- /book_asset streaming and ranges -------------------------------------------
+
+
+_PNG_LEN = len(_TINY_PNG)
+
+
+@pytest.fixture
+def deflated_asset(app, book):
+    """Append a compressible, deflated member to the test book."""
+    import zipfile
+
+    data = b"".join(b"line %05d of a deflated asset\n" % i for i in range(5000))
+    epub_path = os.path.join(app.config["BOOK_DIR"], book.filename)
+    with zipfile.ZipFile(epub_path, "a") as z:
+        z.writestr("OEBPS/notes.txt", data, compress_type=zipfile.ZIP_DEFLATED)
+    return data
+
+
+def test_book_asset_advertises_ranges(client, book):
+    r = client.get(f"/book_asset/{book.filename}/OEBPS/cover.png")
+    assert r.headers["Accept-Ranges"] == "bytes"
+    assert r.headers["Content-Length"] == str(_PNG_LEN)
+
+
+def test_book_asset_serves_byte_range_of_stored_member(client, book):
+    full = client.get(f"/book_asset/{book.filename}/OEBPS/cover.png").data
+    r = client.get(
+        f"/book_asset/{book.filename}/OEBPS/cover.png",
+        headers={"Range": "bytes=8-15"},
+    )
+    assert r.status_code == 206
+    assert r.data == full[8:16]
+    assert r.headers["Content-Range"] == f"bytes 8-15/{_PNG_LEN}"
+
+
+def test_book_asset_serves_suffix_range(client, book):
+    full = client.get(f"/book_asset/{book.filename}/OEBPS/cover.png").data
+    r = client.get(
+        f"/book_asset/{book.filename}/OEBPS/cover.png",
+        headers={"Range": "bytes=-12"},
+    )
+    assert r.status_code == 206
+    assert r.data == full[-12:]
+
+
+def test_book_asset_rejects_unsatisfiable_range(client, book):
+    r = client.get(
+        f"/book_asset/{book.filename}/OEBPS/cover.png",
+        headers={"Range": "bytes=1000-2000"},
+    )
+    assert r.status_code == 416
+    assert r.headers["Content-Range"] == f"bytes */{_PNG_LEN}"
+
+
+def test_book_asset_ignores_range_when_if_range_is_stale(client, book):
+    r = client.get(
+        f"/book_asset/{book.filename}/OEBPS/cover.png",
+        headers={"Range": "bytes=0-3", "If-Range": '"some-old-etag"'},
+    )
+    assert r.status_code == 200
+    assert len(r.data) == _PNG_LEN
+
+
+def test_book_asset_streams_deflated_member(client, book, deflated_asset):
+    r = client.get(f"/book_asset/{book.filename}/OEBPS/notes.txt")
+    assert r.status_code == 200
+    assert r.data == deflated_asset
+    assert r.headers["Content-Length"] == str(len(deflated_asset))
+
+
+def test_book_asset_serves_range_of_deflated_member(client, book, deflated_asset):
+    r = client.get(
+        f"/book_asset/{book.filename}/OEBPS/notes.txt",
+        headers={"Range": "bytes=100000-100099"},
+    )
+    assert r.status_code == 206
+    assert r.data == deflated_asset[100000:100100]
+
+
+# --- chapter scheduling ---------------------------------------------------------
+
+
+def _many_chapter_book(book_dir, n=7):
+    from library.models import Book
+    from tests._epub_builder import build_epub3
+
+    chapters = [(f"c{i}.xhtml", f"<h1>C{i}</h1>") for i in range(n)]
+    (book_dir / "long.epub").write_bytes(build_epub3(chapters=chapters))
+    book = Book(title="Long", author="A", filename="long.epub")
+    db.session.add(book)
+    db.session.commit()
+    return book
+
+
+def _set_bookmark(user, book, chapter_index):
+    db.session.add(
+        Bookmark(
+            user_id=user.id,
+            book_id=book.id,
+            chapter_index=chapter_index,
+            status=BookProgressChoice.IN_PROGRESS,
+        )
+    )
+    db.session.commit()
+
+
+def _chapter_order(events):
+    return [e["index"] for e in events if e["type"] == "chapter"]
+
+
+def test_load_book_default_order_wraps_from_bookmark(
+    standard_client, standard_user, book_dir
+):
+    book = _many_chapter_book(book_dir)  # spine: nav + 7 chapters
+    _set_bookmark(standard_user, book, 5)
+    events = _read_ndjson(standard_client.get("/load_book/long.epub"))
+    assert _chapter_order(events) == [5, 6, 7, 0, 1, 2, 3, 4]
+
+
+def test_load_book_nearest_order_fans_out_from_bookmark(
+    standard_client, standard_user, book_dir
+):
+    book = _many_chapter_book(book_dir)
+    _set_bookmark(standard_user, book, 5)
+    events = _read_ndjson(standard_client.get("/load_book/long.epub?order=nearest"))
+    assert _chapter_order(events) == [5, 6, 4, 7, 3, 2, 1, 0]
+    assert events[0]["stream_id"]
+
+
+def test_jump_hint_reprioritises_remaining_chapters(app, book_dir):
+    from library.routes.reader import ORDER_NEAREST, stream_book_content
+
+    _many_chapter_book(book_dir)
+    client = app.test_client()
+    with app.test_request_context():
+        stream = stream_book_content(
+            book_id=1,
+            version="v1",
+            epub_dir=str(book_dir),
+            epub_path="long.epub",
+            book_title="Long",
+            book_author="A",
+            start_chapter=6,
+            chapter_pos=0,
+            asset_url_prefix="/x/",
+            order=ORDER_NEAREST,
+            stream_id="abc123",
+        )
+        events = [json.loads(next(stream)) for _ in range(3)]  # metadata, 6, 7
+        r = client.post(
+            "/load_book/long.epub/jump",
+            json={"stream_id": "abc123", "chapter_index": 1},
+        )
+        assert r.status_code == 200
+        events += [json.loads(line) for line in stream]
+
+    assert _chapter_order(events) == [6, 7, 1, 2, 0, 3, 4, 5]
+
+
+def test_jump_hint_requires_stream_and_index(client, book):
+    r = client.post(f"/load_book/{book.filename}/jump", json={"stream_id": "x"})
+    assert r.status_code == 400
+
+
+def test_jump_hint_respects_access_level(standard_client, book):
+    book.access_level = "restricted"
+    db.session.commit()
+    r = standard_client.post(
+        f"/load_book/{book.filename}/jump",
+        json={"stream_id": "x", "chapter_index": 1},
+    )
+    assert r.status_code == 403
+
+
+# --- /chapter and windowed /load_book ---------------------------------------------
+
+
+def test_chapter_returns_single_rendered_chapter(client, book):
+    r = client.get(f"/chapter/{book.filename}/1")
+    assert r.status_code == 200
+    data = r.get_json()
+    assert data["type"] == "chapter"
+    assert data["index"] == 1
+    assert data["title"] == "One"
+    assert "chapter one" in data["content"]
+    assert "max-age=31536000" in r.headers["Cache-Control"]
+
+
+def test_chapter_matches_streamed_frame(client, book):
+    events = _read_ndjson(client.get(f"/load_book/{book.filename}"))
+    streamed = next(e for e in events if e.get("index") == 2)
+    assert client.get(f"/chapter/{book.filename}/2").get_json() == streamed
+
+
+def test_chapter_etag_is_strong_and_yields_304(client, book):
+    r1 = client.get(f"/chapter/{book.filename}/1")
+    etag = r1.headers["ETag"]
+    assert not etag.startswith("W/")
+    r2 = client.get(f"/chapter/{book.filename}/1", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    other = client.get(f"/chapter/{book.filename}/2").headers["ETag"]
+    assert other != etag
+
+
+def test_chapter_304s_on_the_etag_of_a_compressed_response(app, client, book):
+    app.config["COMPRESS_MIN_SIZE"] = 0  # The test chapters are tiny
+    gzip = {"Accept-Encoding": "gzip"}
+    r1 = client.get(f"/chapter/{book.filename}/1", headers=gzip)
+    assert r1.headers["Content-Encoding"] == "gzip"
+    etag = r1.headers["ETag"]
+    assert etag.endswith(':gzip"')
+    r2 = client.get(
+        f"/chapter/{book.filename}/1", headers={**gzip, "If-None-Match": etag}
+    )
+    assert r2.status_code == 304
+
+
+def test_chapter_404s_past_end_of_spine(client, book):
+    assert client.get(f"/chapter/{book.filename}/99").status_code == 404
+
+
+def test_chapter_respects_access_level(standard_client, book):
+    _restrict(book)
+    assert standard_client.get(f"/chapter/{book.filename}/1").status_code == 403
+
+
+def test_load_book_window_limits_streamed_chapters(
+    standard_client, standard_user, book_dir
+):
+    book = _many_chapter_book(book_dir)  # spine: nav + 7 chapters
+    _set_bookmark(standard_user, book, 4)
+    events = _read_ndjson(
+        standard_client.get("/load_book/long.epub?order=nearest&window=1")
+    )
+    assert events[0]["window"] == 1
+    assert events[0]["spine_length"] == 8
+    assert _chapter_order(events) == [4, 5, 3]
+
+
+# --- DB-recorded file state -------------------------------------------------------
+
+
+@pytest.mark.parametrize("path", ["/book_asset/{}/OEBPS/cover.png", "/chapter/{}/1"])
+def test_conditional_get_needs_no_filesystem_access(client, book, mocker, path):
+    url = path.format(book.filename)
+    etag = client.get(url).headers["ETag"]
+    stat = mocker.spy(os, "stat")
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert stat.call_count == 0
+
+
+# --- /search_in_book ------------------------------------------------------------
+
+
+def _searchable_book(book_dir):
+    filename = "whale.epub"
+    (book_dir / filename).write_bytes(
+        build_epub3(
+            title="Whale",
+            chapters=[
+                ("ch1.xhtml", "<h1>Loomings</h1><p>Call me  Ishmael.</p>"),
+                ("ch2.xhtml", "<p>The whale, the WHALE &amp; the whale</p>"),
+                ("ch3.xhtml", "<p>Still more whale</p>"),
+            ],
+        )
+    )
+    book = Book(title="Whale", author="Melville", filename=filename)
+    db.session.add(book)
+    db.session.commit()
+    return book
+
+
+def test_search_in_book_scans_epub(client, book_dir):
+    _searchable_book(book_dir)
+    r = client.get("/search_in_book/whale.epub?q=me%20ishmael")
+    assert r.status_code == 200
+    assert r.get_json() == {
+        "matches": [
+            {
+                "spine_index": 1,
+                "offset": 14,
+                "length": 10,
+                "snippet": "Loomings Call <mark>me Ishmael</mark>.",
+            }
+        ],
+        "more": False,
+    }
+
+
+def test_search_in_book_stops_at_limit(client, book_dir, mocker):
+    book = _searchable_book(book_dir)
+    parse = mocker.spy(utils, "chapter_plain_text")
+    body = client.get("/search_in_book/whale.epub?q=whale&limit=2").get_json()
+    assert [(m["spine_index"], m["offset"]) for m in body["matches"]] == [
+        (2, 4),
+        (2, 15),
+    ]
+    assert body["matches"][1]["snippet"].startswith("The whale, the <mark>WHALE")
+    assert body["more"] is True
+    # The limit was passed in chapter 2, so chapter 3 was never parsed.
+    assert parse.call_count == 3
+    assert book.content_indexed_fingerprint is None
+
+
+def test_search_in_book_uses_content_index(client, book_dir, mocker):
+    book = _searchable_book(book_dir)
+    _, state, texts, _ = read_for_content_index(book_storage(), book.filename)
+    texts[2]["text"] = "indexed whale"
+    store_content_index(book, state, texts)
+    db.session.commit()
+    parse = mocker.spy(utils, "chapter_plain_text")
+    body = client.get("/search_in_book/whale.epub?q=whale").get_json()
+    assert [(m["spine_index"], m["offset"]) for m in body["matches"]] == [
+        (2, 8),
+        (3, 11),
+    ]
+    assert parse.call_count == 0
+
+
+def test_search_in_book_requires_query_and_access(standard_client, book):
+    assert standard_client.get(f"/search_in_book/{book.filename}").status_code == 400
+    _restrict(book)
+    r = standard_client.get(f"/search_in_book/{book.filename}?q=one")
+    assert r.status_code == 403
@@ -1,9 +1,14 @@
 import io
 import os
+import time
+from datetime import datetime
 
-from library.models import Book
+from library.models import Book, db
 from library.routes.upload import generate_filename
-from tests._epub_builder import build_epub3
+from library.scanner import diff_directory
+from library.search import read_for_content_index, store_content_index
+from library.storage import book_storage
+from tests._epub_builder import build_epub2_ncx, build_epub3
 
 # --- generate_filename ----------------------------------------------------------
 
@@ -68,6 +73,18 @@ def test_upload_book_returns_metadata_and_writes_file(standard_client, app):
     assert os.path.exists(final_path)
 
 
+def test_upload_book_rejects_epub_without_nav(standard_client, app):
+    r = standard_client.post(
+        "/upload_book",
+        data={"file": (io.BytesIO(build_epub2_ncx()), "legacy.epub")},
+        content_type="multipart/form-data",
+    )
+    assert r.status_code == 400
+    assert "table of contents" in r.get_json()["error"]
+    # The temporary upload is cleaned up.
+    assert not [f for f in os.listdir(app.config["BOOK_DIR"]) if f.startswith("temp_")]
+
+
 # --- /upload_book_metadata ------------------------------------------------------
 
 
@@ -75,7 +92,11 @@ def test_upload_book_metadata_creates_book_row(standard_client, app, book_dir):
     # Pretend a previous /upload_book ran: the file is on disk under its
     # post-rename name, no Book row exists yet.
     filename = "PreUploaded__Author.epub"
-    (book_dir / filename).write_bytes(build_epub3(title="PreUploaded", author="Author"))
+    (book_dir / filename).write_bytes(
+        build_epub3(
+            title="PreUploaded", author="Author", identifiers=[("ISBN", "0306406152")]
+        )
+    )
 
     r = standard_client.post(
         "/upload_book_metadata",
@@ -89,7 +110,15 @@ def test_upload_book_metadata_creates_book_row(standard_client, app, book_dir):
         },
     )
     assert r.status_code == 200
-    assert Book.query.filter_by(filename=filename).first() is not None
+    book = Book.query.filter_by(filename=filename).first()
+    assert book is not None
+    # Stats are measured server-side, not taken from the client.
+    assert book.epub_text_size > 0
+    assert book.chapter_count == 3  # nav + 2 chapters
+    assert book.image_count == 1
+    assert [(i.scheme, i.value) for i in book.identifiers] == [
+        ("isbn", "9780306406157")
+    ]
 
 
 def test_upload_book_metadata_renames_file_when_changed(standard_client, app, book_dir):
@@ -111,3 +140,132 @@ def test_upload_book_metadata_renames_file_when_changed(standard_client, app, bo
     assert r.status_code == 200
     assert not (book_dir / original).exists()
     assert (book_dir / renamed).exists()
+
+
+def _save_metadata(client, original, new, title="Typed In"):
+    return client.post(
+        "/upload_book_metadata",
+        json={
+            "original_filename": original,
+            "new_filename": new,
+            "title": title,
+            "author": "Edited",
+            "genre": "fiction",
+            "cover_path": "OEBPS/cover.png",
+        },
+    )
+
+
+def test_upload_book_metadata_takes_over_a_row_the_scanner_added(
+    standard_client, app, book_dir
+):
+    r = standard_client.post(
+        "/upload_book",
+        data={"file": (io.BytesIO(build_epub3(title="Raw", author="Opf")), "x.epub")},
+        content_type="multipart/form-data",
+    )
+    filename = r.get_json()["filename"]
+    # scan-library can pick the file up between /upload_book and the form.
+    db.session.add(
+        Book(title="Raw", author="Opf", filename=filename, cover_path="OEBPS/cover.png")
+    )
+    db.session.commit()
+
+    # Renamed in the form: the scanned row follows the file.
+    r = _save_metadata(standard_client, filename, "Typed_In__Edited.epub")
+    assert r.status_code == 200, r.get_json()
+    assert [(b.filename, b.title, b.author) for b in Book.query] == [
+        ("Typed_In__Edited.epub", "Typed In", "Edited")
+    ]
+
+
+def test_upload_book_metadata_refuses_rows_it_did_not_stage(
+    standard_client, app, book_dir, book
+):
+    book.access_level = "admin"
+    db.session.commit()
+    r = _save_metadata(standard_client, book.filename, book.filename, "Defaced")
+    assert r.status_code == 409
+    r = _save_metadata(standard_client, book.filename, "Elsewhere.epub", "Defaced")
+    assert r.status_code == 409
+    assert (book_dir / book.filename).exists()
+    db.session.refresh(book)
+    assert (book.filename, book.title) == ("test_book.epub", "Test Book")
+
+
+def test_upload_book_metadata_refuses_edited_or_older_rows(
+    standard_client, app, book_dir
+):
+    r = standard_client.post(
+        "/upload_book",
+        data={"file": (io.BytesIO(build_epub3(title="Raw", author="Opf")), "x.epub")},
+        content_type="multipart/form-data",
+    )
+    filename = r.get_json()["filename"]
+    scanned = Book(
+        title="Raw", author="Opf", filename=filename, cover_path="OEBPS/cover.png"
+    )
+    db.session.add(scanned)
+    db.session.commit()
+
+    scanned.genre = "history"  # Edited after the scan
+    db.session.commit()
+    assert _save_metadata(standard_client, filename, filename).status_code == 409
+
+    scanned.genre = None
+    scanned.created_at = datetime(2000, 1, 1)  # There before the upload
+    db.session.commit()
+    assert _save_metadata(standard_client, filename, filename).status_code == 409
+    assert Book.query.one().title == "Raw"
+
+
+def test_upload_book_metadata_will_not_rename_over_another_file(
+    standard_client, app, book_dir
+):
+    (book_dir / "mine.epub").write_bytes(build_epub3())
+    (book_dir / "theirs.epub").write_bytes(b"theirs")
+    r = _save_metadata(standard_client, "mine.epub", "theirs.epub")
+    assert r.status_code == 409
+    assert (book_dir / "theirs.epub").read_bytes() == b"theirs"
+
+
+def test_uploads_are_staged_outside_the_library_listing(app, book_dir):
+    storage = book_storage()
+    staged = os.path.join(storage.staging_dir(), "temp_upload.epub")
+    with open(staged, "wb") as f:
+        f.write(build_epub3())
+    assert os.path.dirname(staged) != str(book_dir)
+    assert list(storage.list()) == []
+    assert diff_directory(str(book_dir), {}, now=time.time() + 60).seen == {}
+
+
+def test_upload_book_warns_about_indexed_duplicates(standard_client, app, book_dir):
+    body = "<p>" + " ".join(f"word{i}" for i in range(400)) + "</p>"
+    (book_dir / "first.epub").write_bytes(
+        build_epub3(title="First", chapters=[("ch1.xhtml", body)])
+    )
+    book = Book(title="First", author="A", filename="first.epub")
+    db.session.add(book)
+    db.session.commit()
+    _, state, texts, _ = read_for_content_index(book_storage(), "first.epub")
+    store_content_index(book, state, texts)
+    db.session.commit()
+
+    def upload(epub):
+        r = standard_client.post(
+            "/upload_book",
+            data={"file": (io.BytesIO(epub), "incoming.epub")},
+            content_type="multipart/form-data",
+        )
+        assert r.status_code == 200, r.get_json()
+        return r.get_json()["duplicates"]
+
+    # Same text under another title.
+    duplicates = upload(build_epub3(title="Renamed", chapters=[("text.xhtml", body)]))
+    assert duplicates == [{
+        "filename": "first.epub",
+        "title": "First",
+        "author": "A",
+        "similarity": 1.0,
+    }]
+    assert upload(build_epub3(title="Other")) == []
@@ -0,0 +1,74 @@
+import os
+import time
+
+from library.scanner import diff_directory, load_manifest, save_manifest
+
+
+def _write(path, data=b"epub", age=60):
+    path.write_bytes(data)
+    then = time.time() - age
+    os.utime(path, (then, then))
+
+
+def _scan_and_save(book_dir, manifest_path):
+    diff = diff_directory(str(book_dir), load_manifest(str(manifest_path)))
+    save_manifest(str(manifest_path), diff.seen)
+    return diff
+
+
+def test_first_scan_reports_everything_as_new(tmp_path):
+    _write(tmp_path / "a.epub")
+    _write(tmp_path / "b.epub")
+    (tmp_path / "notes.txt").write_text("ignored")
+    diff = diff_directory(str(tmp_path), {})
+    assert diff.new == ["a.epub", "b.epub"]
+    assert not diff.changed and not diff.removed and not diff.renamed
+
+
+def test_rescan_without_changes_is_empty(tmp_path):
+    _write(tmp_path / "a.epub")
+    manifest = tmp_path / "manifest.json"
+    _scan_and_save(tmp_path, manifest)
+    assert not _scan_and_save(tmp_path, manifest)
+
+
+def test_detects_changed_and_removed_files(tmp_path):
+    _write(tmp_path / "a.epub")
+    _write(tmp_path / "b.epub")
+    manifest = tmp_path / "manifest.json"
+    _scan_and_save(tmp_path, manifest)
+
+    _write(tmp_path / "a.epub", b"rewritten epub", age=30)
+    os.remove(tmp_path / "b.epub")
+    diff = _scan_and_save(tmp_path, manifest)
+    assert diff.changed == ["a.epub"]
+    assert diff.removed == ["b.epub"]
+    assert not diff.new
+
+
+def test_detects_rename_by_inode(tmp_path):
+    _write(tmp_path / "a.epub")
+    manifest = tmp_path / "manifest.json"
+    _scan_and_save(tmp_path, manifest)
+
+    os.rename(tmp_path / "a.epub", tmp_path / "renamed.epub")
+    diff = _scan_and_save(tmp_path, manifest)
+    assert diff.renamed == [("a.epub", "renamed.epub")]
+    assert not diff.new and not diff.removed
+
+
+def test_recently_modified_files_wait_for_next_pass(tmp_path):
+    _write(tmp_path / "copying.epub", age=0)
+    diff = diff_directory(str(tmp_path), {})
+    assert diff.new == []
+    assert diff.unsettled == ["copying.epub"]
+    # Once it has settled it shows up as new.
+    later = diff_directory(str(tmp_path), {}, now=time.time() + 60)
+    assert later.new == ["copying.epub"]
+
+
+def test_unreadable_manifest_means_full_scan(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text("{not json")
+    assert load_manifest(str(manifest)) == {}
+    assert load_manifest(str(tmp_path / "missing.json")) == {}
@@ -0,0 +1,147 @@
+from library.models import Book, ChapterText, db
+from library.routes import index as index_routes
+from library.search import (
+    content_match,
+    filter_match,
+    pending_content_query,
+    read_for_content_index,
+    snippet_html,
+    store_content_index,
+)
+from library.storage import book_storage
+from tests._epub_builder import build_epub3
+
+
+def test_filter_match_scopes_each_word_to_its_column():
+    match, short = filter_match({"title": "dune  messiah", "author": "Herbert"})
+    assert match == 'title : "dune" AND title : "messiah" AND author : "Herbert"'
+    assert short == []
+
+
+def test_filter_match_quotes_fts_syntax():
+    match, _ = filter_match({"title": 'say "hi" OR NOT*'})
+    assert match == 'title : "say" AND title : """hi""" AND title : "NOT*"'
+
+
+def test_filter_match_leaves_short_words_to_like():
+    match, short = filter_match({"title": "of mice", "genre": "sf"})
+    assert match == 'title : "mice"'
+    assert short == [("title", "of"), ("genre", "sf")]
+    assert filter_match({"author": "Le"}) == (None, [("author", "Le")])
+    assert filter_match(None) == (None, [])
+
+
+def test_content_match_ands_quoted_words():
+    assert content_match('whale  "white" ahab*') == '"whale" """white""" "ahab" *'
+    assert content_match("  * ") is None
+
+
+def test_snippet_html_escapes_text_but_not_marks():
+    assert snippet_html("a <b> \x02whale\x03 & co") == (
+        "a &lt;b&gt; <mark>whale</mark> &amp; co"
+    )
+
+
+# --- content index and /search --------------------------------------------------
+
+
+def _index_book(book_dir, title, chapters, access_level="standard"):
+    filename = f"{title.lower()}.epub"
+    (book_dir / filename).write_bytes(build_epub3(title=title, chapters=chapters))
+    book = Book(
+        title=title, author="Author", filename=filename, access_level=access_level
+    )
+    db.session.add(book)
+    db.session.commit()
+    _, state, texts, error = read_for_content_index(book_storage(), filename)
+    assert error is None
+    store_content_index(book, state, texts)
+    db.session.commit()
+    return book
+
+
+def test_store_content_index_replaces_chapters(app, book_dir):
+    book = _index_book(book_dir, "Moby", [("a.xhtml", "<p>Call me Ishmael</p>")])
+    assert book.content_indexed_fingerprint == book.file_fingerprint
+    assert pending_content_query().count() == 0
+
+    store_content_index(
+        book,
+        {"file_fingerprint": "changed"},
+        [{"spine_index": 1, "title": None, "text": "new"}],
+    )
+    db.session.commit()
+    assert [c.text for c in ChapterText.query] == ["new"]
+    # A later write to the file's state (scan, verify) marks it pending again.
+    book.file_fingerprint = "rewritten"
+    db.session.commit()
+    assert pending_content_query().all() == [book]
+
+
+def test_deleting_book_drops_its_chapters(app, book_dir):
+    book = _index_book(book_dir, "Moby", [("a.xhtml", "<p>Call me Ishmael</p>")])
+    db.session.delete(book)
+    db.session.commit()
+    assert ChapterText.query.count() == 0
+    count = db.session.execute(
+        db.text("SELECT count(*) FROM chapter_fts WHERE chapter_fts MATCH 'ishmael'")
+    ).scalar()
+    assert count == 0
+
+
+def test_search_returns_highlighted_chapters(client, book_dir):
+    _index_book(
+        book_dir,
+        "Moby",
+        [
+            ("a.xhtml", "<h1>Loomings</h1><p>Call me Ishmael. Some years ago</p>"),
+            ("b.xhtml", "<h1>Carpet-Bag</h1><p>I stuffed a shirt or two</p>"),
+        ],
+    )
+    response = client.get("/search?q=ishmael")
+    assert response.status_code == 200
+    [hit] = response.get_json()
+    assert hit["filename"] == "moby.epub"
+    assert hit["spine_index"] == 1
+    assert hit["chapter_title"] == "Loomings"
+    assert hit["chapter"] == "/chapter/moby.epub/1"
+    assert "<mark>Ishmael</mark>" in hit["snippet"]
+    assert "X-Next-Cursor" not in response.headers
+
+    # Diacritics and case are folded; every word must appear.
+    _index_book(book_dir, "Cafe", [("a.xhtml", "<p>Un café &lt;noir&gt;</p>")])
+    [hit] = client.get("/search?q=CAFE noir").get_json()
+    assert hit["snippet"] == "Un <mark>café</mark> &lt;<mark>noir</mark>&gt;"
+    assert client.get("/search?q=cafe whale").get_json() == []
+    assert client.get("/search?q=ishm*").get_json()[0]["filename"] == "moby.epub"
+
+
+def test_search_respects_access_level(client, standard_client, book_dir):
+    _index_book(book_dir, "Open", [("a.xhtml", "<p>harpoon</p>")])
+    _index_book(book_dir, "Closed", [("a.xhtml", "<p>harpoon</p>")], "admin")
+    hits = standard_client.get("/search?q=harpoon").get_json()
+    assert [hit["filename"] for hit in hits] == ["open.epub"]
+
+
+def test_search_pages_by_cursor(client, book_dir, monkeypatch):
+    monkeypatch.setattr(index_routes, "SEARCH_RESULTS_PER_PAGE", 2)
+    _index_book(
+        book_dir,
+        "Whales",
+        [(f"c{i}.xhtml", "<p>" + "whale " * (i + 1) + "</p>") for i in range(5)],
+    )
+    seen = []
+    cursor = None
+    while True:
+        response = client.get("/search", query_string={"q": "whale", "cursor": cursor})
+        seen += [hit["spine_index"] for hit in response.get_json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    # bm25 favours the chapters that say it most.
+    assert seen == [5, 4, 3, 2, 1]
+
+
+def test_search_rejects_bad_requests(client):
+    assert client.get("/search").status_code == 400
+    assert client.get("/search?q=a&cursor=nope").status_code == 400
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from library import similar
+from library.models import Book, book_neighbours, book_terms, db
+from library.search import store_content_index
+from library.similar import pending_similar_query, rebuild_similar, update_similar_books
+
+_TOPICS = {
+    "sea": ["whale", "harpoon", "ocean", "captain", "sail", "tide", "deck", "storm"],
+    "space": ["rocket", "orbit", "planet", "asteroid", "galaxy", "comet", "moon"],
+    "farm": ["barn", "tractor", "harvest", "cattle", "wheat", "orchard", "plough"],
+}
+
+
+def _book(title, topic, seed, access_level="standard"):
+    rng = random.Random(seed)
+    filler = ["".join(rng.choices("abcdefgh", k=6)) for _ in range(300)]
+    text = " ".join(filler + rng.choices(_TOPICS[topic], k=300))
+    book = Book(
+        title=title,
+        author="Author",
+        filename=f"{title}.epub",
+        access_level=access_level,
+    )
+    db.session.add(book)
+    db.session.flush()
+    store_content_index(
+        book,
+        {"file_fingerprint": f"fp-{title}"},
+        [{"spine_index": 1, "title": None, "text": text}],
+    )
+    db.session.commit()
+    return book
+
+
+def _neighbours(book):
+    return [
+        neighbour_id
+        for neighbour_id, _ in db.session.query(
+            book_neighbours.c.neighbour_id, book_neighbours.c.score
+        )
+        .filter(book_neighbours.c.book_id == book.id)
+        .order_by(book_neighbours.c.score.desc())
+    ]
+
+
+@pytest.fixture
+def shelf(app):
+    books = {
+        name: _book(name, topic, seed)
+        for seed, (name, topic) in enumerate(
+            [("sea1", "sea"), ("sea2", "sea"), ("space1", "space"), ("space2", "space")]
+        )
+    }
+    assert rebuild_similar() == (4, 12)
+    db.session.commit()
+    return books
+
+
+def test_rebuild_ranks_books_on_the_same_topic_first(shelf):
+    assert _neighbours(shelf["sea1"])[0] == shelf["sea2"].id
+    assert _neighbours(shelf["space2"])[0] == shelf["space1"].id
+    assert shelf["sea1"].id not in _neighbours(shelf["sea1"])
+    assert pending_similar_query().count() == 0
+
+
+def test_update_adds_new_books_to_existing_lists(shelf, monkeypatch):
+    monkeypatch.setattr(similar, "SIMILAR_BOOKS", 3)
+    sea3 = _book("sea3", "sea", 10)
+    farm = _book("farm1", "farm", 11)
+    assert [b.id for b in pending_similar_query()] == [sea3.id, farm.id]
+
+    assert update_similar_books() == 2
+    assert pending_similar_query().count() == 0
+    assert set(_neighbours(sea3)[:2]) == {shelf["sea1"].id, shelf["sea2"].id}
+    # Full lists let the new book in by dropping their weakest entry.
+    for name in ("sea1", "sea2"):
+        neighbours = _neighbours(shelf[name])
+        assert sea3.id in neighbours[:2]
+        assert len(neighbours) == 3
+
+
+def test_changed_text_is_reindexed_and_deleted_books_drop_out(shelf):
+    sea1 = shelf["sea1"]
+    store_content_index(
+        sea1,
+        {"file_fingerprint": "rewritten"},
+        [{"spine_index": 1, "title": None, "text": "rocket orbit planet " * 50}],
+    )
+    db.session.commit()
+    assert update_similar_books() == 1
+    assert _neighbours(sea1)[0] in (shelf["space1"].id, shelf["space2"].id)
+
+    db.session.delete(shelf["space1"])
+    db.session.commit()
+    assert (
+        db.session.query(book_neighbours)
+        .filter(
+            (book_neighbours.c.book_id == shelf["space1"].id)
+            | (book_neighbours.c.neighbour_id == shelf["space1"].id)
+        )
+        .count()
+        == 0
+    )
+    assert (
+        db.session.query(book_terms)
+        .filter(book_terms.c.book_id == shelf["space1"].id)
+        .count()
+        == 0
+    )
@@ -0,0 +1,241 @@
+import io
+import os
+import zipfile
+
+import httpx
+import pytest
+
+from library.file_cache import LocalFileCache
+from library.models import Book, db
+from library.storage import BookStorage, FileStat, LocalStorage, S3Storage
+from library.utils import read_ingest_metadata
+from tests._epub_builder import build_epub3
+from tests._s3_server import FakeS3
+
+
+@pytest.fixture
+def s3():
+    return FakeS3("books")
+
+
+@pytest.fixture
+def storage(s3, tmp_path):
+    return S3Storage(
+        "http://minio.test:9000",
+        "books",
+        LocalFileCache(str(tmp_path / "local"), 10 * 1024**2),
+        prefix="library/",
+        access_key_id="minio",
+        secret_access_key="minio-secret",
+        transport=httpx.WSGITransport(app=s3),
+    )
+
+
+def _padded_epub(title: str, padding: int) -> bytes:
+    """An EPUB carrying `padding` bytes of stored (incompressible) filler."""
+    buf = io.BytesIO(build_epub3(title=title))
+    with zipfile.ZipFile(buf, "a") as z:
+        z.writestr("EPUB/images/filler.bin", os.urandom(padding), zipfile.ZIP_STORED)
+    return buf.getvalue()
+
+
+def test_put_list_stat_rename_delete(storage, s3, tmp_path):
+    src = tmp_path / "upload.epub"
+    src.write_bytes(b"epub-bytes")
+    storage.put_file("a.epub", str(src))
+    assert not src.exists()
+    s3.put("library/notes.txt", b"ignored")
+    s3.put("library/nested/b.epub", b"ignored")
+
+    stat = storage.stat("a.epub")
+    assert stat.size == len(b"epub-bytes")
+    assert dict(storage.list()) == {"a.epub": stat}
+
+    storage.rename("a.epub", "b.epub")
+    assert not storage.exists("a.epub")
+    assert s3.objects["library/b.epub"][0] == b"epub-bytes"
+
+    storage.delete("b.epub")
+    storage.delete("b.epub")
+    with pytest.raises(FileNotFoundError):
+        storage.stat("b.epub")
+
+
+def test_list_follows_continuation_tokens(storage, s3):
+    s3.page_size = 2
+    for name in "abcde":
+        s3.put(f"library/{name}.epub", b"x")
+    assert sorted(name for name, _ in storage.list()) == [
+        f"{name}.epub" for name in "abcde"
+    ]
+
+
+def test_requests_are_signed(storage, s3):
+    s3.put("library/a.epub", b"x")
+    storage.stat("a.epub")
+    auth = s3.authorizations[-1]
+    assert auth.startswith("AWS4-HMAC-SHA256 Credential=minio/")
+    assert "/us-east-1/s3/aws4_request" in auth
+    assert "SignedHeaders=host;x-amz-content-sha256;x-amz-date" in auth
+
+
+def test_ingest_metadata_uses_ranged_reads(storage, s3, tmp_path):
+    data = _padded_epub("Remote", 2 * 1024**2)
+    s3.put("library/remote.epub", data)
+    local = tmp_path / "remote.epub"
+    local.write_bytes(data)
+
+    metadata = storage.read_ingest_metadata("remote.epub")
+
+    expected = read_ingest_metadata(str(local))
+    expected["file_mtime_ns"] = storage.stat("remote.epub").mtime_ns
+    assert metadata == expected
+    gets = [r for r in s3.requests if r[0] == "GET"]
+    assert gets and all(range_header for _, _, range_header in gets)
+    assert s3.bytes_sent < len(data) // 4
+
+
+def test_local_path_downloads_once(storage, s3):
+    data = build_epub3(title="Cached")
+    s3.put("library/a.epub", data)
+    size, mtime_ns = storage.stat("a.epub").as_tuple()
+
+    path = storage.local_path("a.epub", size, mtime_ns)
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+    s3.requests.clear()
+    assert storage.local_path("a.epub", size, mtime_ns) == path
+    assert s3.requests == []
+
+
+def test_local_path_refetches_changed_object(storage, s3):
+    s3.put("library/a.epub", b"old")
+    old = storage.stat("a.epub")
+    storage.local_path("a.epub", *old.as_tuple())
+
+    s3.put("library/a.epub", b"newer")
+    path = storage.local_path("a.epub", *storage.stat("a.epub").as_tuple())
+    with open(path, "rb") as f:
+        assert f.read() == b"newer"
+
+
+def test_local_path_retries_when_recorded_state_is_stale(storage, s3):
+    s3.put("library/a.epub", b"old")
+    old = storage.stat("a.epub")
+    s3.put("library/a.epub", b"newer")
+
+    # Nothing cached yet: the download won't match the recorded size, so the
+    # object is stat'ed and fetched again.
+    with open(storage.local_path("a.epub", *old.as_tuple()), "rb") as f:
+        assert f.read() == b"newer"
+
+
+def test_rewrite_uploads_edited_copy(storage, s3):
+    s3.put("library/a.epub", b"before")
+
+    def edit(path):
+        with open(path, "ab") as f:
+            f.write(b"+after")
+
+    storage.rewrite("a.epub", edit)
+    assert s3.objects["library/a.epub"][0] == b"before+after"
+    with open(storage.local_path("a.epub"), "rb") as f:
+        assert f.read() == b"before+after"
+
+
+def test_local_storage_lists_epubs(tmp_path):
+    (tmp_path / "a.epub").write_bytes(b"abc")
+    (tmp_path / "notes.txt").write_bytes(b"x")
+    (tmp_path / "dir.epub").mkdir()
+    st = os.stat(tmp_path / "a.epub")
+    assert dict(LocalStorage(str(tmp_path)).list()) == {
+        "a.epub": FileStat(st.st_size, st.st_mtime_ns)
+    }
+
+
+# --- routes on S3 storage -------------------------------------------------------
+
+
+def test_backend_missing_a_method_fails_on_creation():
+    class ReadOnly(BookStorage):
+        def stat(self, name):
+            return FileStat(0, 0)
+
+        def list(self):
+            return iter(())
+
+        def open(self, name):
+            return io.BytesIO()
+
+        def local_path(self, name, size=None, mtime_ns=None):
+            return name
+
+    with pytest.raises(TypeError, match="put_file"):
+        ReadOnly()
+
+
+@pytest.fixture
+def s3_app(app, storage):
+    app.extensions["book_storage"] = storage
+    return app
+
+
+def test_upload_stores_book_in_bucket(s3_app, s3, standard_client, book_dir):
+    response = standard_client.post(
+        "/upload_book",
+        data={"file": (io.BytesIO(build_epub3(title="Up")), "up.epub")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    filename = response.get_json()["filename"]
+    assert f"library/{filename}" in s3.objects
+    assert list(book_dir.iterdir()) == []
+
+    response = standard_client.post(
+        "/upload_book_metadata",
+        json={
+            "original_filename": filename,
+            "new_filename": "renamed.epub",
+            "title": "Up",
+            "author": "Test Author",
+        },
+    )
+    assert response.status_code == 200
+    assert set(s3.objects) == {"library/renamed.epub"}
+    book = Book.query.filter_by(filename="renamed.epub").one()
+    assert book.file_size == len(s3.objects["library/renamed.epub"][0])
+
+
+def test_cover_is_read_without_caching_the_book(s3_app, s3, client, tmp_path):
+    data = _padded_epub("Remote", 2 * 1024**2)
+    s3.put("library/remote.epub", data)
+    db.session.add(
+        Book(
+            title="Remote",
+            author="A",
+            filename="remote.epub",
+            cover_path="OEBPS/cover.png",
+        )
+    )
+    db.session.commit()
+
+    response = client.get("/cover/remote.epub")
+    assert response.status_code == 200
+    assert response.data.startswith(b"\x89PNG")
+    assert s3.bytes_sent < len(data) // 4
+    assert not (tmp_path / "local" / "remote.epub").exists()
+
+
+def test_download_and_delete_from_bucket(s3_app, s3, admin_client):
+    data = build_epub3(title="Remote")
+    s3.put("library/remote.epub", data)
+    db.session.add(Book(title="Remote", author="A", filename="remote.epub"))
+    db.session.commit()
+
+    response = admin_client.get("/download/remote.epub")
+    assert response.status_code == 200
+    assert response.data == data
+
+    assert admin_client.delete("/book/remote.epub").status_code == 200
+    assert s3.objects == {}
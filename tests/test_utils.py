@@ -2,11 +2,14 @@ import pytest
 
 from library.utils import (
     cover_mimetype,
-    extract_metadata,
+    epub_text_size,
     get_epub_cover_path,
     get_epub_structure,
+    nearest_first,
     process_chapter_content,
     read_epub_cover,
+    read_file_state,
+    read_ingest_metadata,
     rotate_list,
     update_epub_cover,
 )
@@ -42,6 +45,14 @@ def test_rotate_list_negative_shifts_left():
     assert rotate_list([1, 2, 3, 4], -1) == [2, 3, 4, 1]
 
 
+def test_nearest_first_fans_out_forward_then_back():
+    assert nearest_first(range(6), 2) == [2, 3, 1, 4, 0, 5]
+
+
+def test_nearest_first_reorders_a_subset():
+    assert nearest_first([0, 1, 7, 8, 9], 8) == [8, 9, 7, 1, 0]
+
+
 # --- cover_mimetype -------------------------------------------------------------
 
 
@@ -343,15 +354,51 @@ def test_update_epub_cover_replaces_bytes(epub_path):
     assert read_epub_cover(path, "OEBPS/cover.png") == new_bytes
 
 
-# --- extract_metadata -----------------------------------------------------------
+# --- read_ingest_metadata -------------------------------------------------------
 
 
-def test_extract_metadata_pulls_title_and_author(epub_path):
-    from ebooklib import epub as _epub
-
+def test_read_ingest_metadata_from_epub3(epub_path):
     path = epub_path(build_epub3(title="Demo", author="Tester"))
-    meta = extract_metadata(_epub.read_epub(path, options={"ignore_ncx": True}))
-    assert meta == {"title": "Demo", "author": "Tester"}
+    assert read_ingest_metadata(path) == {
+        "title": "Demo",
+        "author": "Tester",
+        "identifiers": [{"scheme": None, "value": "test-Demo"}],
+        "has_nav": True,
+        "cover_path": "OEBPS/cover.png",
+        "epub_text_size": epub_text_size(path),
+        "chapter_count": len(get_epub_structure(path)["chapters"]),
+        "image_count": 1,
+        **read_file_state(path),
+    }
+
+
+def test_read_ingest_metadata_from_epub2_ncx(epub_path):
+    path = epub_path(build_epub2_ncx(title="Legacy", author="Someone"))
+    meta = read_ingest_metadata(path)
+    assert {"title": meta["title"], "author": meta["author"]} == {
+        "title": "Legacy",
+        "author": "Someone",
+    }
+    # NCX alone is not a nav document.
+    assert meta["has_nav"] is False
+
+
+def test_read_ingest_metadata_without_cover(epub_path):
+    path = epub_path(build_epub3(include_cover=False))
+    assert read_ingest_metadata(path)["cover_path"] is None
+
+
+def test_read_ingest_metadata_reads_only_package_files(epub_path, mocker):
+    import zipfile
+
+    path = epub_path(build_epub3())
+    spy = mocker.spy(zipfile.ZipFile, "open")
+    read_ingest_metadata(path)
+    opened = {
+        call.args[1] if isinstance(call.args[1], str) else call.args[1].filename
+        for call in spy.call_args_list
+    }
+    assert opened == {"META-INF/container.xml", "OEBPS/content.opf"}
 
 
 # --- process_chapter_content ----------------------------------------------------
@@ -397,3 +444,74 @@ def test_process_chapter_rewrites_internal_links(epub_path):
     assert "javascript:void" in result["content"]
     assert "ch2.xhtml" in result["content"]
     assert "scene" in result["content"]
+
+
+# --- lxml chapter renderer parity -----------------------------------------------
+
+
+def _canonical(markup: str) -> list[tuple]:
+    """Serialization-independent view of rendered HTML: attribute order and
+    void-element syntax differ between bs4 and lxml, the tree must not."""
+    from lxml import html as lxml_html
+
+    root = lxml_html.fromstring(markup)
+    return [
+        (el.tag, sorted(el.attrib.items()), (el.text or "").strip(),
+         (el.tail or "").strip())
+        for el in root.iter()
+        if isinstance(el.tag, str)
+    ]
+
+
+_PARITY_CHAPTERS = [
+    "<h1>Plain Heading</h1><p>body &amp; more café</p>",
+    '<nav epub:type="toc"><h1>Contents</h1></nav><section epub:type="chapter">'
+    "<h2>Inside Section</h2></section>",
+    '<div class="x chapter-title">Classy Title</div><p>para</p>',
+    '<p id="chapter_heading">By Id</p>',
+    '<p>Short opener</p><p><a href="ch2.xhtml#scene">go</a> '
+    '<a href="#local">stay</a> <a href="../Text/ch3.xhtml">far</a></p>',
+    '<p><img src="cover.png" alt="c"/><img src="../images/missing.png"/></p>'
+    '<svg xmlns="http://www.w3.org/2000/svg"><image width="1" '
+    'xlink:href="cover.png"/></svg><a id="empty"/><div/>',
+]
+
+
+@pytest.mark.parametrize("body", _PARITY_CHAPTERS)
+def test_lxml_renderer_matches_bs4(epub_path, body):
+    import zipfile
+
+    from library.utils import _render_chapter_bs4, _render_chapter_lxml
+
+    path = epub_path(build_epub3(chapters=[("ch1.xhtml", body)]))
+    s = get_epub_structure(path)
+    with zipfile.ZipFile(path) as z:
+        content = z.read("OEBPS/ch1.xhtml")
+
+    bs4_title, bs4_body = _render_chapter_bs4(content, s["images"], "/a/")
+    lxml_title, lxml_body = _render_chapter_lxml(content, s["images"], "/a/")
+
+    assert lxml_title == bs4_title
+    assert _canonical(lxml_body) == _canonical(bs4_body)
+
+
+def test_process_chapter_falls_back_to_bs4_when_lxml_fails(epub_path, mocker):
+    from lxml import etree
+
+    import library.utils as utils_module
+
+    mocker.patch.object(
+        utils_module,
+        "_render_chapter_lxml",
+        side_effect=etree.ParserError("Document is empty"),
+    )
+    bs4_spy = mocker.spy(utils_module, "_render_chapter_bs4")
+    path = epub_path(build_epub3(chapters=[("ch1.xhtml", "<h1>Fallback</h1>")]))
+    s = get_epub_structure(path)
+    chapter_path = next(
+        c["path"] for c in s["chapters"] if c["path"].endswith("ch1.xhtml")
+    )
+
+    result = process_chapter_content(path, chapter_path, s["images"], "/x/")
+    assert result["title"] == "Fallback"
+    assert bs4_spy.call_count == 1